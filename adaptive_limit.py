@@ -0,0 +1,138 @@
+"""
+Limite adaptativo de concorrência por projeto e serviço upstream
+
+Em vez de um teto fixo de requisições simultâneas, cada (projeto, serviço)
+tem um limite ajustado por AIMD, como o AIMDLimit do concurrency-limits da
+Netflix: respostas rápidas com o limite em uso o aumentam em 1 a cada
+"janela" (1/limite por resposta, como no TCP), e cada sinal de sobrecarga
+(erro transitório, prazo esgotado ou latência acima de
+ADAPTIVE_LIMIT_LATENCY_TOLERANCE vezes a latência de base da própria operação)
+multiplica o limite por ADAPTIVE_LIMIT_BACKOFF. A base é mantida por operação:
+um select de 60 ms não é sobrecarga só porque um get_user leva 10 ms. Chamadas
+acima do limite aguardam na fila até uma vaga ser liberada.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from config import Config
+from executors import STORAGE_OPERATIONS
+from metrics import metrics
+
+# Operações (nomes usados em call_upstream) atendidas pelo GoTrue
+AUTH_OPERATIONS = {
+    "sign_up", "sign_in", "sign_out", "get_user", "reset_password", "update_user",
+    "create_user", "delete_user", "list_users",
+}
+
+# Peso de uma nova amostra na latência de base, quando ela é maior que a base
+# (a base sobe devagar se a latência normal do projeto mudar)
+BASELINE_DRIFT = 0.01
+
+
+def service_for(operation: str) -> str:
+    """Serviço upstream de uma operação (rest, auth ou storage)"""
+    if operation in STORAGE_OPERATIONS:
+        return "storage"
+    if operation in AUTH_OPERATIONS:
+        return "auth"
+    return "rest"
+
+
+class AdaptiveLimiter:
+    """Limite de requisições simultâneas ajustado por AIMD a partir de latência e erros"""
+
+    def __init__(self, tenant: str, service: str, initial: int = 20, min_limit: int = 1,
+                 max_limit: int = 200, backoff: float = 0.9, latency_tolerance: float = 2.0):
+        self.tenant = tenant
+        self.service = service
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        # Latência de base por operação (operações do mesmo serviço têm custos diferentes)
+        self.baselines: Dict[str, float] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._publish()
+
+    async def acquire(self):
+        """Aguarda uma vaga dentro do limite atual"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Quem libera a vaga a transfere ao primeiro da fila (in_flight já contado)
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None, dropped: bool = False, operation: str = ""):
+        """
+        Libera a vaga e ajusta o limite: dropped (erro transitório ou prazo
+        esgotado) ou latência acima da tolerância da base da operação reduzem;
+        sucesso com o limite em uso aumenta. Sem latência nem erro (chamada
+        cancelada), o limite não muda
+        """
+        if latency is not None and not dropped:
+            baseline = self.baselines.get(operation)
+            if baseline is None or latency < baseline:
+                baseline = latency
+            else:
+                baseline += (latency - baseline) * BASELINE_DRIFT
+            self.baselines[operation] = baseline
+            dropped = latency > baseline * self.latency_tolerance
+
+        if dropped:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif latency is not None and self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.in_flight -= 1
+        self._publish()
+
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _publish(self):
+        labels = {"tenant": self.tenant, "service": self.service}
+        metrics.set_gauge(
+            "supabase_concurrency_limit", int(self.limit), labels,
+            help="Limite adaptativo de requisições simultâneas por projeto e serviço",
+        )
+        metrics.set_gauge(
+            "supabase_concurrency_in_flight", self.in_flight, labels,
+            help="Requisições em andamento por projeto e serviço",
+        )
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(config: Config, operation: str) -> AdaptiveLimiter:
+    """Retorna o limitador do projeto atual para o serviço da operação"""
+    key = (config.get_tenant_id(), service_for(operation))
+    with _registry_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveLimiter(
+                *key,
+                initial=config.adaptive_limit_initial,
+                min_limit=config.adaptive_limit_min,
+                max_limit=config.adaptive_limit_max,
+                backoff=config.adaptive_limit_backoff,
+                latency_tolerance=config.adaptive_limit_latency_tolerance,
+            )
+        return limiter
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark de formatos de saída do database_select
+
+Compara tamanho e tempo de codificação de páginas de linhas sintéticas entre
+a saída textual atual (repr da lista), JSON, Parquet e Arrow IPC (zstd),
+e o tempo de leitura do lado consumidor (json.loads vs. pyarrow).
+
+Uso: python benchmarks/bench_columnar.py [--rows 100000] [--page 1000]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.database.columnar import ColumnarEncoder, ColumnarSchema, pa
+
+TABLE_SCHEMA = {
+    "id": "bigint",
+    "status": "text",
+    "amount": "numeric",
+    "paid": "boolean",
+    "created_at": "timestamp with time zone",
+}
+
+
+def make_pages(total, page):
+    statuses = ["new", "open", "paid", "refunded"]
+    rows = [
+        {
+            "id": i,
+            "status": random.choice(statuses),
+            "amount": round(random.uniform(1, 500), 2),
+            "paid": random.random() > 0.5,
+            "created_at": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00+00:00",
+        }
+        for i in range(total)
+    ]
+    return [rows[start:start + page] for start in range(0, total, page)]
+
+
+def measure(label, encode, pages, decode=None):
+    started = time.perf_counter()
+    data = encode(pages)
+    encoded = time.perf_counter() - started
+    line = f"{label:<16} {len(data) / 1024:10.1f} KiB  codificação {encoded * 1000:8.1f} ms"
+    if decode is not None:
+        started = time.perf_counter()
+        decode(data)
+        line += f"  leitura {(time.perf_counter() - started) * 1000:8.1f} ms"
+    print(line)
+    return len(data)
+
+
+def encode_columnar(fmt):
+    def encode(pages):
+        encoder = ColumnarEncoder(fmt, ColumnarSchema.from_table_schema(TABLE_SCHEMA, ["*"]))
+        return b"".join([encoder.write(rows) for rows in pages] + [encoder.close()])
+    return encode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page", type=int, default=1000)
+    args = parser.parse_args()
+    if pa is None:
+        sys.exit("Requer o pacote 'pyarrow'")
+
+    import pyarrow.parquet as pq
+
+    pages = make_pages(args.rows, args.page)
+    text = measure("texto (repr)", lambda p: "".join(str(rows) for rows in p).encode(), pages)
+    measure("json", lambda p: "\n".join(json.dumps(rows) for rows in p).encode(), pages,
+            lambda d: [json.loads(line) for line in d.splitlines()])
+    parquet = measure("parquet (zstd)", encode_columnar("parquet"), pages,
+                      lambda d: pq.read_table(io.BytesIO(d)))
+    measure("arrow (zstd)", encode_columnar("arrow"), pages,
+            lambda d: pa.ipc.open_stream(d).read_all())
+    print(f"redução parquet vs. texto: {text / parquet:.1f}x")
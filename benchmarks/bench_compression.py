@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark da compressão das respostas de /mcp/*
+
+Comprime uma resposta de database_select (JSON de /mcp/call_tool) e um stream
+NDJSON de /mcp/stream_query (com flush a cada bloco, como o middleware) em
+cada codificação disponível, e compara o custo de CPU com o tempo de
+transferência economizado em links de 10, 100 e 1000 Mbit/s.
+
+Uso: python benchmarks/bench_compression.py [--rows 10000] [--chunk 1000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import ENCODERS, create_encoder
+
+BANDWIDTHS_MBIT = (10, 100, 1000)
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 9), "zstd": (1, 3, 9)}
+
+
+def make_rows(total):
+    statuses = ["new", "open", "paid", "refunded"]
+    return [
+        {
+            "id": i,
+            "customer": f"cliente-{random.randint(1, 5000)}",
+            "status": random.choice(statuses),
+            "amount": round(random.uniform(1, 500), 2),
+            "paid": random.random() > 0.5,
+            "created_at": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00+00:00",
+        }
+        for i in range(total)
+    ]
+
+
+def select_response(rows):
+    """Corpo de /mcp/call_tool para um database_select (texto da ferramenta dentro do JSON)"""
+    return [json.dumps([{"type": "text", "text": str(rows)}]).encode()]
+
+
+def ndjson_stream(rows, chunk):
+    return [
+        "".join(json.dumps(row) + "\n" for row in rows[start:start + chunk]).encode()
+        for start in range(0, len(rows), chunk)
+    ]
+
+
+def decompress(encoding, encoded):
+    """Decodifica como o cliente faria (zstd não está em DECODERS, que vale só para requisições)"""
+    if encoding == "zstd":
+        import zstandard
+        decoder = zstandard.ZstdDecompressor().decompressobj()
+        return b"".join(decoder.decompress(data) for data in encoded)
+    if encoding == "br":
+        import brotli
+        decoder = brotli.Decompressor()
+        return b"".join(decoder.process(data) for data in encoded)
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return b"".join(decoder.decompress(data) for data in encoded) + decoder.flush()
+
+
+def measure(encoding, level, chunks):
+    started = time.process_time()
+    encoder = create_encoder(encoding, {encoding: level})
+    encoded = [encoder.compress(chunk) for chunk in chunks[:-1]] + [encoder.finish(chunks[-1])]
+    compress_cpu = time.process_time() - started
+
+    started = time.process_time()
+    decoded = decompress(encoding, encoded)
+    decompress_cpu = time.process_time() - started
+    assert decoded == b"".join(chunks)
+    return sum(len(data) for data in encoded), compress_cpu, decompress_cpu
+
+
+def report(label, chunks):
+    raw = sum(len(chunk) for chunk in chunks)
+    print(f"\n{label}: {raw / 1024:.1f} KiB sem compressão")
+    header = "".join(f"  ganho@{bw}Mbit" for bw in BANDWIDTHS_MBIT)
+    print(f"{'codificação':<12} {'KiB':>9} {'razão':>7} {'compr. ms':>10} {'descompr. ms':>13}{header}")
+    for encoding in ENCODERS:
+        for level in LEVELS[encoding]:
+            size, compress_cpu, decompress_cpu = measure(encoding, level, chunks)
+            gains = ""
+            for bw in BANDWIDTHS_MBIT:
+                bytes_per_second = bw * 1_000_000 / 8
+                # Tempo economizado na transferência menos a CPU gasta dos dois lados
+                saved = (raw - size) / bytes_per_second - compress_cpu - decompress_cpu
+                gains += f"  {saved * 1000:+10.1f}ms"
+            print(f"{encoding + '-' + str(level):<12} {size / 1024:9.1f} {raw / size:6.1f}x "
+                  f"{compress_cpu * 1000:10.1f} {decompress_cpu * 1000:13.1f}{gains}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+    missing = [name for name, encoding in (("brotli", "br"), ("zstandard", "zstd")) if encoding not in ENCODERS]
+    if missing:
+        print(f"Pacotes ausentes (codificações ignoradas): {', '.join(missing)}")
+
+    rows = make_rows(args.rows)
+    report(f"database_select ({args.rows} linhas)", select_response(rows))
+    report(f"stream NDJSON (blocos de {args.chunk} linhas, flush por bloco)", ndjson_stream(rows, args.chunk))
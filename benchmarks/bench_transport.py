@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de reutilização de conexões HTTP
+
+Compara requisições/segundo contra um servidor local (keep-alive HTTP/1.1)
+entre um httpx.Client novo por requisição (comportamento anterior, um pool
+por create_client) e o cliente compartilhado de transport.get_http_client.
+
+Uso: python benchmarks/bench_transport.py [--requests 500] [--workers 8]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAYLOAD = json.dumps([{"id": i, "name": f"item {i}"} for i in range(20)]).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, total, workers, get_client, close_each):
+    def one(_):
+        client = get_client()
+        try:
+            client.get(url).raise_for_status()
+        finally:
+            if close_each:
+                client.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    rps = total / elapsed
+    print(f"{label:<28} {rps:10.1f} req/s  ({elapsed:.2f}s)")
+    return rps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    url = f"{base_url}/rest/v1/items"
+
+    os.environ.setdefault("DEFAULT_SUPABASE_URL", base_url)
+    from config import Config
+    from transport import close_http_clients, get_http_client
+
+    config = Config()
+    fresh = run("cliente novo por requisição", args.requests, args.workers,
+                lambda: httpx.Client(), close_each=True)
+    shared = run("pool compartilhado", args.requests, args.workers,
+                 lambda: get_http_client(config), close_each=False)
+    print(f"ganho: {shared / fresh:.2f}x")
+
+    close_http_clients()
+    server.shutdown()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark do buffer write-behind de inserções
+
+Dispara inserções de um registro concorrentes contra um cliente simulado com
+latência fixa por requisição (ida e volta ao PostgREST) e compara registros/s
+entre inserções diretas e o buffer write-behind com lotes de tamanhos diferentes.
+
+Uso: python benchmarks/bench_write_behind.py [--inserts 2000] [--concurrency 200] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from write_behind import InsertCoalescer
+
+
+class Config:
+    def get_tenant_id(self):
+        return "bench"
+
+
+class SimulatedClient:
+    """Cada requisição custa a mesma latência, com no máximo `connections` em paralelo"""
+
+    config = Config()
+
+    def __init__(self, latency: float, connections: int):
+        self.latency = latency
+        self.slots = asyncio.Semaphore(connections)
+        self.requests = 0
+
+    async def _request(self):
+        async with self.slots:
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+
+    async def insert_record(self, table, data):
+        await self._request()
+        return data
+
+    async def insert_many(self, table, rows):
+        await self._request()
+        return rows
+
+
+async def run(label, total, concurrency, latency, insert_one):
+    client = SimulatedClient(latency, connections=10)
+    pending = iter(range(total))
+
+    async def worker():
+        for n in pending:
+            await insert_one(client, {"n": n})
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed
+    print(f"{label:<22} {rate:10.1f} registros/s  {client.requests:6d} requisições  ({elapsed:.2f}s)")
+    return rate
+
+
+async def main(args):
+    latency = args.latency_ms / 1000
+    direct = await run("direto", args.inserts, args.concurrency, latency,
+                       lambda client, row: client.insert_record("events", row))
+    for batch in (10, 50, 200):
+        coalescer = InsertCoalescer(max_batch=batch, max_delay=0.01)
+        rate = await run(f"write-behind lote {batch}", args.inserts, args.concurrency, latency,
+                         lambda client, row: coalescer.insert(client, "events", row))
+        print(f"  ganho: {rate / direct:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Stand-in local do Supabase para testes de carga
+
+Responde às rotas do PostgREST (/rest/v1), do Storage (/storage/v1) e do
+GoTrue (/auth/v1) usadas pelo SDK, com latência, tamanho das respostas e taxa
+de erros (503) configuráveis. Projetos dinâmicos são atendidos em /t/<projeto>
+(SUPABASE_PROJECT_URL_TEMPLATE=http://127.0.0.1:<porta>/t/{project}); as linhas
+retornadas trazem o projeto na coluna "tenant", o que permite verificar se cada
+resposta veio do projeto certo. GET /_stats retorna as requisições recebidas
+por projeto e serviço.
+
+Uso: python benchmarks/fake_supabase.py [--port 54330] [--latency-ms 20] [--error-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+TABLE_COLUMNS = {
+    "id": "bigint",
+    "tenant": "text",
+    "customer": "text",
+    "status": "text",
+    "amount": "numeric",
+    "note": "text",
+    "created_at": "timestamp with time zone",
+}
+
+
+class FakeSettings:
+    """Comportamento do upstream simulado"""
+
+    def __init__(self, latency_ms: float = 10, jitter_ms: float = 5, error_rate: float = 0.0,
+                 rows: int = 100, row_bytes: int = 200, object_kb: int = 256, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rows = rows
+        self.row_bytes = row_bytes
+        self.object_kb = object_kb
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items() if key != "random"}
+
+    def as_args(self):
+        """Argumentos de linha de comando equivalentes (para executar em outro processo)"""
+        return [
+            "--latency-ms", str(self.latency_ms), "--jitter-ms", str(self.jitter_ms),
+            "--error-rate", str(self.error_rate), "--rows", str(self.rows),
+            "--row-bytes", str(self.row_bytes), "--object-kb", str(self.object_kb),
+        ] + (["--seed", str(self.seed)] if self.seed is not None else [])
+
+
+def make_row(tenant: str, n: int, row_bytes: int) -> dict:
+    row = {
+        "id": n,
+        "tenant": tenant,
+        "customer": f"cliente-{n % 5000}",
+        "status": ("new", "open", "paid", "refunded")[n % 4],
+        "amount": round((n * 37) % 50000 / 100, 2),
+        "created_at": f"2024-{1 + n % 12:02d}-{1 + n % 28:02d}T12:00:00+00:00",
+    }
+    row["note"] = "x" * max(0, row_bytes - len(str(row)))
+    return row
+
+
+def create_app(settings: FakeSettings) -> Starlette:
+    stats = Counter()
+    objects = {}
+    download = bytes(range(256)) * (settings.object_kb * 4)
+
+    def tenant_of(request: Request) -> str:
+        return request.path_params.get("tenant", "default")
+
+    async def upstream(request: Request, service: str):
+        """Latência simulada; retorna uma resposta de erro se a requisição falhar"""
+        stats[(tenant_of(request), service)] += 1
+        delay = settings.latency_ms + settings.random.uniform(0, settings.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+        if settings.error_rate and settings.random.random() < settings.error_rate:
+            stats[(tenant_of(request), "errors")] += 1
+            return JSONResponse({"code": "503", "message": "Service Unavailable", "details": None, "hint": None},
+                                status_code=503)
+        return None
+
+    async def rest_schema(request: Request):
+        if (error := await upstream(request, "rest")) is not None:
+            return error
+        properties = {column: {"format": fmt, "type": "string"} for column, fmt in TABLE_COLUMNS.items()}
+        return JSONResponse({"definitions": {"orders": {"properties": properties},
+                                             "events": {"properties": properties}}})
+
+    async def rest_table(request: Request):
+        if (error := await upstream(request, "rest")) is not None:
+            return error
+        tenant = tenant_of(request)
+        prefer = request.headers.get("prefer", "")
+        if request.method in ("GET", "HEAD"):
+            limit = int(request.query_params.get("limit", settings.rows))
+            offset = int(request.query_params.get("offset", 0))
+            total = settings.rows
+            count = max(0, min(limit, total - offset))
+            headers = {"Content-Range": f"{offset}-{offset + count - 1}/{total}" if count else f"*/{total}"}
+            if request.method == "HEAD":
+                return Response(headers=headers)
+            rows = [make_row(tenant, offset + n, settings.row_bytes) for n in range(count)]
+            return JSONResponse(rows, headers=headers)
+
+        body = await request.json() if request.method != "DELETE" else None
+        if request.method == "POST":
+            records = body if isinstance(body, list) else [body]
+            stats[(tenant, "rows_inserted")] += len(records)
+            if "return=minimal" in prefer:
+                return Response(status_code=201)
+            return JSONResponse([{"id": n, **record} for n, record in enumerate(records, 1)], status_code=201)
+        return JSONResponse([{"id": 1, **(body or {})}])
+
+    async def rest_rpc(request: Request):
+        if (error := await upstream(request, "rest")) is not None:
+            return error
+        return JSONResponse([])
+
+    async def storage_object(request: Request):
+        if (error := await upstream(request, "storage")) is not None:
+            return error
+        bucket, path = request.path_params["bucket"], request.path_params["path"]
+        if request.method in ("POST", "PUT"):
+            size = 0
+            async for chunk in request.stream():
+                size += len(chunk)
+            objects[(tenant_of(request), bucket, path)] = size
+            return JSONResponse({"Key": f"{bucket}/{path}", "Id": str(uuid.uuid4())})
+        return Response(download, media_type="application/octet-stream")
+
+    async def storage_remove(request: Request):
+        if (error := await upstream(request, "storage")) is not None:
+            return error
+        return JSONResponse([])
+
+    async def storage_list(request: Request):
+        if (error := await upstream(request, "storage")) is not None:
+            return error
+        bucket = request.path_params["bucket"]
+        return JSONResponse([
+            {"name": path, "id": str(uuid.uuid5(uuid.NAMESPACE_URL, path)), "metadata": {"size": size}}
+            for (tenant, name, path), size in objects.items()
+            if tenant == tenant_of(request) and name == bucket
+        ][:100])
+
+    async def storage_buckets(request: Request):
+        if (error := await upstream(request, "storage")) is not None:
+            return error
+        now = "2024-01-01T00:00:00+00:00"
+        return JSONResponse([{"id": "bench", "name": "bench", "owner": "", "public": False,
+                              "created_at": now, "updated_at": now}])
+
+    def user(email: str = "bench@example.com") -> dict:
+        return {"id": str(uuid.uuid5(uuid.NAMESPACE_DNS, email)), "aud": "authenticated", "role": "authenticated",
+                "email": email, "app_metadata": {}, "user_metadata": {}, "created_at": "2024-01-01T00:00:00Z"}
+
+    async def auth_session(request: Request):
+        if (error := await upstream(request, "auth")) is not None:
+            return error
+        body = await request.json()
+        return JSONResponse({
+            "access_token": "eyJhbGciOiJIUzI1NiJ9.e30.fake", "refresh_token": uuid.uuid4().hex,
+            "token_type": "bearer", "expires_in": 3600, "user": user(body.get("email", "bench@example.com")),
+        })
+
+    async def auth_user(request: Request):
+        if (error := await upstream(request, "auth")) is not None:
+            return error
+        return JSONResponse(user())
+
+    async def auth_logout(request: Request):
+        if (error := await upstream(request, "auth")) is not None:
+            return error
+        return Response(status_code=204)
+
+    async def auth_admin_users(request: Request):
+        if (error := await upstream(request, "auth")) is not None:
+            return error
+        per_page = int(request.query_params.get("per_page", 50))
+        return JSONResponse({"users": [user(f"user{n}@example.com") for n in range(per_page)], "aud": "authenticated"})
+
+    async def get_stats(request: Request):
+        return JSONResponse({f"{tenant}/{service}": count for (tenant, service), count in sorted(stats.items())})
+
+    project_routes = [
+        Route("/rest/v1/", rest_schema, methods=["GET"]),
+        Route("/rest/v1/rpc/{function}", rest_rpc, methods=["POST"]),
+        Route("/rest/v1/{table}", rest_table, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        Route("/storage/v1/object/list/{bucket}", storage_list, methods=["POST"]),
+        Route("/storage/v1/object/{bucket}", storage_remove, methods=["DELETE"]),
+        Route("/storage/v1/object/{bucket}/{path:path}", storage_object, methods=["GET", "POST", "PUT"]),
+        Route("/storage/v1/bucket", storage_buckets, methods=["GET"]),
+        Route("/auth/v1/token", auth_session, methods=["POST"]),
+        Route("/auth/v1/signup", auth_session, methods=["POST"]),
+        Route("/auth/v1/user", auth_user, methods=["GET", "PUT"]),
+        Route("/auth/v1/logout", auth_logout, methods=["POST"]),
+        Route("/auth/v1/admin/users", auth_admin_users, methods=["GET"]),
+    ]
+    return Starlette(routes=[
+        Route("/_stats", get_stats, methods=["GET"]),
+        Mount("/t/{tenant}", routes=project_routes),
+        *project_routes,
+    ])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeSupabaseServer:
+    """
+    Executa o stand-in em uma thread ou, com process=True, em um processo
+    separado (sem disputar o GIL com quem gera a carga)
+
+        with FakeSupabaseServer(settings) as server: server.url
+    """
+
+    def __init__(self, settings: FakeSettings = None, port: int = 0, process: bool = False):
+        self.settings = settings or FakeSettings()
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.project_url_template = self.url + "/t/{project}"
+        self.process = process
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self):
+        if self.process:
+            self._process = subprocess.Popen([sys.executable, __file__, "--port", str(self.port), "--quiet",
+                                              *self.settings.as_args()])
+            alive = lambda: self._process.poll() is None
+        else:
+            self._server = uvicorn.Server(uvicorn.Config(
+                create_app(self.settings), host="127.0.0.1", port=self.port, log_level="warning",
+            ))
+            self._thread = threading.Thread(target=self._server.run, daemon=True)
+            self._thread.start()
+            alive = self._thread.is_alive
+        deadline = time.monotonic() + 10
+        while not self._listening():
+            if time.monotonic() > deadline or not alive():
+                self.__exit__()
+                raise RuntimeError(f"Stand-in do Supabase não iniciou na porta {self.port}")
+            time.sleep(0.05)
+        return self
+
+    def _listening(self) -> bool:
+        if self._server is not None:
+            return self._server.started
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                return True
+        except OSError:
+            return False
+
+    def __exit__(self, *exc):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=10)
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=54330)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=100, help="Linhas por seleção (sem limit)")
+    parser.add_argument("--row-bytes", type=int, default=200)
+    parser.add_argument("--object-kb", type=int, default=256, help="Tamanho dos downloads")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--quiet", action="store_true", help="Sem log de acesso")
+    args = parser.parse_args()
+    settings = FakeSettings(args.latency_ms, args.jitter_ms, args.error_rate, args.rows, args.row_bytes,
+                            args.object_kb, seed=args.seed)
+    uvicorn.run(create_app(settings), host="127.0.0.1", port=args.port,
+                log_level="warning" if args.quiet else "info")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Testes de carga do servidor MCP contra o stand-in local do Supabase
+
+Sobe o stand-in (benchmarks/fake_supabase.py) e o servidor alvo — main_fastapi.py
+(uvicorn, /mcp/call_tool) e/ou main.py (stdio, sessão MCP) — e executa cada
+cenário com N chamadas e C chamadas simultâneas, medindo vazão e latência
+p50/p95/p99. Os resultados são gravados em JSON; com --compare, são comparados
+a uma execução anterior e o processo termina com código 1 se p95 ou vazão
+piorarem mais que --tolerance.
+
+Cenários: select, insert, bulk (database_insert com --bulk-rows registros),
+upload, download e mixed (mistura dos anteriores entre --tenants projetos,
+verificando que cada seleção volta com as linhas do próprio projeto).
+
+Uso:
+  python benchmarks/load_test.py --target fastapi,stdio --scenario select,insert,mixed \\
+      --requests 500 --concurrency 32 --latency-ms 20 --output benchmarks/results/atual.json
+  python benchmarks/load_test.py --compare benchmarks/results/base.json --output benchmarks/results/atual.json
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSettings, FakeSupabaseServer, free_port
+
+ANON_KEY = "eyJhbGciOiJIUzI1NiJ9.e30.bench"
+SCENARIOS = ("select", "insert", "bulk", "upload", "download", "mixed")
+# Proporção de cada operação no cenário mixed
+MIXED_WEIGHTS = {"select": 50, "insert": 25, "bulk": 5, "upload": 10, "download": 10}
+
+
+def build_call(scenario: str, n: int, args, rng: random.Random) -> Tuple[str, Dict[str, Any], Optional[str]]:
+    """(ferramenta, argumentos, projeto) da n-ésima chamada do cenário"""
+    tenant = None
+    if scenario == "mixed":
+        scenario = rng.choices(list(MIXED_WEIGHTS), weights=list(MIXED_WEIGHTS.values()))[0]
+        if args.tenants > 1:
+            tenant = f"tenant{n % args.tenants}"
+    row = {"customer": f"cliente-{n}", "status": "new", "amount": n % 1000}
+    if scenario == "select":
+        return "database_select", {"table": "orders", "limit": args.rows}, tenant
+    if scenario == "insert":
+        return "database_insert", {"table": "orders", "data": row}, tenant
+    if scenario == "bulk":
+        return "database_insert", {"table": "orders", "data": [dict(row, n=i) for i in range(args.bulk_rows)]}, tenant
+    if scenario == "upload":
+        return "storage_upload", {
+            "bucket": "bench", "path": f"load/{n}.bin", "file_data": args.upload_payload,
+            "content_type": "application/octet-stream",
+        }, tenant
+    if scenario == "download":
+        return "storage_download", {"bucket": "bench", "path": "load/0.bin"}, tenant
+    raise ValueError(f"Cenário desconhecido: {scenario}")
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Percentil por posição (nearest-rank) de uma lista ordenada"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(latencies: List[float], errors: int, misrouted: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "misrouted": misrouted,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 2),
+            "p95": round(percentile(ordered, 95) * 1000, 2),
+            "p99": round(percentile(ordered, 99) * 1000, 2),
+            "mean": round(sum(ordered) / total * 1000, 2) if total else 0.0,
+            "max": round(ordered[-1] * 1000, 2) if total else 0.0,
+        },
+    }
+
+
+def _is_error(text: str) -> bool:
+    return text.startswith("Erro")
+
+
+class FastAPITarget:
+    """main_fastapi.py servido por uvicorn em um subprocesso; chamadas via /mcp/call_tool"""
+
+    name = "fastapi"
+    supports_tenants = True
+
+    def __init__(self, env: Dict[str, str], log_path: str):
+        self.env = env
+        self.log_path = log_path
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process: Optional[subprocess.Popen] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        log = open(self.log_path, "ab")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main_fastapi:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT, env=self.env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        self._http = httpx.AsyncClient(base_url=self.url, timeout=120,
+                                       limits=httpx.Limits(max_connections=1000, max_keepalive_connections=1000))
+        deadline = time.monotonic() + 30
+        while True:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"main_fastapi.py encerrou ao iniciar (log em {self.log_path})")
+            try:
+                if (await self._http.get("/metrics")).status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"main_fastapi.py não respondeu em 30s (log em {self.log_path})")
+            await asyncio.sleep(0.1)
+
+    async def __aexit__(self, *exc):
+        await self._http.aclose()
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+    async def call(self, tool: str, arguments: Dict[str, Any], tenant: Optional[str]) -> Tuple[bool, str]:
+        headers = {"x-supabase-project": tenant, "x-supabase-token": ANON_KEY} if tenant else {}
+        response = await self._http.post("/mcp/call_tool", json={"name": tool, "arguments": arguments}, headers=headers)
+        if response.status_code != 200:
+            return False, response.text
+        text = response.json()[0]["text"]
+        return not _is_error(text), text
+
+
+class StdioTarget:
+    """main.py em um subprocesso, com uma sessão MCP sobre stdio (apenas o projeto padrão)"""
+
+    name = "stdio"
+    supports_tenants = False
+
+    def __init__(self, env: Dict[str, str], log_path: str):
+        self.env = env
+        self.log_path = log_path
+        self._stack = contextlib.AsyncExitStack()
+        self._session = None
+
+    async def __aenter__(self):
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        params = StdioServerParameters(command=sys.executable, args=[os.path.join(ROOT, "main.py")],
+                                       env={**self.env, "MCP_TRANSPORT": "stdio"}, cwd=ROOT)
+        log = self._stack.enter_context(open(self.log_path, "a"))
+        read, write = await self._stack.enter_async_context(stdio_client(params, errlog=log))
+        self._session = await self._stack.enter_async_context(ClientSession(read, write))
+        await self._session.initialize()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._stack.aclose()
+
+    async def call(self, tool: str, arguments: Dict[str, Any], tenant: Optional[str]) -> Tuple[bool, str]:
+        result = await self._session.call_tool(tool, arguments)
+        text = result.content[0].text if result.content else ""
+        return not (result.isError or _is_error(text)), text
+
+
+async def run_scenario(target, scenario: str, args) -> Dict[str, Any]:
+    """Executa o cenário em malha fechada: C workers, cada um com uma chamada por vez"""
+    rng = random.Random(args.seed)
+    calls = [build_call(scenario, n, args, rng) for n in range(args.warmup + args.requests)]
+    if not target.supports_tenants:
+        calls = [(tool, arguments, None) for tool, arguments, _ in calls]
+
+    for tool, arguments, tenant in calls[:args.warmup]:
+        await target.call(tool, arguments, tenant)
+
+    pending = iter(calls[args.warmup:])
+    latencies: List[float] = []
+    errors = misrouted = 0
+
+    async def worker():
+        nonlocal errors, misrouted
+        for tool, arguments, tenant in pending:
+            started = time.perf_counter()
+            try:
+                ok, text = await target.call(tool, arguments, tenant)
+            except Exception as e:
+                ok, text = False, str(e)
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+            elif tool == "database_select" and f"'tenant': '{tenant or 'default'}'" not in text:
+                # Linhas de outro projeto: a requisição foi atendida pelo cliente errado
+                misrouted += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    return summarize(latencies, errors, misrouted, time.perf_counter() - started)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Imprime a variação em relação à execução de referência e retorna as regressões"""
+    regressions = []
+    print(f"\nComparação com a referência (tolerância {tolerance:.0%}):")
+    for target, scenarios in current["results"].items():
+        for scenario, result in scenarios.items():
+            base = baseline.get("results", {}).get(target, {}).get(scenario)
+            if base is None:
+                continue
+            p95, base_p95 = result["latency_ms"]["p95"], base["latency_ms"]["p95"]
+            rps, base_rps = result["throughput_rps"], base["throughput_rps"]
+            p95_delta = (p95 - base_p95) / base_p95 if base_p95 else 0.0
+            rps_delta = (rps - base_rps) / base_rps if base_rps else 0.0
+            flag = ""
+            if p95_delta > tolerance or rps_delta < -tolerance:
+                flag = "  REGRESSÃO"
+                regressions.append(f"{target}/{scenario}")
+            print(f"  {target:<8} {scenario:<9} p95 {base_p95:8.1f} -> {p95:8.1f} ms ({p95_delta:+.0%})  "
+                  f"vazão {base_rps:8.1f} -> {rps:8.1f} req/s ({rps_delta:+.0%}){flag}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def server_env(fake: FakeSupabaseServer, workdir: str, overrides: List[str]) -> Dict[str, str]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DEFAULT_SUPABASE_URL": fake.url,
+        "DEFAULT_SUPABASE_ANON_KEY": ANON_KEY,
+        "DEFAULT_SUPABASE_SERVICE_KEY": ANON_KEY,
+        "SUPABASE_PROJECT_URL_TEMPLATE": fake.project_url_template,
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "BULK_CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+        # Mede o servidor, não o limite por projeto (reative com --env RATE_LIMIT_ENABLED=true)
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    for item in overrides:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+async def main(args) -> int:
+    targets = [name.strip() for name in args.target.split(",") if name.strip()]
+    scenarios = [name.strip() for name in args.scenario.split(",") if name.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            sys.exit(f"Cenário desconhecido: {name} (disponíveis: {', '.join(SCENARIOS)})")
+    args.upload_payload = base64.b64encode(os.urandom(args.object_kb * 1024)).decode("ascii")
+
+    settings = FakeSettings(args.latency_ms, args.jitter_ms, args.error_rate, args.rows, args.row_bytes,
+                            args.object_kb, seed=args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "tenants": args.tenants,
+            "bulk_rows": args.bulk_rows,
+            "fake_supabase": settings.as_dict(),
+            "env": args.env,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir, FakeSupabaseServer(settings, process=True) as fake:
+        env = server_env(fake, workdir, args.env)
+        log_path = args.server_log or os.path.join(workdir, "server.log")
+        for target_name in targets:
+            target_class = {"fastapi": FastAPITarget, "stdio": StdioTarget}.get(target_name)
+            if target_class is None:
+                sys.exit(f"Alvo desconhecido: {target_name} (use fastapi e/ou stdio)")
+            async with target_class(env, log_path) as target:
+                # O download lê o objeto enviado no upload
+                await target.call(*build_call("upload", 0, args, random.Random()))
+                for scenario in scenarios:
+                    result = await run_scenario(target, scenario, args)
+                    report["results"].setdefault(target_name, {})[scenario] = result
+                    latency = result["latency_ms"]
+                    print(f"{target_name:<8} {scenario:<9} {result['throughput_rps']:9.1f} req/s  "
+                          f"p50 {latency['p50']:8.1f}  p95 {latency['p95']:8.1f}  p99 {latency['p99']:8.1f} ms  "
+                          f"erros {result['errors']:4d}  projeto errado {result['misrouted']:4d}")
+        report["meta"]["fake_supabase_requests"] = httpx.get(f"{fake.url}/_stats").json()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", default="fastapi", help="fastapi, stdio ou ambos (separados por vírgula)")
+    parser.add_argument("--scenario", default="select,insert,bulk,upload,download,mixed")
+    parser.add_argument("--requests", type=int, default=300, help="Chamadas medidas por cenário")
+    parser.add_argument("--warmup", type=int, default=20, help="Chamadas de aquecimento (não medidas)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tenants", type=int, default=4, help="Projetos no cenário mixed (apenas fastapi)")
+    parser.add_argument("--latency-ms", type=float, default=10, help="Latência do upstream simulado")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 503 do upstream")
+    parser.add_argument("--rows", type=int, default=100, help="Linhas por seleção")
+    parser.add_argument("--row-bytes", type=int, default=200)
+    parser.add_argument("--bulk-rows", type=int, default=1000)
+    parser.add_argument("--object-kb", type=int, default=256, help="Tamanho dos uploads e downloads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="CHAVE=VALOR",
+                        help="Variável de ambiente extra para o servidor (repetível)")
+    parser.add_argument("--server-log", help="Arquivo de log do servidor (padrão: temporário)")
+    parser.add_argument("--output", help="Arquivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora aceita de p95/vazão (0.2 = 20%%)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
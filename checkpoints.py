@@ -0,0 +1,69 @@
+"""
+Checkpoints de operações em lote (importação/exportação)
+
+Cada operação grava seu progresso em um arquivo JSON por (projeto, job_id);
+uma nova chamada com o mesmo job_id continua do último ponto salvo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+    """Checkpoints persistidos em disco, com escrita atômica"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, tenant: str, job_id: str) -> str:
+        digest = hashlib.sha256(f"{tenant}\0{job_id}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, tenant: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o último estado salvo (ou None)"""
+        try:
+            with open(self._path(tenant, job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint ilegível para {job_id}: {str(e)}")
+            return None
+
+    def save(self, tenant: str, job_id: str, state: Dict[str, Any]):
+        """Grava o estado (arquivo temporário + rename, nunca deixa um checkpoint parcial)"""
+        path = self._path(tenant, job_id)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({**state, "job_id": job_id, "tenant": tenant}, f)
+            os.replace(temp_path, path)
+
+    def clear(self, tenant: str, job_id: str):
+        """Remove o checkpoint (operação concluída ou reiniciada)"""
+        try:
+            os.remove(self._path(tenant, job_id))
+        except FileNotFoundError:
+            pass
+
+
+# Stores por diretório
+_stores: Dict[str, CheckpointStore] = {}
+
+
+def get_checkpoint_store(config: Config) -> CheckpointStore:
+    """Retorna o store do diretório configurado (BULK_CHECKPOINT_DIR)"""
+    store = _stores.get(config.bulk_checkpoint_dir)
+    if store is None:
+        store = _stores[config.bulk_checkpoint_dir] = CheckpointStore(config.bulk_checkpoint_dir)
+    return store
@@ -0,0 +1,385 @@
+"""
+Compressão das respostas e corpos comprimidos em /mcp/*
+
+A codificação da resposta é negociada pelo Accept-Encoding entre as de
+COMPRESSION_ENCODINGS disponíveis (zstd e br dependem dos pacotes opcionais
+zstandard e brotli; gzip sempre existe). Respostas menores que
+COMPRESSION_MIN_SIZE seguem sem compressão; respostas em streaming
+(NDJSON/CSV/Arrow) são comprimidas bloco a bloco, com flush a cada bloco para o
+cliente receber as linhas assim que chegam. Corpos de requisição com
+Content-Encoding (gzip, deflate e br) são descomprimidos à medida que são
+lidos, em blocos de tamanho limitado, de modo que os limites de tamanho valem
+para o corpo descomprimido.
+"""
+
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import Config
+from executors import run_blocking
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Corpos acima deste tamanho são comprimidos em uma thread, fora do event loop
+OFFLOAD_SIZE = 256 * 1024
+# Saída máxima de cada bloco descomprimido (gzip/deflate) entregue ao endpoint
+DECODE_CHUNK_SIZE = 1024 * 1024
+
+# Tipos já comprimidos ou que não se beneficiam da compressão
+INCOMPRESSIBLE_TYPES = (
+    "application/vnd.apache.parquet", "application/zip", "application/gzip", "application/zstd",
+    "image/", "video/", "audio/", "text/event-stream",
+)
+
+
+class InvalidContentEncoding(ValueError):
+    """Corpo da requisição não corresponde ao Content-Encoding declarado"""
+
+
+class _ZlibEncoder:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.process(data) + self._obj.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Codificação de resposta -> (fábrica do compressor, nível padrão)
+ENCODERS: Dict[str, tuple] = {"gzip": (_ZlibEncoder, 6)}
+if brotli is not None:
+    ENCODERS["br"] = (_BrotliEncoder, 4)
+if zstandard is not None:
+    ENCODERS["zstd"] = (_ZstdEncoder, 3)
+
+
+def available_encodings(preferred: List[str]) -> List[str]:
+    """Codificações de resposta configuradas e disponíveis, na ordem de preferência do servidor"""
+    return [encoding for encoding in preferred if encoding in ENCODERS]
+
+
+def negotiate(accept_encoding: Optional[str], supported: List[str]) -> Optional[str]:
+    """
+    Escolhe a codificação pelo Accept-Encoding (com pesos q); empates ficam com
+    a ordem do servidor. Sem header ou sem codificação aceitável, None (identity)
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    default = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, default)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def create_encoder(encoding: str, levels: Dict[str, int] = None):
+    """Compressor incremental (compress por bloco com flush, finish no último)"""
+    factory, level = ENCODERS[encoding]
+    return factory((levels or {}).get(encoding, level))
+
+
+class _ZlibDecoder:
+    def __init__(self, wbits: int):
+        self._obj = zlib.decompressobj(wbits)
+        self._tail = b""
+        self.has_pending = False
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        """Até max_length bytes (0 = sem limite); com has_pending, chamar de novo com b"""""
+        out = self._obj.decompress(self._tail + data, max_length)
+        self._tail = self._obj.unconsumed_tail
+        # Limite atingido: pode haver saída retida no zlib mesmo sem entrada restante
+        self.has_pending = bool(self._tail) or (bool(max_length) and len(out) >= max_length and not self._obj.eof)
+        return out
+
+    def flush(self) -> bytes:
+        data = self._obj.flush()
+        if not self._obj.eof:
+            raise zlib.error("stream truncado")
+        return data
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+        self._excess = b""
+        self._saturated = False
+        self.has_pending = False
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        if not max_length:
+            out, self._excess = self._excess + self._obj.process(data), b""
+            return out
+        out = self._excess
+        if data or (len(out) < max_length and self._saturated):
+            # output_buffer_limit é aproximado (o buffer interno pode dobrar): o
+            # excedente fica guardado para a próxima chamada
+            produced = self._obj.process(data, output_buffer_limit=max_length)
+            self._saturated = not self._obj.can_accept_more_data() or (
+                len(produced) >= max_length and not self._obj.is_finished()
+            )
+            out += produced
+        out, self._excess = out[:max_length], out[max_length:]
+        self.has_pending = bool(self._excess) or self._saturated
+        return out
+
+    def flush(self) -> bytes:
+        if not self._obj.is_finished():
+            raise brotli.error("stream truncado")
+        return b""
+
+
+# Content-Encoding aceito nas requisições -> fábrica do descompressor. Apenas
+# codificações com saída limitada por chamada: um corpo pequeno pode expandir
+# para gigabytes antes de qualquer limite de tamanho ser verificado. zstd fica
+# de fora (o zstandard não limita a saída de decompressobj) e br exige o
+# brotli >= 1.2 (output_buffer_limit)
+DECODERS: Dict[str, Callable] = {
+    "gzip": lambda: _ZlibDecoder(16 + zlib.MAX_WBITS),
+    "x-gzip": lambda: _ZlibDecoder(16 + zlib.MAX_WBITS),
+    "deflate": lambda: _ZlibDecoder(zlib.MAX_WBITS),
+}
+if brotli is not None and hasattr(brotli.Decompressor, "can_accept_more_data"):
+    DECODERS["br"] = _BrotliDecoder
+
+_DECODE_ERRORS = tuple(
+    error for error in (zlib.error, getattr(brotli, "error", None)) if error is not None
+)
+
+
+class DecompressingReceive:
+    """
+    Envolve o receive do ASGI descomprimindo o corpo; cada mensagem entregue tem
+    no máximo DECODE_CHUNK_SIZE bytes, e o restante fica para a próxima leitura
+    """
+
+    def __init__(self, receive: Receive, encoding: str, chunk_size: int = DECODE_CHUNK_SIZE):
+        self._receive = receive
+        self.encoding = encoding
+        self._decoder = DECODERS[encoding]()
+        self._chunk_size = chunk_size
+        self._more_body = True
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self) -> Message:
+        if self._decoder.has_pending:
+            return self._decode(b"", self._more_body)
+        if not self._more_body:
+            return await self._receive()
+        message = await self._receive()
+        if message["type"] != "http.request":
+            return message
+        self._more_body = message.get("more_body", False)
+        body = message.get("body", b"")
+        self.bytes_in += len(body)
+        return self._decode(body, self._more_body)
+
+    def _decode(self, data: bytes, more_body: bool) -> Message:
+        started = time.perf_counter()
+        try:
+            body = self._decoder.decompress(data, self._chunk_size)
+            pending = self._decoder.has_pending
+            if not more_body and not pending:
+                body += self._decoder.flush()
+        except _DECODE_ERRORS as e:
+            raise InvalidContentEncoding(f"Corpo inválido para Content-Encoding {self.encoding}: {e}")
+        self.bytes_out += len(body)
+        _record("request", self.encoding, time.perf_counter() - started)
+        return {"type": "http.request", "body": body, "more_body": more_body or pending}
+
+    def report(self):
+        _record_bytes("request", self.encoding, self.bytes_in, self.bytes_out)
+
+
+def _record(direction: str, encoding: str, seconds: float):
+    metrics.inc_counter(
+        "mcp_compression_seconds_total", seconds, labels={"direction": direction, "encoding": encoding},
+        help="Tempo gasto comprimindo respostas e descomprimindo requisições",
+    )
+
+
+def _record_bytes(direction: str, encoding: str, compressed: int, uncompressed: int):
+    labels = {"direction": direction, "encoding": encoding}
+    metrics.inc_counter("mcp_compression_compressed_bytes_total", compressed, labels=labels,
+                        help="Bytes comprimidos enviados (respostas) ou recebidos (requisições)")
+    metrics.inc_counter("mcp_compression_uncompressed_bytes_total", uncompressed, labels=labels,
+                        help="Bytes antes da compressão (respostas) ou depois da descompressão (requisições)")
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compressão de respostas e descompressão de corpos em /mcp/*"""
+
+    def __init__(self, app: ASGIApp, config: Config, path_prefix: str = "/mcp"):
+        self.app = app
+        self.config = config
+        self.path_prefix = path_prefix
+        self.encodings = available_encodings(config.compression_encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (scope["type"] != "http" or not self.config.compression_enabled
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        decoder = None
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            if content_encoding not in DECODERS:
+                await self._unsupported_encoding(content_encoding, send)
+                return
+            # Os limites de tamanho valem para o corpo descomprimido
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+            receive = decoder = DecompressingReceive(receive, content_encoding)
+
+        encoding = negotiate(headers.get("accept-encoding"), self.encodings)
+        if encoding and scope["method"] != "HEAD":
+            send = _CompressingSend(send, encoding, self.config)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if decoder is not None:
+                decoder.report()
+
+    async def _unsupported_encoding(self, encoding: str, send: Send):
+        body = f'{{"detail":"Content-Encoding não suportado: {encoding}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 415,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"accept-encoding", ", ".join(DECODERS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class _CompressingSend:
+    """Comprime o corpo da resposta enviado pelo app, se o tipo e o tamanho justificarem"""
+
+    def __init__(self, send: Send, encoding: str, config: Config):
+        self._send = send
+        self.encoding = encoding
+        self.config = config
+        self._start: Optional[Message] = None
+        self._encoder = None
+        self._raw = 0
+        self._compressed = 0
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or (self._start is None and self._encoder is None):
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._start is not None:
+            start, self._start = self._start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._compressible(start["status"], headers) or (not more_body and len(body) < self.config.compression_min_size):
+                await self._send(start)
+                await self._send(message)
+                return
+            self._encoder = create_encoder(self.encoding, self.config.compression_levels)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Streaming: tamanho final desconhecido
+                del headers["Content-Length"]
+            else:
+                data = await self._encode(body, final=True)
+                headers["Content-Length"] = str(len(data))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": data})
+                self._report()
+                return
+            await self._send(start)
+
+        data = await self._encode(body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+        if not more_body:
+            self._report()
+
+    def _compressible(self, status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+    async def _encode(self, body: bytes, final: bool) -> bytes:
+        encode = self._encoder.finish if final else self._encoder.compress
+        started = time.perf_counter()
+        if len(body) > OFFLOAD_SIZE:
+            data = await run_blocking(self.config, "compress", lambda: encode(body))
+        else:
+            data = encode(body)
+        _record("response", self.encoding, time.perf_counter() - started)
+        self._raw += len(body)
+        self._compressed += len(data)
+        return data
+
+    def _report(self):
+        _record_bytes("response", self.encoding, self._compressed, self._raw)
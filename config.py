@@ -2,8 +2,10 @@
 Configurações dinâmicas do servidor MCP Supabase
 """
 
+import hashlib
 import os
 from typing import Optional, Dict, Any
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
@@ -21,12 +23,194 @@ class Config:
         # Configurações dinâmicas
         self.project_code = project_code
         self.access_token = access_token
+        # URL dos projetos dinâmicos (ex.: Supabase self-hosted ou o stand-in local dos benchmarks)
+        self.project_url_template = os.getenv("SUPABASE_PROJECT_URL_TEMPLATE", "https://{project}.supabase.co")
         
         # Configurações do servidor
         self.debug = os.getenv("DEBUG", "false").lower() == "true"
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
         self.request_timeout = int(os.getenv("REQUEST_TIMEOUT", "30"))
         
+        # Verificação local de JWT
+        self.default_supabase_jwt_secret = os.getenv("DEFAULT_SUPABASE_JWT_SECRET")
+        self.jwt_audience = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+        self.jwks_cache_ttl = int(os.getenv("JWKS_CACHE_TTL", "600"))
+        self.jwt_cache_size = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+        
+        # Operações administrativas em lote
+        self.admin_concurrency = int(os.getenv("ADMIN_CONCURRENCY", "10"))
+        self.admin_page_size = int(os.getenv("ADMIN_PAGE_SIZE", "100"))
+        
+        # Transporte HTTP compartilhado (pools keep-alive por host)
+        self.http2_enabled = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+        self.http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.http_keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.http_services = {
+            service: {
+                "connect_timeout": float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", self.http_connect_timeout)),
+                "read_timeout": float(os.getenv(f"{prefix}_READ_TIMEOUT", default_read)),
+                "max_connections": int(os.getenv(f"{prefix}_MAX_CONNECTIONS", default_connections)),
+                "max_keepalive_connections": int(os.getenv(f"{prefix}_MAX_KEEPALIVE", default_keepalive)),
+            }
+            for service, prefix, default_read, default_connections, default_keepalive in (
+                ("rest", "REST", self.request_timeout, 50, 20),
+                ("auth", "AUTH", self.request_timeout, 20, 10),
+                ("storage", "STORAGE", max(self.request_timeout, 120), 20, 10),
+                ("functions", "FUNCTIONS", self.request_timeout, 10, 5),
+            )
+        }
+        
+        # Resiliência (retry, hedging e circuit breaker)
+        self.retry_max_attempts = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+        self.retry_base_delay = float(os.getenv("RETRY_BASE_DELAY", "0.1"))
+        self.retry_max_delay = float(os.getenv("RETRY_MAX_DELAY", "2"))
+        self.hedge_enabled = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        self.breaker_failure_threshold = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.breaker_reset_timeout = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+        
+        # Limite adaptativo (AIMD) de requisições simultâneas por projeto e serviço
+        self.adaptive_limit_enabled = os.getenv("ADAPTIVE_LIMIT_ENABLED", "true").lower() == "true"
+        self.adaptive_limit_initial = int(os.getenv("ADAPTIVE_LIMIT_INITIAL", "20"))
+        self.adaptive_limit_min = int(os.getenv("ADAPTIVE_LIMIT_MIN", "1"))
+        self.adaptive_limit_max = int(os.getenv("ADAPTIVE_LIMIT_MAX", "200"))
+        self.adaptive_limit_backoff = float(os.getenv("ADAPTIVE_LIMIT_BACKOFF", "0.9"))
+        self.adaptive_limit_latency_tolerance = float(os.getenv("ADAPTIVE_LIMIT_LATENCY_TOLERANCE", "2.0"))
+        
+        # Limites por projeto no servidor HTTP
+        self.rate_limit_enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.rate_limit_rps = float(os.getenv("RATE_LIMIT_RPS", "50"))
+        self.rate_limit_burst = float(os.getenv("RATE_LIMIT_BURST", "100"))
+        self.rate_limit_max_in_flight = int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT", "20"))
+        self.rate_limit_max_tenants = int(os.getenv("RATE_LIMIT_MAX_TENANTS", "10000"))
+        self.rate_limit_backend = os.getenv("RATE_LIMIT_BACKEND", "")
+        
+        # Backend Postgres direto (asyncpg) para SQL
+        self.default_supabase_db_url = os.getenv("DEFAULT_SUPABASE_DB_URL")
+        self.db_pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+        self.db_pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+        self.db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        
+        # Streaming de resultados grandes
+        self.stream_chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+        self.stream_max_rows = int(os.getenv("STREAM_MAX_ROWS", "1000000"))
+        self.stream_max_bytes = int(os.getenv("STREAM_MAX_BYTES", str(512 * 1024 * 1024)))
+        
+        # Consultas em paralelo entre tabelas e projetos
+        self.multi_select_concurrency = int(os.getenv("MULTI_SELECT_CONCURRENCY", "8"))
+        self.multi_select_timeout = float(os.getenv("MULTI_SELECT_TIMEOUT", "10"))
+        self.tenant_client_cache_size = int(os.getenv("TENANT_CLIENT_CACHE_SIZE", "64"))
+        
+        # Validação de filtros contra o schema das tabelas
+        self.validate_filters = os.getenv("VALIDATE_FILTERS", "true").lower() == "true"
+        self.schema_cache_ttl = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+        
+        # Log de consultas lentas (0 desabilita)
+        self.slow_query_threshold_ms = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "1000"))
+        self.slow_query_capture_plan = os.getenv("SLOW_QUERY_CAPTURE_PLAN", "true").lower() == "true"
+        
+        # Importação/exportação em lote (database_import/database_export)
+        self.bulk_chunk_size = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+        self.bulk_checkpoint_dir = os.getenv("BULK_CHECKPOINT_DIR", ".checkpoints")
+        # O upload resumível do Storage exige partes de 6 MB
+        self.storage_upload_part_size = int(os.getenv("STORAGE_UPLOAD_PART_SIZE", str(6 * 1024 * 1024)))
+        
+        # Pools de threads das chamadas síncronas do SDK (Storage separado das demais)
+        self.executor_workers = int(os.getenv("EXECUTOR_WORKERS", "32"))
+        self.storage_executor_workers = int(os.getenv("STORAGE_EXECUTOR_WORKERS", "8"))
+        # Escalonador de chamadas por classe (interactive/default/bulk) e projeto
+        self.scheduler_enabled = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+        self.scheduler_concurrency = int(os.getenv("SCHEDULER_CONCURRENCY", "32"))
+        self.scheduler_weights = {
+            cls.strip(): float(weight)
+            for cls, _, weight in (item.partition("=") for item in
+                                   os.getenv("SCHEDULER_WEIGHTS", "interactive=8,default=4,bulk=1").split(","))
+            if cls.strip() and weight.strip()
+        }
+        self.scheduler_bulk_max_share = float(os.getenv("SCHEDULER_BULK_MAX_SHARE", "0.75"))
+        # Classe por ferramenta ("nome=classe,..."); sem entrada, auth_*/job_* são interactive e as demais default
+        self.tool_classes = {
+            "storage_upload": "bulk",
+            "storage_download": "bulk",
+            "database_import": "bulk",
+            "database_export": "bulk",
+        }
+        self.tool_classes.update({
+            tool.strip(): cls.strip()
+            for tool, _, cls in (item.partition("=") for item in os.getenv("TOOL_CLASSES", "").split(","))
+            if tool.strip() and cls.strip()
+        })
+        
+        # Chamadas de ferramenta simultâneas por sessão MCP
+        self.mcp_session_concurrency = int(os.getenv("MCP_SESSION_CONCURRENCY", "8"))
+        
+        # Write-behind de inserções de um registro (opt-in; também por chamada com "write_behind")
+        self.write_behind_enabled = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+        self.write_behind_max_batch = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+        self.write_behind_max_delay_ms = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "50"))
+        
+        # Chaves de idempotência: validade das respostas, entradas em memória e SQLite opcional
+        self.idempotency_ttl = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+        self.idempotency_max_entries = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+        self.idempotency_db_path = os.getenv("IDEMPOTENCY_DB_PATH", "")
+        
+        # Jobs em segundo plano ("async": true): workers, banco SQLite e validade dos resultados
+        self.job_workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.job_db_path = os.getenv("JOB_DB_PATH", ".jobs.sqlite3")
+        self.job_result_ttl = float(os.getenv("JOB_RESULT_TTL", "86400"))
+        
+        # Transporte MCP do main.py: "stdio" ou "http" (streamable HTTP + SSE)
+        self.mcp_transport = os.getenv("MCP_TRANSPORT", "stdio")
+        self.mcp_http_host = os.getenv("MCP_HTTP_HOST", "0.0.0.0")
+        self.mcp_http_port = int(os.getenv("MCP_HTTP_PORT", "8000"))
+        self.mcp_stateless = os.getenv("MCP_STATELESS", "false").lower() == "true"
+        self.mcp_json_response = os.getenv("MCP_JSON_RESPONSE", "false").lower() == "true"
+        
+        # Limites do corpo de /mcp/call_tool (padrão e por ferramenta: "nome=bytes,...")
+        self.max_body_bytes = int(os.getenv("MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+        self.tool_body_limits = {
+            tool.strip(): int(limit)
+            for tool, _, limit in (item.partition("=") for item in os.getenv("TOOL_BODY_LIMITS", "").split(","))
+            if tool.strip() and limit.strip()
+        }
+        
+        # Compressão das respostas de /mcp/* (Accept-Encoding) e corpos com Content-Encoding
+        self.compression_enabled = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+        self.compression_min_size = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        # Ordem de preferência do servidor; zstd e br exigem os pacotes zstandard e brotli
+        self.compression_encodings = [
+            encoding.strip().lower()
+            for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+            if encoding.strip()
+        ]
+        # Nível por codificação ("gzip=6,br=4,zstd=3"); sem entrada, o padrão de cada uma
+        self.compression_levels = {
+            encoding.strip().lower(): int(level)
+            for encoding, _, level in (item.partition("=") for item in os.getenv("COMPRESSION_LEVELS", "").split(","))
+            if encoding.strip() and level.strip()
+        }
+        
+        # Prazo padrão por ferramenta em segundos ("nome=segundos,..."; 0 = sem prazo).
+        # Sem entrada, vale REQUEST_TIMEOUT; o header x-request-timeout só pode encurtá-lo.
+        # Escritas em lote não têm prazo: interrompidas no meio, deixariam blocos já
+        # gravados e a thread do SDK ainda gravando, e um retry gravaria de novo
+        self.tool_timeouts = {
+            "storage_upload": max(self.request_timeout, 120),
+            "storage_download": max(self.request_timeout, 120),
+            "database_import": 0,
+            "database_export": 0,
+            "database_insert": 0,
+            "database_transaction": 0,
+            "auth_create_users": 0,
+            "auth_delete_users": 0,
+        }
+        self.tool_timeouts.update({
+            tool.strip(): float(seconds)
+            for tool, _, seconds in (item.partition("=") for item in os.getenv("TOOL_TIMEOUTS", "").split(","))
+            if tool.strip() and seconds.strip()
+        })
+        
         # Se não houver configuração dinâmica, usar padrão
         if not self.project_code and not self.default_supabase_url:
             raise ValueError("Nenhuma configuração do Supabase fornecida")
@@ -36,7 +220,7 @@ class Config:
         if self.project_code and self.access_token:
             # Configuração dinâmica
             return {
-                "url": f"https://{self.project_code}.supabase.co",
+                "url": self.project_url_template.format(project=self.project_code),
                 "key": self.access_token,
                 "service_key": self.access_token  # Usar o mesmo token como service key
             }
@@ -63,6 +247,44 @@ class Config:
         config = self.get_supabase_config()
         return config["service_key"]
     
+    def get_supabase_jwt_secret(self) -> Optional[str]:
+        """Retorna o segredo JWT (HS256) do projeto padrão, se configurado"""
+        if self.is_dynamic_config():
+            # Projetos dinâmicos não informam o segredo; usar apenas JWKS
+            return None
+        return self.default_supabase_jwt_secret
+    
+    def get_database_url(self) -> Optional[str]:
+        """Retorna o DSN do Postgres do projeto (SUPABASE_DB_URL_<PROJETO> em projetos dinâmicos)"""
+        if self.is_dynamic_config():
+            return os.getenv(f"SUPABASE_DB_URL_{self.project_code.upper().replace('-', '_')}")
+        return self.default_supabase_db_url
+    
+    def get_tenant_id(self) -> str:
+        """Identificador do projeto atual (usado em caches, limites e métricas)"""
+        if self.project_code:
+            return self.project_code
+        return urlparse(self.default_supabase_url or "").netloc or "default"
+    
+    def get_credential_id(self) -> str:
+        """Hash da chave em uso: distingue principais (anon, JWT de usuário, service) do mesmo projeto"""
+        return hashlib.sha256(self.get_supabase_key().encode("utf-8")).hexdigest()
+    
+    def get_http_settings(self, service: str) -> Dict[str, Any]:
+        """Retorna timeouts e limites de pool de um serviço upstream"""
+        return self.http_services.get(service, self.http_services["rest"])
+    
+    def get_body_limit(self, tool: Optional[str] = None) -> int:
+        """Tamanho máximo do corpo da requisição para a ferramenta"""
+        return self.tool_body_limits.get(tool, self.max_body_bytes)
+    
+    def get_tool_timeout(self, tool: Optional[str] = None, requested: Optional[float] = None) -> Optional[float]:
+        """Prazo da chamada: o padrão da ferramenta, encurtado pelo pedido do cliente (None = sem prazo)"""
+        default = self.tool_timeouts.get(tool, self.request_timeout) or None
+        if requested is None:
+            return default
+        return requested if default is None else min(requested, default)
+    
     def is_dynamic_config(self) -> bool:
         """Verifica se está usando configuração dinâmica"""
         return bool(self.project_code and self.access_token)
@@ -0,0 +1,72 @@
+"""
+Prazos (deadlines) por requisição
+
+O prazo de uma chamada de ferramenta vem do header x-request-timeout ou do
+padrão da ferramenta (TOOL_TIMEOUTS, ou REQUEST_TIMEOUT) e fica em uma
+contextvar: call_upstream, o backend Postgres e as requisições HTTP diretas
+usam apenas o tempo restante, e nada segue para o upstream depois do prazo.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Any, Optional
+
+import httpx
+
+# Instante (time.monotonic) em que a requisição atual expira
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo da requisição se esgotou"""
+
+    def __init__(self, operation: Optional[str] = None):
+        target = f" em {operation}" if operation else ""
+        super().__init__(f"Prazo da requisição esgotado{target}")
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """Segundos de um header x-request-timeout ("30", "2.5"); None se ausente ou inválido"""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds > 0 else None
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Limita o bloco a `seconds` (nunca estende um prazo já definido)"""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def clear_deadline():
+    """Remove o prazo do contexto atual (tarefas que sobrevivem à requisição, como jobs)"""
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """Segundos até o prazo (None sem prazo); levanta DeadlineExceeded se já passou"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left
+
+
+def http_timeout() -> Any:
+    """Timeout para uma requisição httpx: o tempo restante, ou o padrão do cliente"""
+    left = remaining()
+    return httpx.USE_CLIENT_DEFAULT if left is None else left
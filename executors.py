@@ -0,0 +1,54 @@
+"""
+Executores limitados para as chamadas síncronas do SDK
+
+As chamadas bloqueantes rodam em pools de threads separados por "faixa":
+uploads/downloads do Storage, que podem levar minutos, não ocupam as threads
+usadas por seleções e demais chamadas rápidas. Cancelar a corrotina que
+aguarda a chamada libera o chamador imediatamente; a thread termina a
+requisição HTTP em andamento e volta ao pool.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import Config
+
+# Operações (nomes usados em call_upstream) atendidas pela faixa do Storage
+STORAGE_OPERATIONS = {"upload", "download", "upload_status", "list_files", "remove_files", "list_buckets"}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def lane_for(operation: str) -> str:
+    """Faixa de execução de uma operação"""
+    return "storage" if operation in STORAGE_OPERATIONS else "default"
+
+
+def get_executor(config: Config, lane: str) -> ThreadPoolExecutor:
+    """Retorna o pool da faixa, criado na primeira chamada com o tamanho configurado"""
+    with _executors_lock:
+        executor = _executors.get(lane)
+        if executor is None:
+            workers = config.storage_executor_workers if lane == "storage" else config.executor_workers
+            executor = _executors[lane] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"supabase-{lane}")
+        return executor
+
+
+async def run_blocking(config: Config, operation: str, fn: Callable[[], Any]) -> Any:
+    """Executa fn na faixa da operação, preservando as contextvars (como asyncio.to_thread)"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn)
+    return await loop.run_in_executor(get_executor(config, lane_for(operation)), call)
+
+
+def shutdown_executors():
+    """Encerra os pools (chamar no desligamento)"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
@@ -0,0 +1,371 @@
+"""
+Compilador de filtros para o PostgREST
+
+Converte filtros estruturados (incluindo grupos "or"/"and" aninhados) em
+parâmetros do PostgREST ou em uma cláusula WHERE parametrizada (backend
+Postgres direto), validando colunas e operadores contra o schema da
+tabela e convertendo os valores para o tipo da coluna. O formato de cada
+consulta (tabela, colunas, operadores, estrutura dos grupos) é compilado
+uma única vez e memoizado; chamadas repetidas apenas aplicam os valores.
+
+Formato dos filtros:
+    {"column": "age", "operator": "gte", "value": 18}
+    {"column": "status", "operator": "in", "value": ["new", "open"]}
+    {"column": "price", "operator": "between", "value": [10, 20]}
+    {"column": "body", "operator": "fts", "value": "gato & cão", "config": "portuguese"}
+    {"column": "deleted_at", "operator": "is", "value": null, "negate": true}
+    {"or": [{...}, {"and": [{...}, {...}]}]}
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from postgres_backend import quote_ident
+
+COMPARISON_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte"}
+PATTERN_OPERATORS = {"like", "ilike"}
+TEXT_SEARCH_OPERATORS = {"fts", "plfts", "phfts", "wfts"}
+ALL_OPERATORS = COMPARISON_OPERATORS | PATTERN_OPERATORS | TEXT_SEARCH_OPERATORS | {"is", "in", "between"}
+
+IS_VALUES = {"null", "true", "false", "unknown"}
+
+# Tipos (formato do OpenAPI do PostgREST) agrupados por família
+INTEGER_TYPES = {"integer", "bigint", "smallint"}
+FLOAT_TYPES = {"numeric", "real", "double precision"}
+TEXT_TYPES = {"text", "character varying", "character", "citext", "name"}
+TIMESTAMP_TYPES = {"timestamp with time zone", "timestamp without time zone"}
+
+# Caracteres reservados que exigem aspas em listas e grupos lógicos
+RESERVED_CHARS = set(',.:()"\\ ')
+
+# Entrada compilada: ("filter", coluna, operador, critério) ou ("or", expressão)
+FilterEntry = Tuple[str, ...]
+
+# Equivalentes SQL dos operadores (backend Postgres direto)
+SQL_OPERATORS = {
+    "eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+    "like": "LIKE", "ilike": "ILIKE",
+}
+SQL_TEXT_SEARCH = {"fts": "to_tsquery", "plfts": "plainto_tsquery", "phfts": "phraseto_tsquery",
+                   "wfts": "websearch_to_tsquery"}
+
+
+class FilterValidationError(ValueError):
+    """Filtro inválido para o schema da tabela"""
+
+
+def _to_bool(value: Any) -> str:
+    text = str(value).strip().lower()
+    if text in ("true", "t", "1"):
+        return "true"
+    if text in ("false", "f", "0"):
+        return "false"
+    raise ValueError("booleano esperado")
+
+
+def _to_timestamp(value: Any) -> str:
+    text = str(value)
+    datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return text
+
+
+def _to_date(value: Any) -> str:
+    text = str(value)
+    date.fromisoformat(text)
+    return text
+
+
+def _to_float(value: Any) -> str:
+    float(value)
+    return str(value)
+
+
+def coercer_for(column_type: Optional[str]) -> Callable[[Any], str]:
+    """Retorna a função que valida e normaliza um valor para o tipo da coluna"""
+    if column_type in INTEGER_TYPES:
+        return lambda v: str(int(v))
+    if column_type in FLOAT_TYPES:
+        return _to_float
+    if column_type == "boolean":
+        return _to_bool
+    if column_type == "uuid":
+        return lambda v: str(uuid.UUID(str(v)))
+    if column_type in TIMESTAMP_TYPES:
+        return _to_timestamp
+    if column_type == "date":
+        return _to_date
+    return lambda v: "true" if v is True else "false" if v is False else str(v)
+
+
+def quote_value(value: str) -> str:
+    """Cita um valor com caracteres reservados (listas e grupos lógicos)"""
+    if any(char in RESERVED_CHARS for char in value):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return value
+
+
+class Condition:
+    """Condição folha já validada, com o conversor de valor resolvido"""
+
+    __slots__ = ("column", "operator", "negate", "coerce", "config")
+
+    def __init__(self, column: str, operator: str, negate: bool, coerce: Callable[[Any], str], config: Optional[str]):
+        self.column = column
+        self.operator = operator
+        self.negate = negate
+        self.coerce = coerce
+        self.config = config
+
+    def _operator(self) -> str:
+        operator = f"{self.operator}({self.config})" if self.config else self.operator
+        return f"not.{operator}" if self.negate else operator
+
+    def _criteria(self, value: Any, in_group: bool) -> str:
+        if self.operator == "is":
+            text = "null" if value is None else str(value).lower()
+            if text not in IS_VALUES:
+                raise FilterValidationError(f"Valor inválido para 'is' em {self.column}: {value!r}")
+            return text
+        if self.operator == "in":
+            items = value if isinstance(value, (list, tuple)) else str(value).strip("()").split(",")
+            return "(" + ",".join(quote_value(self._coerce(item)) for item in items) + ")"
+        text = self._coerce(value)
+        return quote_value(text) if in_group else text
+
+    def _coerce(self, value: Any) -> str:
+        try:
+            return self.coerce(value)
+        except (TypeError, ValueError) as e:
+            raise FilterValidationError(f"Valor inválido para a coluna {self.column}: {value!r} ({str(e)})")
+
+    def _bounds(self, value: Any) -> Tuple[Any, Any]:
+        if not isinstance(value, (list, tuple)) or len(value) != 2:
+            raise FilterValidationError(f"'between' em {self.column} exige [mínimo, máximo]")
+        return value[0], value[1]
+
+    def render(self, value: Any) -> List[FilterEntry]:
+        """Entradas de nível superior (column=op.valor)"""
+        if self.operator == "between":
+            low, high = self._bounds(value)
+            if self.negate:
+                # not between = fora do intervalo
+                return [("or", f"{self.column}.lt.{quote_value(self._coerce(low))},"
+                               f"{self.column}.gt.{quote_value(self._coerce(high))}")]
+            return [("filter", self.column, "gte", self._coerce(low)),
+                    ("filter", self.column, "lte", self._coerce(high))]
+        return [("filter", self.column, self._operator(), self._criteria(value, in_group=False))]
+
+    def render_in_group(self, value: Any) -> str:
+        """Expressão dentro de um grupo lógico (column.op.valor)"""
+        if self.operator == "between":
+            low, high = self._bounds(value)
+            low, high = quote_value(self._coerce(low)), quote_value(self._coerce(high))
+            if self.negate:
+                return f"or({self.column}.lt.{low},{self.column}.gt.{high})"
+            return f"and({self.column}.gte.{low},{self.column}.lte.{high})"
+        return f"{self.column}.{self._operator()}.{self._criteria(value, in_group=True)}"
+
+
+    def render_sql(self, value: Any, params: List[Any]) -> str:
+        """Expressão SQL com os valores em params ($1, $2...); os valores seguem sem conversão"""
+        column = quote_ident(self.column)
+
+        def param(item: Any) -> str:
+            params.append(item)
+            return f"${len(params)}"
+
+        if self.operator == "is":
+            text = "null" if value is None else str(value).lower()
+            if text not in IS_VALUES:
+                raise FilterValidationError(f"Valor inválido para 'is' em {self.column}: {value!r}")
+            sql = f"{column} IS {text.upper()}"
+        elif self.operator == "in":
+            items = value if isinstance(value, (list, tuple)) else [v.strip() for v in str(value).strip("()").split(",")]
+            sql = f"{column} = ANY({param(list(items))})"
+        elif self.operator == "between":
+            low, high = self._bounds(value)
+            sql = f"{column} BETWEEN {param(low)} AND {param(high)}"
+        elif self.operator in SQL_TEXT_SEARCH:
+            config = f"{param(self.config)}::regconfig, " if self.config else ""
+            sql = f"{column} @@ {SQL_TEXT_SEARCH[self.operator]}({config}{param(value)})"
+        else:
+            sql = f"{column} {SQL_OPERATORS[self.operator]} {param(value)}"
+        return f"NOT ({sql})" if self.negate else sql
+
+
+class Group:
+    """Grupo lógico compilado ("or"/"and")"""
+
+    __slots__ = ("kind", "children", "negate")
+
+    def __init__(self, kind: str, children: List[Any], negate: bool):
+        self.kind = kind
+        self.children = children
+        self.negate = negate
+
+    def render_in_group(self, values: Iterator[Any]) -> str:
+        inner = ",".join(child.render_in_group(values) if isinstance(child, Group)
+                         else child.render_in_group(next(values)) for child in self.children)
+        return f"{'not.' if self.negate else ''}{self.kind}({inner})"
+
+
+    def render_sql(self, values: Iterator[Any], params: List[Any]) -> str:
+        inner = f" {self.kind.upper()} ".join(child.render_sql(values, params) if isinstance(child, Group)
+                                             else child.render_sql(next(values), params) for child in self.children)
+        return f"{'NOT ' if self.negate else ''}({inner})"
+
+
+class CompiledFilters:
+    """Template de filtros: a estrutura validada, à espera dos valores"""
+
+    def __init__(self, nodes: List[Any]):
+        self.nodes = nodes
+
+    def bind(self, filters: List[Dict[str, Any]]) -> List[FilterEntry]:
+        """Aplica os valores (na mesma ordem da estrutura compilada)"""
+        values = iter(list(_iter_values(filters)))
+        entries: List[FilterEntry] = []
+        for node in self.nodes:
+            if isinstance(node, Group):
+                if node.kind == "or" and not node.negate:
+                    entries.append(("or", ",".join(
+                        child.render_in_group(values) if isinstance(child, Group)
+                        else child.render_in_group(next(values)) for child in node.children
+                    )))
+                else:
+                    # Grupos "and"/negados no nível superior viram um "or" de um único item
+                    entries.append(("or", node.render_in_group(values)))
+            else:
+                entries.extend(node.render(next(values)))
+        return entries
+
+
+    def bind_sql(self, filters: List[Dict[str, Any]], params: List[Any]) -> str:
+        """Condição SQL (sem WHERE) para o backend Postgres direto; os valores vão para params"""
+        values = iter(list(_iter_values(filters)))
+        return " AND ".join(node.render_sql(values, params) if isinstance(node, Group)
+                            else node.render_sql(next(values), params) for node in self.nodes)
+
+
+def _iter_values(filters: List[Dict[str, Any]]) -> Iterator[Any]:
+    for item in filters:
+        group = _group_kind(item)
+        if group:
+            yield from _iter_values(item[group])
+        else:
+            yield item.get("value")
+
+
+def _group_kind(item: Dict[str, Any]) -> Optional[str]:
+    if "or" in item:
+        return "or"
+    if "and" in item:
+        return "and"
+    return None
+
+
+def filter_shape(filters: List[Dict[str, Any]]) -> Tuple:
+    """Forma da consulta (sem os valores), usada como chave do cache"""
+    shape = []
+    for item in filters:
+        group = _group_kind(item)
+        if group:
+            shape.append((group, bool(item.get("negate")), filter_shape(item[group])))
+        else:
+            shape.append((item.get("column"), item.get("operator"), bool(item.get("negate")), item.get("config")))
+    return tuple(shape)
+
+
+def _compile_nodes(filters: List[Dict[str, Any]], schema: Optional[Dict[str, str]], table: str) -> List[Any]:
+    nodes = []
+    for item in filters:
+        group = _group_kind(item)
+        if group:
+            children = _compile_nodes(item[group], schema, table)
+            if not children:
+                raise FilterValidationError(f"Grupo '{group}' vazio")
+            nodes.append(Group(group, children, bool(item.get("negate"))))
+            continue
+
+        column = item.get("column")
+        operator = item.get("operator")
+        if not column or not operator:
+            raise FilterValidationError("Cada filtro exige 'column' e 'operator'")
+        if operator not in ALL_OPERATORS:
+            raise FilterValidationError(f"Operador não suportado: {operator}")
+
+        column_type = None
+        if schema is not None:
+            if column not in schema:
+                raise FilterValidationError(f"Coluna {column} não existe na tabela {table}")
+            column_type = schema[column]
+            if operator in PATTERN_OPERATORS and column_type not in TEXT_TYPES:
+                raise FilterValidationError(f"Operador {operator} exige coluna de texto ({column} é {column_type})")
+            if operator in TEXT_SEARCH_OPERATORS and column_type not in TEXT_TYPES | {"tsvector"}:
+                raise FilterValidationError(f"Busca textual exige coluna tsvector ou texto ({column} é {column_type})")
+
+        config = item.get("config") if operator in TEXT_SEARCH_OPERATORS else None
+        nodes.append(Condition(column, operator, bool(item.get("negate")), coercer_for(column_type), config))
+    return nodes
+
+
+def validate_columns(columns: List[str], schema: Optional[Dict[str, str]], table: str):
+    """Valida a lista de colunas selecionadas/ordenadas"""
+    if schema is None:
+        return
+    for column in columns:
+        if column != "*" and column not in schema:
+            raise FilterValidationError(f"Coluna {column} não existe na tabela {table}")
+
+
+class FilterCompiler:
+    """Compila e memoiza templates de filtro por (projeto, tabela, forma)"""
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._cache: "OrderedDict[Tuple, CompiledFilters]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, tenant: str, table: str, filters: List[Dict[str, Any]],
+                schema: Optional[Dict[str, str]] = None) -> CompiledFilters:
+        key = (tenant, table, schema is not None, filter_shape(filters))
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = CompiledFilters(_compile_nodes(filters, schema, table))
+        with self._lock:
+            self._cache[key] = compiled
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def invalidate(self, tenant: str, table: Optional[str] = None):
+        """Remove templates de um projeto (ou de uma tabela) após mudança de schema"""
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == tenant and (table is None or k[1] == table)]:
+                del self._cache[key]
+
+
+def apply_filters(query, entries: List[FilterEntry]):
+    """Aplica entradas compiladas a um request builder do postgrest-py"""
+    for entry in entries:
+        if entry[0] == "or":
+            query = query.or_(entry[1])
+        else:
+            _, column, operator, criteria = entry
+            query = query.filter(column, operator, criteria)
+    return query
+
+
+# Compilador compartilhado do processo
+filter_compiler = FilterCompiler()
@@ -0,0 +1,185 @@
+"""
+Chaves de idempotência para chamadas de ferramenta
+
+Uma chamada com Idempotency-Key (header ou argumento "idempotency_key") tem
+sua resposta guardada por IDEMPOTENCY_TTL segundos, por (projeto, credencial,
+ferramenta, chave): repetições devolvem a resposta guardada sem tocar no
+Supabase, e duplicatas simultâneas aguardam a primeira execução. Junto com a
+resposta fica o hash dos argumentos; reusar a chave com outros argumentos é
+rejeitado (IdempotencyKeyReused) em vez de repetir a resposta antiga. Respostas
+de erro não são guardadas, para que o retry execute de novo. O cache é um LRU em memória,
+opcionalmente persistido em SQLite (IDEMPOTENCY_DB_PATH).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from mcp.types import TextContent
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre limpezas de chaves expiradas no SQLite (segundos)
+PURGE_INTERVAL = 60
+
+
+class IdempotencyKeyReused(ValueError):
+    """A chave de idempotência já foi usada com outros argumentos"""
+
+    def __init__(self, tool: str):
+        super().__init__(f"Idempotency-Key já usada com outros argumentos na ferramenta {tool}")
+
+
+def argument_fingerprint(arguments: Dict[str, Any]) -> str:
+    """Hash dos argumentos; listas lidas do corpo para arquivo temporário entram pelo hash dos itens"""
+    normalized = {
+        key: {"$items": value.fingerprint} if hasattr(value, "fingerprint") else value
+        for key, value in arguments.items()
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _is_error(contents: List[Any]) -> bool:
+    """As ferramentas reportam falhas como texto iniciado por "Erro" """
+    return any(getattr(content, "text", "").startswith("Erro") for content in contents)
+
+
+class IdempotencyStore:
+    """Respostas por chave, com TTL e limite de entradas (LRU)"""
+
+    def __init__(self, max_entries: int, ttl: float, path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        # chave -> (expira_em, hash dos argumentos, resposta)
+        self._entries: "OrderedDict[str, Tuple[float, str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[asyncio.Future, str]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0.0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, fingerprint TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(idempotency)")}
+            if "fingerprint" not in columns:
+                # Arquivo de uma versão anterior: respostas sem hash não são conferidas
+                self._conn.execute("ALTER TABLE idempotency ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+
+    @staticmethod
+    def scoped_key(tenant: str, credential: str, tool: str, key: str) -> str:
+        """
+        Chave interna: a mesma Idempotency-Key em outro projeto, com outra
+        credencial (outro usuário do mesmo projeto) ou em outra ferramenta é independente
+        """
+        return hashlib.sha256(f"{tenant}\0{credential}\0{tool}\0{key}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Resposta guardada (ou None se não existe/expirou)"""
+        entry = self._lookup(key)
+        return entry[1] if entry is not None else None
+
+    def _lookup(self, key: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """(hash dos argumentos, resposta) guardados, ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1], entry[2]
+                del self._entries[key]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT response, expires_at, fingerprint FROM idempotency WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            response = json.loads(row[0])
+            self._remember(key, row[1], row[2], response)
+            return row[2], response
+
+    def put(self, key: str, response: List[Dict[str, Any]], fingerprint: str = ""):
+        """Guarda a resposta (e o hash dos argumentos) pelo TTL configurado"""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, fingerprint, response)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idempotency (key, response, expires_at, fingerprint) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(response), expires_at, fingerprint),
+                )
+                if now - self._last_purge >= PURGE_INTERVAL:
+                    self._last_purge = now
+                    self._conn.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+
+    def _remember(self, key: str, expires_at: float, fingerprint: str, response: List[Dict[str, Any]]):
+        self._entries[key] = (expires_at, fingerprint, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def run(self, key: str, tool: str, execute: Callable[[], Awaitable[List[TextContent]]],
+                  fingerprint: str = "") -> Tuple[List[TextContent], bool]:
+        """
+        Executa uma vez por chave; retorna (resposta, repetida). Duplicatas
+        simultâneas aguardam a execução em andamento; se ela falhar ou for
+        cancelada, a próxima duplicata executa. Com fingerprint, a chave usada
+        com outros argumentos levanta IdempotencyKeyReused
+        """
+        while True:
+            stored = self._lookup(key)
+            if stored is not None:
+                # Sem hash guardado (versão anterior), a resposta é repetida sem conferir
+                if stored[0] and fingerprint and stored[0] != fingerprint:
+                    raise IdempotencyKeyReused(tool)
+                metrics.inc_counter(
+                    "mcp_idempotent_replays_total", labels={"tool": tool},
+                    help="Chamadas respondidas com a resposta guardada da chave de idempotência",
+                )
+                return [TextContent.model_validate(content) for content in stored[1]], True
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            if inflight[1] != fingerprint:
+                raise IdempotencyKeyReused(tool)
+            # wait (e não await direto): cancelar esta duplicata não cancela a primeira
+            await asyncio.wait([inflight[0]])
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (done, fingerprint)
+        try:
+            contents = await execute()
+            if not _is_error(contents):
+                self.put(key, [content.model_dump(mode="json") for content in contents], fingerprint)
+            return contents, False
+        finally:
+            del self._inflight[key]
+            done.set_result(None)
+
+
+_stores: Dict[str, IdempotencyStore] = {}
+
+
+def get_idempotency_store(config: Config) -> IdempotencyStore:
+    """Retorna o store do processo (um por arquivo SQLite configurado)"""
+    store = _stores.get(config.idempotency_db_path)
+    if store is None:
+        store = _stores[config.idempotency_db_path] = IdempotencyStore(
+            config.idempotency_max_entries, config.idempotency_ttl, config.idempotency_db_path or None
+        )
+    return store
@@ -0,0 +1,226 @@
+"""
+Fila de jobs em segundo plano para ferramentas demoradas
+
+Uma chamada com "async": true é registrada em uma tabela SQLite e executada
+por um pool de workers do próprio processo; o cliente recebe o job_id na hora
+e acompanha o job com job_status/job_result/job_cancel. Resultados expiram
+após JOB_RESULT_TTL segundos. Jobs em andamento quando o processo reinicia
+são marcados como falhos (a execução não é retomada). Cada job pertence ao
+projeto e à credencial (hash da chave) que o criaram: outras credenciais do
+mesmo projeto não o veem.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import Config
+from deadlines import clear_deadline
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+# Intervalo mínimo entre limpezas de jobs expirados (segundos)
+PURGE_INTERVAL = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    credential TEXT NOT NULL DEFAULT '',
+    tool TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+)
+"""
+
+# (fila, job_id) do job em execução, para report_progress
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+
+def report_progress(done: int, total: Optional[int] = None, message: Optional[str] = None):
+    """Registra o progresso do job atual (sem efeito fora de um job)"""
+    current = _current_job.get()
+    if current is None:
+        return
+    queue, job_id = current
+    progress = {"done": done}
+    if total is not None:
+        progress["total"] = total
+    if message:
+        progress["message"] = message
+    queue.store.update(job_id, progress=json.dumps(progress))
+
+
+class JobStore:
+    """Tabela de jobs em SQLite (uma conexão compartilhada, protegida por lock)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "credential" not in columns:
+                # Arquivo de uma versão anterior: jobs antigos não pertencem a nenhuma credencial
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN credential TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+
+    def create(self, tenant: str, credential: str, tool: str) -> str:
+        """Registra um job na fila e retorna seu id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, tenant, credential, tool, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, tenant, credential, tool, QUEUED, time.time()),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields: Any):
+        """Atualiza colunas do job"""
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, tenant: str, credential: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o job do projeto e da credencial (os demais não são visíveis)"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ? AND tenant = ? AND credential = ?",
+                                     (job_id, tenant, credential)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else None
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Remove jobs concluídos cujo resultado expirou"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                                        (now or time.time(),))
+        return cursor.rowcount
+
+    def fail_interrupted(self, expires_at: float) -> int:
+        """Marca como falhos os jobs que não terminaram antes de um reinício"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ? WHERE status IN (?, ?)",
+                (FAILED, "Job interrompido pelo reinício do servidor", time.time(), expires_at, QUEUED, RUNNING),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """Executa jobs com no máximo `workers` simultâneos; os demais aguardam como queued"""
+
+    def __init__(self, store: JobStore, workers: int, result_ttl: float):
+        self.store = store
+        self.result_ttl = result_ttl
+        self._workers = workers
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last_purge = 0.0
+        interrupted = store.fail_interrupted(time.time() + result_ttl)
+        if interrupted:
+            logger.warning(f"{interrupted} job(s) interrompido(s) pelo reinício marcados como falhos")
+
+    def submit(self, tenant: str, credential: str, tool: str, run: Callable[[], Awaitable[List[Any]]]) -> str:
+        """Enfileira run() e retorna o job_id imediatamente"""
+        self.purge()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._workers)
+        job_id = self.store.create(tenant, credential, tool)
+        task = asyncio.get_running_loop().create_task(self._run(job_id, tool, run))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        metrics.inc_counter("mcp_jobs_submitted_total", labels={"tool": tool}, help="Jobs enviados para execução em segundo plano")
+        return job_id
+
+    async def _run(self, job_id: str, tool: str, run: Callable[[], Awaitable[List[Any]]]):
+        status, result, error = CANCELLED, None, None
+        # O job sobrevive à requisição que o criou: o prazo dela não se aplica
+        clear_deadline()
+        try:
+            async with self._slots:
+                self.store.update(job_id, status=RUNNING, started_at=time.time())
+                _current_job.set((self, job_id))
+                contents = await run()
+            result = json.dumps([content.model_dump(mode="json") for content in contents])
+            status = SUCCEEDED
+        except asyncio.CancelledError:
+            logger.info(f"Job {job_id} ({tool}) cancelado")
+        except Exception as e:
+            logger.exception(f"Job {job_id} ({tool}) falhou")
+            status, error = FAILED, str(e)
+        finished_at = time.time()
+        self.store.update(job_id, status=status, result=result, error=error,
+                          finished_at=finished_at, expires_at=finished_at + self.result_ttl)
+        metrics.inc_counter("mcp_jobs_finished_total", labels={"tool": tool, "status": status},
+                            help="Jobs em segundo plano concluídos, por status")
+
+    def get(self, tenant: str, credential: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado atual do job (ou None se não existe/expirou)"""
+        self.purge()
+        return self.store.get(tenant, credential, job_id)
+
+    def cancel(self, tenant: str, credential: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancela um job na fila ou em execução; retorna o job (ou None se não existe)"""
+        job = self.store.get(tenant, credential, job_id)
+        if job is None:
+            return None
+        task = self._tasks.get(job_id)
+        if task is not None and job["status"] not in FINISHED_STATES:
+            task.cancel()
+        return job
+
+    async def join(self, job_id: str):
+        """Aguarda o fim do job, se ainda estiver em execução neste processo"""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    def purge(self):
+        """Remove resultados expirados (no máximo uma vez por PURGE_INTERVAL)"""
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        removed = self.store.purge_expired(now)
+        if removed:
+            logger.info(f"{removed} job(s) expirado(s) removido(s)")
+
+
+# Filas por arquivo de banco
+_queues: Dict[str, JobQueue] = {}
+
+
+def get_job_queue(config: Config) -> JobQueue:
+    """Retorna a fila do banco configurado (JOB_DB_PATH)"""
+    queue = _queues.get(config.job_db_path)
+    if queue is None:
+        store = JobStore(config.job_db_path)
+        queue = _queues[config.job_db_path] = JobQueue(store, config.job_workers, config.job_result_ttl)
+    return queue
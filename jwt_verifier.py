@@ -0,0 +1,155 @@
+"""
+Verificação local de JWTs do Supabase com cache de JWKS e de resultados
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from jwt import PyJWKClient
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Algoritmos aceitos (nunca aceitar "none")
+SYMMETRIC_ALGORITHMS = {"HS256"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+
+
+class JWTVerificationError(Exception):
+    """Erro de verificação de token JWT"""
+
+
+class JWTVerifier:
+    """Verifica tokens JWT localmente (HS256 ou JWKS) com LRU de resultados"""
+
+    def __init__(self, supabase_url: str, api_key: Optional[str] = None,
+                 jwt_secret: Optional[str] = None, audience: Optional[str] = "authenticated",
+                 jwks_cache_ttl: int = 600, cache_size: int = 1024):
+        self.supabase_url = supabase_url.rstrip("/") if supabase_url else ""
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Cliente JWKS com cache do conjunto de chaves (busca apenas quando necessário)
+        headers = {"apikey": api_key} if api_key else None
+        self._jwks_client = PyJWKClient(
+            f"{self.supabase_url}/auth/v1/.well-known/jwks.json",
+            cache_jwk_set=True,
+            lifespan=jwks_cache_ttl,
+            headers=headers,
+        )
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Verifica o token e retorna suas claims (usa cache quando possível)"""
+        cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                claims, expires_at = cached
+                if expires_at > now:
+                    self._cache.move_to_end(cache_key)
+                    self.hits += 1
+                    return claims
+                del self._cache[cache_key]
+            self.misses += 1
+
+        claims = self._decode(token)
+
+        # Sem "exp" o resultado não é armazenado (não há como invalidar)
+        expires_at = claims.get("exp")
+        if isinstance(expires_at, (int, float)):
+            with self._lock:
+                self._cache[cache_key] = (claims, float(expires_at))
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return claims
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        """Valida assinatura e claims do token"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise JWTVerificationError(f"Token malformado: {str(e)}")
+
+        algorithm = header.get("alg")
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise JWTVerificationError("Segredo JWT não configurado para tokens HS256")
+            key = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            try:
+                key = self._jwks_client.get_signing_key_from_jwt(token).key
+            except jwt.PyJWTError as e:
+                raise JWTVerificationError(f"Chave de assinatura não encontrada no JWKS: {str(e)}")
+        else:
+            raise JWTVerificationError(f"Algoritmo não suportado: {algorithm}")
+
+        options = {"require": ["exp"]}
+        if not self.audience:
+            options["verify_aud"] = False
+
+        try:
+            return jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience or None,
+                options=options,
+            )
+        except jwt.PyJWTError as e:
+            raise JWTVerificationError(f"Token inválido: {str(e)}")
+
+    def clear_cache(self):
+        """Limpa o cache de resultados"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Verificadores compartilhados por projeto (sobrevivem à troca de configuração)
+_verifiers: Dict[str, JWTVerifier] = {}
+_verifiers_lock = threading.Lock()
+
+
+def get_verifier(config: Config) -> JWTVerifier:
+    """Retorna o verificador do projeto atual, criando-o se necessário"""
+    supabase_url = config.get_supabase_url()
+    if not supabase_url:
+        raise JWTVerificationError("URL do Supabase não configurada")
+
+    with _verifiers_lock:
+        verifier = _verifiers.get(supabase_url)
+        if verifier is None:
+            verifier = JWTVerifier(
+                supabase_url,
+                api_key=config.get_supabase_key(),
+                jwt_secret=config.get_supabase_jwt_secret(),
+                audience=config.jwt_audience,
+                jwks_cache_ttl=config.jwks_cache_ttl,
+                cache_size=config.jwt_cache_size,
+            )
+            _verifiers[supabase_url] = verifier
+        return verifier
@@ -4,15 +4,20 @@ MCP Server para Supabase com configuração dinâmica
 Fornece integração completa com Supabase através do Model Context Protocol
 """
 
+import argparse
 import asyncio
+import contextlib
 import logging
 import sys
+import weakref
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
+from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 from mcp.types import (
     CallToolRequest,
     ListToolsRequest,
@@ -23,13 +28,30 @@ from mcp.types import (
     LoggingLevel,
 )
 
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
 # Importar nossas ferramentas
-from tools.database import DatabaseTools
+from tools.database_tools import DatabaseTools
 from tools.auth import AuthTools
 from tools.storage import StorageTools
 from tools.realtime import RealtimeTools
+from tools.jobs import JobTools, submit_tool_job
 from config import Config
-from supabase_client import SupabaseClient
+from supabase_client import SupabaseClient, get_tenant_client
+from middleware import tenant_from_headers
+from transport import close_http_clients
+from postgres_backend import close_postgres_backends
+from executors import shutdown_executors
+from write_behind import flush_write_behind
+from idempotency import IdempotencyStore, argument_fingerprint, get_idempotency_store
+from deadlines import DeadlineExceeded, deadline_scope, parse_timeout
+from scheduler import get_scheduler, tool_class
+from compression import CompressionMiddleware
+from metrics import metrics
 
 # Configurar logging
 logging.basicConfig(
@@ -50,8 +72,45 @@ class SupabaseMCPServer:
         self.auth_tools = AuthTools(self.config, self.supabase_client)
         self.storage_tools = StorageTools(self.config, self.supabase_client)
         self.realtime_tools = RealtimeTools(self.config, self.supabase_client)
+        self.job_tools = JobTools(self.config, self.supabase_client)
+        self._session_slots: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
         self._setup_handlers()
     
+    def _request_header(self, name: str) -> Optional[str]:
+        """Header da requisição HTTP da sessão atual (None no stdio)"""
+        request = None
+        with contextlib.suppress(LookupError):
+            request = self.server.request_context.request
+        return request.headers.get(name) if request is not None else None
+    
+    def _tools_for_request(self) -> Dict[str, Any]:
+        """
+        Ferramentas da requisição atual: em sessões HTTP com headers de projeto
+        (x-supabase-project/x-supabase-token), usa o cliente cacheado do projeto;
+        no stdio ou sem headers, a configuração fixa
+        """
+        request = None
+        with contextlib.suppress(LookupError):
+            request = self.server.request_context.request
+        if request is not None:
+            project_code, access_token = tenant_from_headers(dict(request.headers))
+            if project_code and access_token:
+                client = get_tenant_client(project_code, access_token, self.config.tenant_client_cache_size)
+                return {
+                    "database": DatabaseTools(client.config, client),
+                    "auth": AuthTools(client.config, client),
+                    "storage": StorageTools(client.config, client),
+                    "realtime": RealtimeTools(client.config, client),
+                    "job": JobTools(client.config, client),
+                }
+        return {
+            "database": self.database_tools,
+            "auth": self.auth_tools,
+            "storage": self.storage_tools,
+            "realtime": self.realtime_tools,
+            "job": self.job_tools,
+        }
+    
     def _setup_handlers(self):
         """Configurar handlers do servidor MCP"""
         
@@ -72,45 +131,166 @@ class SupabaseMCPServer:
             # Adicionar ferramentas de tempo real
             tools.extend(self.realtime_tools.get_tools())
             
+            # Adicionar ferramentas de jobs em segundo plano
+            tools.extend(self.job_tools.get_tools())
+            
             return tools
         
         @self.server.call_tool()
         async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             """Executa uma ferramenta específica com configuração dinâmica"""
+            return await self.dispatch(name, arguments)
+    
+    def _session_semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Limite de chamadas simultâneas da sessão MCP atual"""
+        try:
+            session = self.server.request_context.session
+        except LookupError:
+            return None
+        semaphore = self._session_slots.get(session)
+        if semaphore is None:
+            semaphore = self._session_slots[session] = asyncio.Semaphore(self.config.mcp_session_concurrency)
+        return semaphore
+    
+    async def dispatch(self, name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+        """
+        Roteia uma chamada de ferramenta. O servidor MCP atende cada requisição em
+        sua própria tarefa, então chamadas da mesma sessão rodam em paralelo (até
+        MCP_SESSION_CONCURRENCY); notifications/cancelled cancela a tarefa, e o
+        cancelamento chega aqui como CancelledError
+        """
+        semaphore = self._session_semaphore()
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
             try:
                 logger.info(f"Executando ferramenta: {name} com argumentos: {arguments}")
+                tools = self._tools_for_request()
                 
-                # Roteamento para ferramentas de banco de dados
-                if name.startswith("database_"):
-                    return await self.database_tools.execute_tool(name, arguments)
+                # Roteamento pelo prefixo: database_, auth_, storage_, realtime_ ou job_
+                group = tools.get(name.split("_", 1)[0]) if "_" in name else None
+                if group is None:
+                    raise ValueError(f"Ferramenta desconhecida: {name}")
                 
-                # Roteamento para ferramentas de autenticação
-                elif name.startswith("auth_"):
-                    return await self.auth_tools.execute_tool(name, arguments)
+                run_async = arguments.pop("async", False)
+                idempotency_key = arguments.pop("idempotency_key", None)
                 
-                # Roteamento para ferramentas de armazenamento
-                elif name.startswith("storage_"):
-                    return await self.storage_tools.execute_tool(name, arguments)
+                async def execute():
+                    # "async": true enfileira a ferramenta e responde com o job_id
+                    if run_async:
+                        return await submit_tool_job(group.config, name, arguments, group.execute_tool)
+                    if not self.config.scheduler_enabled:
+                        return await group.execute_tool(name, arguments)
+                    # Fila por classe (interactive/default/bulk ou x-priority) e projeto
+                    cls = tool_class(group.config, name, self._request_header("x-priority"))
+                    async with get_scheduler(self.config).slot(cls, group.config.get_tenant_id()):
+                        return await group.execute_tool(name, arguments)
                 
-                # Roteamento para ferramentas de tempo real
-                elif name.startswith("realtime_"):
-                    return await self.realtime_tools.execute_tool(name, arguments)
+                async def execute_once():
+                    if idempotency_key:
+                        key = IdempotencyStore.scoped_key(group.config.get_tenant_id(), group.config.get_credential_id(),
+                                                          name, idempotency_key)
+                        result, _ = await get_idempotency_store(group.config).run(
+                            key, name, execute, argument_fingerprint(arguments)
+                        )
+                        return result
+                    return await execute()
                 
-                else:
-                    raise ValueError(f"Ferramenta desconhecida: {name}")
+                # Prazo: padrão da ferramenta, encurtado por x-request-timeout (transporte HTTP)
+                timeout = group.config.get_tool_timeout(name, parse_timeout(self._request_header("x-request-timeout")))
+                with deadline_scope(timeout):
+                    try:
+                        return await asyncio.wait_for(execute_once(), timeout)
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded(name)
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
                     
-            except Exception as e:
-                logger.error(f"Erro ao executar ferramenta {name}: {str(e)}")
-                return [TextContent(
-                    type="text",
-                    text=f"Erro: {str(e)}"
-                )]
+        except asyncio.CancelledError:
+            logger.info(f"Ferramenta {name} cancelada pelo cliente")
+            metrics.inc_counter(
+                "mcp_tool_cancelled_total", labels={"tool": name},
+                help="Chamadas de ferramenta canceladas pelo cliente",
+            )
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar ferramenta {name}: {str(e)}")
+            return [TextContent(
+                type="text",
+                text=f"Erro: {str(e)}"
+            )]
+
+def create_http_app(mcp_server: SupabaseMCPServer):
+    """
+    App ASGI com os transportes HTTP do MCP para vários clientes no mesmo processo:
+    streamable HTTP em /mcp e SSE em /sse (mensagens em /messages/)
+    """
+    config = mcp_server.config
+    init_options = mcp_server.server.create_initialization_options()
+    session_manager = StreamableHTTPSessionManager(
+        app=mcp_server.server,
+        json_response=config.mcp_json_response,
+        stateless=config.mcp_stateless,
+    )
+    sse = SseServerTransport("/messages/")
+    
+    async def handle_streamable_http(scope, receive, send):
+        await session_manager.handle_request(scope, receive, send)
+    
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await mcp_server.server.run(read_stream, write_stream, init_options)
+        return Response()
+    
+    async def health(request):
+        return JSONResponse({"status": "ok"})
+    
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            try:
+                yield
+            finally:
+                await flush_write_behind()
+                close_http_clients()
+                await close_postgres_backends()
+                shutdown_executors()
+    
+    return Starlette(
+        routes=[
+            Mount("/mcp", app=handle_streamable_http),
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+            Route("/health", endpoint=health, methods=["GET"]),
+        ],
+        # Respostas JSON do streamable HTTP comprimidas; SSE segue sem compressão
+        middleware=[Middleware(CompressionMiddleware, config=config)],
+        lifespan=lifespan,
+    )
+
+async def run_http(mcp_server: SupabaseMCPServer, host: str, port: int):
+    """Serve os transportes HTTP do MCP com uvicorn"""
+    logger.info(f"Servidor MCP (streamable HTTP em /mcp, SSE em /sse) ouvindo em {host}:{port}")
+    server = uvicorn.Server(uvicorn.Config(create_http_app(mcp_server), host=host, port=port, log_level="info"))
+    await server.serve()
 
 async def main():
     """Função principal do servidor MCP"""
+    parser = argparse.ArgumentParser(description="Servidor MCP para Supabase")
+    parser.add_argument("--transport", choices=["stdio", "http"], help="Transporte (padrão: MCP_TRANSPORT ou stdio)")
+    parser.add_argument("--host", help="Endereço do servidor HTTP (padrão: MCP_HTTP_HOST)")
+    parser.add_argument("--port", type=int, help="Porta do servidor HTTP (padrão: MCP_HTTP_PORT)")
+    args = parser.parse_args()
+    
     try:
         # Criar instância do servidor
         mcp_server = SupabaseMCPServer()
+        config = mcp_server.config
+        
+        if (args.transport or config.mcp_transport) == "http":
+            await run_http(mcp_server, args.host or config.mcp_http_host, args.port or config.mcp_http_port)
+            return
         
         # Configurar opções de inicialização
         init_options = InitializationOptions(
@@ -123,15 +303,18 @@ async def main():
         
         # Iniciar servidor
         async with stdio_server() as (read_stream, write_stream):
-            await mcp_server.server.run(
-                read_stream,
-                write_stream,
-                init_options
-            )
+            try:
+                await mcp_server.server.run(
+                    read_stream,
+                    write_stream,
+                    init_options
+                )
+            finally:
+                await flush_write_behind()
             
     except Exception as e:
         logger.error(f"Erro fatal no servidor MCP: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
@@ -1,13 +1,31 @@
 from fastapi import FastAPI, Request, Header, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from typing import Dict, Any, List, Optional
 from tools.database_tools import DatabaseTools
 from tools.auth import AuthTools
 from tools.storage import StorageTools
 from tools.realtime import RealtimeTools
+from tools.jobs import JobTools, submit_tool_job
 from config import Config
 from supabase_client import SupabaseClient
 from middleware import DynamicConfigMiddleware
+from transport import close_http_clients
+from postgres_backend import close_postgres_backends
+from executors import shutdown_executors
+from write_behind import flush_write_behind
+from metrics import metrics
+from rate_limit import TenantLimiter, TenantRateLimitMiddleware
+from request_body import BodyTooLarge, LimitedBodyReader, parse_call_envelope
+from tools.database.streaming import STREAM_FORMATS, encode_rows, stream_sql_rows, stream_table_rows
+from tools.database.columnar import COLUMNAR_FORMATS, columnar_schema_for, encode_columnar
+from tools.database.bulk import BULK_FORMATS, RecordReader, import_records
+from checkpoints import get_checkpoint_store
+from idempotency import IdempotencyKeyReused, IdempotencyStore, argument_fingerprint, get_idempotency_store
+from deadlines import deadline_scope, parse_timeout
+from scheduler import get_scheduler, tool_class
+from compression import CompressionMiddleware
+import asyncio
+import json
 import logging
 
 app = FastAPI(title="MCP Server Supabase", version="1.0.0")
@@ -15,6 +33,7 @@ app = FastAPI(title="MCP Server Supabase", version="1.0.0")
 # Configuração padrão
 default_config = Config()
 middleware = DynamicConfigMiddleware(default_config)
+limiter = TenantLimiter(default_config) if default_config.rate_limit_enabled else None
 
 # Instâncias fixas (fallback)
 def get_tools_instances(config: Config, client: SupabaseClient):
@@ -23,8 +42,23 @@ def get_tools_instances(config: Config, client: SupabaseClient):
         "auth": AuthTools(config, client),
         "storage": StorageTools(config, client),
         "realtime": RealtimeTools(config, client),
+        "job": JobTools(config, client),
     }
 
+def tool_group(tools_instances: Dict[str, Any], name: str):
+    """Grupo de ferramentas pelo prefixo do nome (database_, auth_, storage_, realtime_, job_)"""
+    group = tools_instances.get(name.split("_", 1)[0]) if "_" in name else None
+    if group is None:
+        raise HTTPException(status_code=404, detail=f"Ferramenta desconhecida: {name}")
+    return group
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    await flush_write_behind()
+    close_http_clients()
+    await close_postgres_backends()
+    shutdown_executors()
+
 @app.middleware("http")
 async def dynamic_config_middleware(request: Request, call_next):
     headers = dict(request.headers)
@@ -32,6 +66,13 @@ async def dynamic_config_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Registrado depois, executa antes da troca de configuração
+if limiter is not None:
+    app.add_middleware(TenantRateLimitMiddleware, limiter=limiter)
+
+# Registrado por último, envolve os demais: descomprime o corpo antes de qualquer leitura
+app.add_middleware(CompressionMiddleware, config=default_config)
+
 @app.get("/mcp/list_tools")
 async def list_tools(request: Request):
     client = middleware.get_current_client()
@@ -42,34 +83,188 @@ async def list_tools(request: Request):
     tools.extend(tools_instances["auth"].get_tools())
     tools.extend(tools_instances["storage"].get_tools())
     tools.extend(tools_instances["realtime"].get_tools())
+    tools.extend(tools_instances["job"].get_tools())
     return [tool.model_dump() if hasattr(tool, "model_dump") else tool.__dict__ for tool in tools]
 
+class ClientDisconnected(Exception):
+    """O cliente fechou a conexão antes da resposta"""
+
+async def _wait_disconnect(request: Request):
+    """Retorna quando o cliente fecha a conexão (o corpo já deve ter sido lido)"""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def run_until_deadline(request: Request, name: str, work, timeout: float = None):
+    """
+    Executa a ferramenta até concluir; se o prazo esgotar (504) ou o cliente
+    desconectar, cancela a execução e as chamadas ao upstream em andamento
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        reason = "disconnect" if watcher in done else "deadline"
+        metrics.inc_counter(
+            "mcp_tool_abandoned_total", labels={"tool": name, "reason": reason},
+            help="Chamadas de ferramenta interrompidas por prazo esgotado ou desconexão do cliente",
+        )
+        if reason == "disconnect":
+            raise ClientDisconnected()
+        raise HTTPException(status_code=504, detail=f"Prazo de {timeout:g}s esgotado para a ferramenta {name}")
+    finally:
+        for pending in (task, watcher):
+            if pending is not None and not pending.done():
+                pending.cancel()
+
 @app.post("/mcp/call_tool")
-async def call_tool(request: Request, name: str = None, arguments: Dict[str, Any] = None):
+async def call_tool(request: Request, name: str = None):
+    config = middleware.get_current_config()
+    # Antes de conhecer a ferramenta, vale o maior limite configurado
+    limit = config.get_body_limit(name) if name else max([config.max_body_bytes, *config.tool_body_limits.values()])
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail=str(BodyTooLarge(limit, name)))
+    try:
+        reader = LimitedBodyReader(request.stream(), limit)
+        name, arguments = await parse_call_envelope(reader, name, limit_for=config.get_body_limit)
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Corpo inválido: {str(e)}")
     try:
-        body = await request.json()
-        name = name or body.get("name")
-        arguments = arguments or body.get("arguments", {})
         if not name:
             raise HTTPException(status_code=400, detail="Nome da ferramenta é obrigatório.")
-        client = middleware.get_current_client()
-        config = middleware.get_current_config()
-        tools_instances = get_tools_instances(config, client)
+        # Cliente fixo do projeto da requisição: o cliente do middleware muda de projeto
+        # a cada requisição, inclusive enquanto esta aguarda o upstream
+        client = middleware.get_request_client(config)
+        tools_instances = get_tools_instances(client.config, client)
         # Roteamento
-        if name.startswith("database_"):
-            result = await tools_instances["database"].execute_tool(name, arguments)
-        elif name.startswith("auth_"):
-            result = await tools_instances["auth"].execute_tool(name, arguments)
-        elif name.startswith("storage_"):
-            result = await tools_instances["storage"].execute_tool(name, arguments)
-        elif name.startswith("realtime_"):
-            result = await tools_instances["realtime"].execute_tool(name, arguments)
-        else:
-            raise HTTPException(status_code=404, detail=f"Ferramenta desconhecida: {name}")
+        group = tool_group(tools_instances, name)
+        run_async = arguments.pop("async", False)
+        # O argumento sai sempre dos argumentos (não vai à ferramenta nem à impressão digital)
+        argument_key = arguments.pop("idempotency_key", None)
+        idempotency_key = request.headers.get("idempotency-key") or argument_key
+
+        async def execute():
+            # group já está ligado ao cliente fixo do projeto: o job e a chamada que
+            # espera na fila rodam no projeto da requisição, mesmo começando bem depois
+            if run_async:
+                # Job em segundo plano: responde com o job_id sem esperar a ferramenta
+                return await submit_tool_job(client.config, name, arguments, group.execute_tool)
+            if not config.scheduler_enabled:
+                return await group.execute_tool(name, arguments)
+            # Fila por classe (interactive/default/bulk ou x-priority) e projeto
+            cls = tool_class(config, name, request.headers.get("x-priority"))
+            async with get_scheduler(config).slot(cls, client.config.get_tenant_id()):
+                return await group.execute_tool(name, arguments)
+
+        async def execute_once():
+            if idempotency_key:
+                # Escopo pelo cliente que executa a chamada
+                key = IdempotencyStore.scoped_key(client.config.get_tenant_id(), client.config.get_credential_id(),
+                                                  name, idempotency_key)
+                return await get_idempotency_store(client.config).run(key, name, execute,
+                                                                      argument_fingerprint(arguments))
+            return await execute(), False
+
+        # Prazo: padrão da ferramenta, encurtado por x-request-timeout
+        timeout = config.get_tool_timeout(name, parse_timeout(request.headers.get("x-request-timeout")))
+        with deadline_scope(timeout):
+            result, replayed = await run_until_deadline(request, name, execute_once(), timeout)
         # Serializar resultado
-        return JSONResponse(content=[r.__dict__ for r in result])
+        headers = {"Idempotent-Replayed": "true"} if replayed else None
+        return JSONResponse(content=[r.__dict__ for r in result], headers=headers)
+    except HTTPException:
+        raise
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ClientDisconnected:
+        # Ninguém lerá a resposta (499, como no nginx)
+        logging.info(f"Cliente desconectou; ferramenta {name} cancelada")
+        return Response(status_code=499)
     except Exception as e:
         logging.exception("Erro ao executar ferramenta")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/mcp/stream_query")
+async def stream_query(request: Request):
+    """Executa uma consulta em streaming (NDJSON, CSV, Parquet ou Arrow) com limites de linhas e bytes"""
+    config = middleware.get_current_config()
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.max_body_bytes:
+        raise HTTPException(status_code=413, detail=str(BodyTooLarge(config.max_body_bytes)))
+    try:
+        body = json.loads(await LimitedBodyReader(request.stream(), config.max_body_bytes).read_all())
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Corpo inválido: {str(e)}")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Corpo inválido: esperado um objeto JSON")
+    fmt = body.get("format", "ndjson")
+    if fmt not in STREAM_FORMATS and fmt not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato não suportado: {fmt}")
+    client = middleware.get_request_client(config)
+    chunk_size = min(body.get("chunk_size", config.stream_chunk_size), config.stream_chunk_size * 10)
+    max_rows = min(body.get("max_rows", config.stream_max_rows), config.stream_max_rows)
+    max_bytes = min(body.get("max_bytes", config.stream_max_bytes), config.stream_max_bytes)
+
+    schema = None
+    if body.get("sql"):
+        backend = client.postgres
+        if backend is None:
+            raise HTTPException(status_code=400, detail="Streaming de SQL requer o backend Postgres direto (DEFAULT_SUPABASE_DB_URL)")
+        chunks = stream_sql_rows(backend, body["sql"], body.get("params", []), chunk_size)
+    elif body.get("table"):
+        columns = body.get("columns") or ["*"]
+        chunks = stream_table_rows(client, body["table"], body.get("filters"), body.get("order_by"), chunk_size,
+                                   columns=columns)
+        if fmt in COLUMNAR_FORMATS:
+            schema = await columnar_schema_for(client, body["table"], columns)
+    else:
+        raise HTTPException(status_code=400, detail="Informe 'sql' ou 'table'.")
+
+    if fmt in COLUMNAR_FORMATS:
+        # Parquet/Arrow só são legíveis completos: apenas o limite de linhas se aplica
+        return StreamingResponse(encode_columnar(chunks, fmt, schema, max_rows=max_rows), media_type=COLUMNAR_FORMATS[fmt])
+    return StreamingResponse(
+        encode_rows(chunks, fmt, max_rows=max_rows, max_bytes=max_bytes),
+        media_type=STREAM_FORMATS[fmt],
+    )
+
+@app.post("/mcp/import")
+async def import_stream(request: Request, table: str, format: str = "ndjson", job_id: str = None,
+                        chunk_size: int = None, null_value: str = ""):
+    """Importa CSV/NDJSON enviado no corpo, em lotes; com job_id, um reenvio continua de onde parou"""
+    if format not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato não suportado: {format}")
+    config = middleware.get_current_config()
+    client = middleware.get_request_client(config)
+    store = get_checkpoint_store(config)
+    tenant = config.get_tenant_id()
+    # O corpo é reenviado desde o início: as linhas já importadas são descartadas
+    state = store.load(tenant, job_id) if job_id else None
+    reader = RecordReader(request.stream(), format, null_value=null_value)
+    try:
+        stats = await import_records(
+            client, table, reader, max(1, chunk_size or config.bulk_chunk_size),
+            checkpoint=(lambda s: store.save(tenant, job_id, s)) if job_id else None,
+            skip_rows=state["rows"] if state else 0,
+            rows=state["rows"] if state else 0,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Registro inválido: {str(e)}")
+    except Exception as e:
+        logging.exception("Erro ao importar registros")
+        raise HTTPException(status_code=500, detail=str(e))
+    if job_id:
+        store.clear(tenant, job_id)
+    return JSONResponse(content={"table": table, **stats})
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus())
+
 # FastAPI já expõe /docs e /openapi.json automaticamente 
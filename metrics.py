@@ -0,0 +1,71 @@
+"""
+Registro de métricas em memória (formato texto do Prometheus)
+"""
+
+import threading
+from typing import Dict, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str] = None) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsRegistry:
+    """Contadores e gauges com labels, exportados em /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def inc_counter(self, name: str, value: float = 1, labels: Dict[str, str] = None, help: str = ""):
+        """Incrementa um contador"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def set_gauge(self, name: str, value: float, labels: Dict[str, str] = None, help: str = ""):
+        """Define o valor de um gauge"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+            if help:
+                self._help.setdefault(name, help)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Retorna uma cópia das métricas atuais"""
+        with self._lock:
+            return {
+                name: {_format_labels(key): value for key, value in series.items()}
+                for name, series in {**self._counters, **self._gauges}.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Renderiza as métricas no formato de exposição do Prometheus"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = ",".join(f'{k}="{v}"' for k, v in key)
+    return "{" + pairs + "}"
+
+
+# Registro global do processo
+metrics = MetricsRegistry()
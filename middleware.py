@@ -2,21 +2,43 @@
 Middleware para capturar headers e configurar Supabase dinamicamente
 """
 
+import copy
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from mcp.types import CallToolRequest, ListToolsRequest
 from config import Config
-from supabase_client import SupabaseClient
+from supabase_client import SupabaseClient, get_pinned_client
 
 logger = logging.getLogger(__name__)
 
+def tenant_from_headers(headers: Dict[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    """Extrai (project_code, access_token) dos headers da requisição"""
+    # Extrair project_code e access_token dos headers
+    project_code = headers.get('x-supabase-project')
+    access_token = headers.get('x-supabase-token')
+    
+    # Se não houver headers específicos, tentar formatos alternativos
+    if not project_code:
+        project_code = headers.get('supabase-project')
+    if not access_token:
+        access_token = headers.get('supabase-token')
+    
+    # Se ainda não encontrou, tentar Authorization header
+    if not access_token:
+        auth_header = headers.get('authorization', '')
+        if auth_header.startswith('Bearer '):
+            access_token = auth_header[7:]  # Remove 'Bearer '
+    
+    return project_code, access_token
+
 class DynamicConfigMiddleware:
     """Middleware para configuração dinâmica do Supabase"""
     
     def __init__(self, default_config: Config):
         self.default_config = default_config
         self.current_config = default_config
-        self.current_client = SupabaseClient(default_config)
+        # O cliente atual é reconfigurado no lugar (update_config): nunca sobre a configuração padrão
+        self.current_client = SupabaseClient(copy.copy(default_config))
     
     def extract_headers_from_request(self, request: Any) -> Dict[str, str]:
         """Extrai headers relevantes da requisição MCP"""
@@ -35,21 +57,7 @@ class DynamicConfigMiddleware:
     def update_config_from_headers(self, headers: Dict[str, str]) -> bool:
         """Atualiza configuração baseada nos headers"""
         try:
-            # Extrair project_code e access_token dos headers
-            project_code = headers.get('x-supabase-project')
-            access_token = headers.get('x-supabase-token')
-            
-            # Se não houver headers específicos, tentar formatos alternativos
-            if not project_code:
-                project_code = headers.get('supabase-project')
-            if not access_token:
-                access_token = headers.get('supabase-token')
-            
-            # Se ainda não encontrou, tentar Authorization header
-            if not access_token:
-                auth_header = headers.get('authorization', '')
-                if auth_header.startswith('Bearer '):
-                    access_token = auth_header[7:]  # Remove 'Bearer '
+            project_code, access_token = tenant_from_headers(headers)
             
             # Se encontrou configuração dinâmica, atualizar
             if project_code and access_token:
@@ -68,7 +76,7 @@ class DynamicConfigMiddleware:
                 if self.current_config != self.default_config:
                     logger.info("Revertendo para configuração padrão")
                     self.current_config = self.default_config
-                    self.current_client = SupabaseClient(self.default_config)
+                    self.current_client = SupabaseClient(copy.copy(self.default_config))
                 
                 return False
                 
@@ -82,4 +90,12 @@ class DynamicConfigMiddleware:
     
     def get_current_config(self) -> Config:
         """Retorna a configuração atual"""
-        return self.current_config 
\ No newline at end of file
+        return self.current_config
+    
+    def get_request_client(self, config: Config) -> SupabaseClient:
+        """
+        Cliente fixo do projeto de config, para executar ferramentas e trabalho que
+        continua depois da requisição (jobs): o cliente atual muda de projeto a
+        cada requisição, inclusive enquanto outra aguarda o upstream
+        """
+        return get_pinned_client(config) 
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Backend Postgres direto (asyncpg) para as ferramentas de SQL
+
+Alternativa ao RPC exec_sql via PostgREST: um pool de conexões por projeto,
+com cache de prepared statements e decodificação pelo protocolo binário.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import Config
+from deadlines import remaining
+
+logger = logging.getLogger(__name__)
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+def quote_ident(name: str) -> str:
+    """Cita um identificador (aceita "schema.tabela")"""
+    if not name:
+        raise ValueError("Identificador vazio")
+    return ".".join('"' + part.replace('"', '""') + '"' for part in name.split("."))
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "t", "1", "yes", "on")
+    return bool(value)
+
+
+# Conversores de valores vindos do JSON para os tipos esperados pelo asyncpg
+PARAM_COERCERS = {
+    "int2": int, "int4": int, "int8": int,
+    "float4": float, "float8": float,
+    "numeric": lambda v: Decimal(str(v)),
+    "bool": _to_bool,
+    "uuid": lambda v: uuid.UUID(str(v)),
+    "json": lambda v: v if isinstance(v, str) else json.dumps(v),
+    "jsonb": lambda v: v if isinstance(v, str) else json.dumps(v),
+    "date": lambda v: date.fromisoformat(v) if isinstance(v, str) else v,
+    "time": lambda v: time.fromisoformat(v) if isinstance(v, str) else v,
+    "timestamp": lambda v: datetime.fromisoformat(v) if isinstance(v, str) else v,
+    "timestamptz": lambda v: datetime.fromisoformat(v) if isinstance(v, str) else v,
+    "text": str, "varchar": str, "bpchar": str,
+}
+
+
+def coerce_params(parameter_types: Sequence[Any], params: Sequence[Any]) -> List[Any]:
+    """Converte parâmetros para os tipos do prepared statement (ex.: "5" -> 5 em int4)"""
+    coerced = []
+    for parameter_type, value in zip(parameter_types, params):
+        name = parameter_type.name
+        is_array = name.startswith("_") and isinstance(value, (list, tuple))
+        coercer = PARAM_COERCERS.get(name[1:] if is_array else name)
+        if value is None or coercer is None:
+            coerced.append(value)
+            continue
+        try:
+            if is_array:
+                coerced.append([None if item is None else coercer(item) for item in value])
+            else:
+                coerced.append(coercer(value))
+        except (TypeError, ValueError, ArithmeticError) as e:
+            raise ValueError(f"Valor inválido para o tipo {parameter_type.name}: {value!r} ({str(e)})")
+    return coerced
+
+
+async def fetch_prepared(connection, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """Prepara (com cache) e executa uma consulta em uma conexão, dentro do prazo da requisição"""
+    statement = await connection.prepare(sql, timeout=remaining())
+    if params:
+        params = coerce_params(statement.get_parameters(), params)
+    # No timeout, o asyncpg cancela a consulta no servidor
+    records = await statement.fetch(*params, timeout=remaining())
+    return [dict(record) for record in records]
+
+
+class PostgresBackend:
+    """Pool asyncpg de um projeto, criado sob demanda"""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10,
+                 statement_cache_size: int = 100, command_timeout: float = 30):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.command_timeout = command_timeout
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self):
+        """Retorna o pool de conexões, criando-o na primeira chamada"""
+        if self._pool is not None:
+            return self._pool
+        if asyncpg is None:
+            raise Exception("Backend Postgres requer o pacote 'asyncpg'")
+        # Chamadas simultâneas na primeira vez criariam um pool cada (e vazariam os demais)
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    self.dsn,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    # Poolers em modo transação (PgBouncer/Supavisor) exigem 0
+                    statement_cache_size=self.statement_cache_size,
+                    command_timeout=self.command_timeout,
+                )
+        return self._pool
+
+    async def fetch(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Executa uma consulta e retorna as linhas como dicionários"""
+        pool = await self.get_pool()
+        async with pool.acquire(timeout=remaining()) as connection:
+            return await fetch_prepared(connection, sql, params)
+
+    async def explain(self, sql: str, params: Sequence[Any] = (), analyze: bool = True) -> Any:
+        """Retorna o plano (FORMAT JSON); com analyze, executa em transação desfeita ao final"""
+        pool = await self.get_pool()
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        async with pool.acquire(timeout=remaining()) as connection:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                rows = await fetch_prepared(connection, f"EXPLAIN ({options}) {sql}", params)
+            finally:
+                await transaction.rollback()
+        plan = rows[0]["QUERY PLAN"]
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+# Backends por projeto
+_backends: Dict[str, PostgresBackend] = {}
+
+
+def get_postgres_backend(config: Config) -> Optional[PostgresBackend]:
+    """Retorna o backend do projeto atual ou None se não houver DSN configurado"""
+    dsn = config.get_database_url()
+    if not dsn:
+        return None
+    tenant = config.get_tenant_id()
+    backend = _backends.get(tenant)
+    if backend is None or backend.dsn != dsn:
+        backend = PostgresBackend(
+            dsn,
+            min_size=config.db_pool_min_size,
+            max_size=config.db_pool_max_size,
+            statement_cache_size=config.db_statement_cache_size,
+            command_timeout=config.request_timeout,
+        )
+        _backends[tenant] = backend
+    return backend
+
+
+async def close_postgres_backends():
+    """Fecha todos os pools (chamar no desligamento)"""
+    for backend in _backends.values():
+        await backend.close()
+    _backends.clear()
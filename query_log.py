@@ -0,0 +1,103 @@
+"""
+Log de consultas lentas e resumo de planos de execução do Postgres
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Forma normalizada da consulta: literais viram '?' e listas IN colapsam"""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip().rstrip(";")
+
+
+def summarize_plan(plan: Any) -> Optional[Dict[str, Any]]:
+    """Resume um plano EXPLAIN (FORMAT JSON): nó raiz, custo, linhas, tempos e seq scans"""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if isinstance(plan, list):
+        plan = plan[0] if plan else None
+    if not isinstance(plan, dict) or "Plan" not in plan:
+        return None
+
+    root = plan["Plan"]
+    seq_scans = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.append(node.get("Relation Name"))
+        stack.extend(node.get("Plans", []))
+
+    return {
+        "node": root.get("Node Type"),
+        "total_cost": root.get("Total Cost"),
+        "plan_rows": root.get("Plan Rows"),
+        "actual_rows": root.get("Actual Rows"),
+        "planning_time_ms": plan.get("Planning Time"),
+        "execution_time_ms": plan.get("Execution Time"),
+        "seq_scans": seq_scans,
+    }
+
+
+class SlowQueryLog:
+    """Guarda as consultas mais recentes acima do limite de duração"""
+
+    def __init__(self, max_entries: int = 200):
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self._tasks = set()
+
+    def record(self, config: Config, kind: str, shape: str, duration_ms: float,
+               plan_fetcher: Optional[Callable[[], Awaitable[Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Registra a chamada se passou do limite; o plano é obtido em segundo plano"""
+        if config.slow_query_threshold_ms <= 0 or duration_ms < config.slow_query_threshold_ms:
+            return None
+
+        entry = {
+            "timestamp": time.time(),
+            "tenant": config.get_tenant_id(),
+            "kind": kind,
+            "shape": shape,
+            "duration_ms": round(duration_ms, 2),
+            "plan": None,
+        }
+        self._entries.append(entry)
+        logger.warning(f"Consulta lenta ({entry['duration_ms']} ms) em {entry['tenant']}: {shape}")
+
+        if plan_fetcher is not None and config.slow_query_capture_plan:
+            task = asyncio.ensure_future(self._attach_plan(entry, plan_fetcher))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _attach_plan(self, entry: Dict[str, Any], plan_fetcher: Callable[[], Awaitable[Any]]):
+        try:
+            entry["plan"] = summarize_plan(await plan_fetcher())
+        except Exception as e:
+            entry["plan"] = {"error": str(e)}
+
+    def entries(self, tenant: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Entradas mais recentes primeiro (opcionalmente de um projeto)"""
+        selected = [e for e in reversed(self._entries) if tenant is None or e["tenant"] == tenant]
+        return selected[:limit]
+
+
+# Log compartilhado do processo
+slow_query_log = SlowQueryLog()
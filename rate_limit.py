@@ -0,0 +1,153 @@
+"""
+Limites de taxa (token bucket) e de concorrência por projeto
+"""
+
+import importlib
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket simples: `rate` fichas por segundo, até `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Consome fichas; retorna 0 se permitido ou os segundos até haver fichas"""
+        now = time.monotonic()
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens >= cost:
+            self.tokens = tokens - cost
+            return 0.0
+        self.tokens = tokens
+        return (cost - tokens) / self.rate
+
+
+class RateLimitBackend(ABC):
+    """Interface de armazenamento dos limites (substituível por um backend compartilhado)"""
+
+    @abstractmethod
+    def try_acquire(self, tenant: str, cost: float = 1.0) -> float:
+        """Retorna 0 se a requisição pode seguir ou o Retry-After em segundos"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets em memória, um por projeto (limite por worker). Guarda no máximo
+    `max_tenants` buckets, descartando os usados há mais tempo; um projeto
+    descartado volta com o bucket cheio, o mesmo estado de quem ficou parado
+    """
+
+    def __init__(self, rate: float, burst: float, max_tenants: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_tenants = max_tenants
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def try_acquire(self, tenant: str, cost: float = 1.0) -> float:
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        return bucket.take(cost)
+
+
+def load_backend(config: Config) -> RateLimitBackend:
+    """Carrega o backend configurado em RATE_LIMIT_BACKEND ("modulo:Classe")"""
+    if not config.rate_limit_backend:
+        return InMemoryRateLimitBackend(config.rate_limit_rps, config.rate_limit_burst,
+                                        config.rate_limit_max_tenants)
+    module_name, _, class_name = config.rate_limit_backend.partition(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    logger.info(f"Usando backend de rate limit: {config.rate_limit_backend}")
+    return backend_class(config)
+
+
+class TenantLimiter:
+    """Aplica token bucket e limite de requisições simultâneas por projeto"""
+
+    def __init__(self, config: Config, backend: Optional[RateLimitBackend] = None):
+        self.max_in_flight = config.rate_limit_max_in_flight
+        self.backend = backend or load_backend(config)
+        self._in_flight: Dict[str, int] = {}
+
+    def acquire(self, tenant: str) -> float:
+        """Reserva uma vaga para o projeto; retorna 0 ou o Retry-After em segundos"""
+        in_flight = self._in_flight.get(tenant, 0)
+        if in_flight >= self.max_in_flight:
+            return 1.0
+        retry_after = self.backend.try_acquire(tenant)
+        if retry_after:
+            return retry_after
+        self._in_flight[tenant] = in_flight + 1
+        return 0.0
+
+    def release(self, tenant: str):
+        """Libera a vaga reservada por acquire()"""
+        # Sem requisições em andamento o projeto sai do dicionário (não cresce sem limite)
+        in_flight = self._in_flight.pop(tenant) - 1
+        if in_flight:
+            self._in_flight[tenant] = in_flight
+
+    def in_flight(self, tenant: str) -> int:
+        return self._in_flight.get(tenant, 0)
+
+
+class TenantRateLimitMiddleware:
+    """
+    Middleware ASGI que aplica o TenantLimiter em /mcp/*. A vaga só é liberada
+    quando a aplicação termina de enviar a resposta (inclusive corpos em
+    streaming) ou falha, mesmo que o cliente desconecte antes do primeiro bloco
+    """
+
+    def __init__(self, app: ASGIApp, limiter: TenantLimiter, path_prefix: str = "/mcp/"):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        tenant = headers.get("x-supabase-project") or headers.get("supabase-project") or "default"
+        retry_after = self.limiter.acquire(tenant)
+        if retry_after:
+            metrics.inc_counter(
+                "mcp_rate_limited_total", labels={"tenant": tenant},
+                help="Requisições rejeitadas pelo limite por projeto",
+            )
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": f"Limite de requisições excedido para o projeto {tenant}"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(tenant)
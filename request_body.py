@@ -0,0 +1,240 @@
+"""
+Leitura incremental do envelope de /mcp/call_tool
+
+O corpo é lido em blocos e analisado com ijson à medida que chega: o limite
+de tamanho da ferramenta é aplicado assim que o campo "name" é lido, antes de
+bufferizar o restante, e argumentos de lista marcados como "streamáveis" são
+gravados item a item em um arquivo temporário (em memória até
+SPOOL_MEMORY_BYTES) e entregues à ferramenta como um iterador assíncrono de
+itens. A ferramenta só começa depois que o envelope inteiro foi lido e os
+argumentos obrigatórios conferidos: a ordem dos campos não importa, e nenhum
+campo lido depois da lista é perdido ou descoberto com registros já gravados.
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Argumento de lista entregue como iterador assíncrono e os demais argumentos
+# obrigatórios da ferramenta (conferidos antes de ela começar)
+STREAMABLE_ARGUMENTS = {
+    "database_insert": ("data", ("table",)),
+}
+
+# Itens de um argumento streamado mantidos em memória antes de ir para o disco
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    """O corpo da requisição excede o limite da ferramenta"""
+
+    def __init__(self, limit: int, tool: Optional[str] = None):
+        self.limit = limit
+        self.tool = tool
+        target = f" para a ferramenta {tool}" if tool else ""
+        super().__init__(f"Corpo da requisição excede o limite de {limit} bytes{target}")
+
+
+class LimitedBodyReader:
+    """Adapta um stream de bytes (request.stream()) a read(n), contando bytes lidos"""
+
+    def __init__(self, stream: AsyncIterator[bytes], limit: int):
+        self._chunks = stream.__aiter__()
+        self._buffer = b""
+        self._eof = False
+        self.bytes_read = 0
+        self.limit = limit
+        self.tool: Optional[str] = None
+
+    def set_limit(self, limit: int, tool: Optional[str] = None):
+        """Ajusta o limite (ex.: ao descobrir a ferramenta chamada)"""
+        self.limit = limit
+        self.tool = tool
+        if self.bytes_read > limit:
+            raise BodyTooLarge(limit, tool)
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b""
+        if not self._buffer and not self._eof:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+                chunk = b""
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self.limit:
+                raise BodyTooLarge(self.limit, self.tool)
+            self._buffer = chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    async def read_all(self) -> bytes:
+        parts = []
+        while True:
+            data = await self.read(65536)
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+
+async def _parse_events(reader: LimitedBodyReader, chunk_size: int = 65536):
+    """Eventos do ijson; a interface "push" evita que o parser controle as leituras assíncronas"""
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events, use_float=True)
+    while True:
+        chunk = await reader.read(chunk_size)
+        try:
+            if chunk:
+                parser.send(chunk)
+            else:
+                parser.close()
+        except ijson.JSONError as e:
+            raise ValueError(str(e))
+        for event in events:
+            yield event
+        del events[:]
+        if not chunk:
+            return
+
+
+async def _next(events):
+    try:
+        return await events.__anext__()
+    except StopAsyncIteration:
+        raise ValueError("JSON incompleto no corpo da requisição")
+
+
+async def _build_value(event: str, value: Any, events) -> Any:
+    """Monta o valor completo que começa no evento atual"""
+    if event not in ("start_map", "start_array"):
+        return value
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    while depth:
+        _, event, value = await _next(events)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+        builder.event(event, value)
+    return builder.value
+
+
+class SpooledArray:
+    """Iterador assíncrono sobre os itens de um argumento de lista, guardados em arquivo temporário"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.count = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES, mode="w+b")
+        self._hash = hashlib.sha256()
+        self._reading = False
+
+    async def fill(self, events):
+        """Grava os itens até o fim da lista (um item em memória por vez)"""
+        while True:
+            _, event, value = await _next(events)
+            if event == "end_array":
+                return
+            item = await _build_value(event, value, events)
+            line = json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n"
+            self._file.write(line)
+            self._hash.update(line)
+            self.count += 1
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash dos itens (para comparar chamadas com a mesma chave de idempotência)"""
+        return self._hash.hexdigest()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __aiter__(self):
+        if not self._reading:
+            self._reading = True
+            self._file.seek(0)
+        return self
+
+    async def __anext__(self) -> Any:
+        line = self._file.readline()
+        if not line:
+            self._file.close()
+            raise StopAsyncIteration
+        return json.loads(line)
+
+
+async def parse_call_envelope(reader: LimitedBodyReader, name: Optional[str] = None,
+                              limit_for: Optional[Callable[[str], int]] = None,
+                              stream_arrays: bool = True) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Lê {"name": ..., "arguments": {...}} do corpo, aplicando o limite da
+    ferramenta assim que o nome é conhecido
+    """
+    if name and limit_for:
+        reader.set_limit(limit_for(name), name)
+
+    if ijson is None:
+        # Sem ijson: corpo inteiro em memória (ainda respeitando o limite)
+        body = json.loads(await reader.read_all() or b"{}")
+        name = name or body.get("name")
+        if name and limit_for:
+            reader.set_limit(limit_for(name), name)
+        return name, body.get("arguments") or {}
+
+    events = _parse_events(reader).__aiter__()
+    arguments: Dict[str, Any] = {}
+
+    _, event, _ = await _next(events)
+    if event != "start_map":
+        raise ValueError("O corpo da requisição deve ser um objeto JSON")
+
+    while True:
+        _, event, key = await _next(events)
+        if event == "end_map":
+            break
+        _, event, value = await _next(events)
+
+        if key == "name" and event == "string":
+            if not name:
+                name = value
+                if limit_for:
+                    reader.set_limit(limit_for(name), name)
+        elif key == "arguments" and event == "start_map":
+            # "name" depois de "arguments": a lista fica em memória (sem saber a ferramenta)
+            streamable = STREAMABLE_ARGUMENTS.get(name) if (name and stream_arrays) else None
+            while True:
+                _, event, arg_key = await _next(events)
+                if event == "end_map":
+                    break
+                _, event, value = await _next(events)
+                if streamable and arg_key == streamable[0] and event == "start_array":
+                    spooled = SpooledArray(arg_key)
+                    await spooled.fill(events)
+                    arguments[arg_key] = spooled
+                else:
+                    arguments[arg_key] = await _build_value(event, value, events)
+        else:
+            await _build_value(event, value, events)
+
+    # Argumentos conferidos antes da ferramenta começar (nada gravado com o corpo incompleto)
+    streamable = STREAMABLE_ARGUMENTS.get(name) if stream_arrays else None
+    if streamable and isinstance(arguments.get(streamable[0]), SpooledArray):
+        missing = [key for key in streamable[1] if key not in arguments]
+        if missing:
+            raise ValueError(f"Argumentos obrigatórios ausentes para {name}: {', '.join(missing)}")
+    return name, arguments
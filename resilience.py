@@ -0,0 +1,311 @@
+"""
+Camada de resiliência para chamadas ao Supabase: retry com jitter,
+requisições "hedged" para leituras lentas e circuit breaker por projeto
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from adaptive_limit import AdaptiveLimiter, get_limiter
+from config import Config
+from deadlines import DeadlineExceeded, remaining
+from executors import run_blocking
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP considerados transitórios
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """O circuito do projeto está aberto; a chamada falhou sem ir ao upstream"""
+
+    def __init__(self, tenant: str, retry_after: float):
+        self.tenant = tenant
+        self.retry_after = retry_after
+        super().__init__(
+            f"Circuito aberto para o projeto {tenant}; tente novamente em {retry_after:.1f}s"
+        )
+
+
+def _status_of(error: Exception) -> Optional[int]:
+    """Extrai o status HTTP de um erro dos clientes do Supabase, se houver"""
+    response = getattr(error, "response", None)
+    if isinstance(response, httpx.Response):
+        return response.status_code
+    for attribute in ("status", "status_code", "code"):
+        value = getattr(error, attribute, None)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """Indica se o erro é transitório (timeout, falha de rede ou 5xx/429)"""
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return _status_of(error) in TRANSIENT_STATUS
+
+
+class CircuitBreaker:
+    """Circuit breaker clássico: fechado -> aberto -> meio-aberto (uma sonda)"""
+
+    def __init__(self, tenant: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.tenant = tenant
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    def allow(self) -> bool:
+        """Indica se uma chamada pode seguir para o upstream"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != "closed":
+                self._set_state("closed")
+
+    def release(self):
+        """Libera a sonda sem registrar resultado (chamada interrompida pelo chamador)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def retry_after(self) -> float:
+        """Segundos até a próxima sonda ser permitida"""
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit breaker do projeto {self.tenant}: {self.state} -> {state}")
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(
+            "supabase_circuit_breaker_state",
+            BREAKER_STATE_VALUES[self.state],
+            {"tenant": self.tenant},
+            help="Estado do circuit breaker por projeto (0=fechado, 1=meio-aberto, 2=aberto)",
+        )
+
+
+class LatencyTracker:
+    """Janela deslizante de latências para calcular percentis"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# Estado compartilhado por projeto
+_breakers: Dict[str, CircuitBreaker] = {}
+_trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(config: Config) -> CircuitBreaker:
+    """Retorna o circuit breaker do projeto atual"""
+    tenant = config.get_tenant_id()
+    with _registry_lock:
+        breaker = _breakers.get(tenant)
+        if breaker is None:
+            breaker = CircuitBreaker(tenant, config.breaker_failure_threshold, config.breaker_reset_timeout)
+            _breakers[tenant] = breaker
+        return breaker
+
+
+def get_latency_tracker(config: Config, operation: str) -> LatencyTracker:
+    """Retorna o rastreador de latência de uma operação do projeto atual"""
+    key = (config.get_tenant_id(), operation)
+    with _registry_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = LatencyTracker()
+        return tracker
+
+
+async def _hedged(config: Config, tracker: LatencyTracker, operation: str, fn: Callable[[], Any]) -> Any:
+    """Executa fn e dispara uma segunda tentativa se a primeira passar do percentil"""
+    first = asyncio.ensure_future(run_blocking(config, operation, fn))
+    threshold = tracker.percentile(config.hedge_percentile, config.hedge_min_samples)
+    if threshold is None:
+        return await first
+
+    done, _ = await asyncio.wait({first}, timeout=threshold)
+    if done:
+        return first.result()
+
+    try:
+        remaining()
+    except DeadlineExceeded:
+        # Prazo esgotado (a primeira tentativa segue só para liberar a vaga do limite)
+        return await first
+
+    metrics.inc_counter(
+        "supabase_hedged_requests_total", labels={"tenant": config.get_tenant_id(), "operation": operation},
+        help="Requisições duplicadas por excederem o percentil de latência",
+    )
+    second = asyncio.ensure_future(run_blocking(config, operation, fn))
+    pending = {first, second}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return task.result()
+    return first.result()
+
+
+def _release_after_timeout(limiter: AdaptiveLimiter, task: asyncio.Future):
+    if not task.cancelled():
+        task.exception()
+    limiter.release(dropped=True)
+
+
+async def _limited(limiter: AdaptiveLimiter, operation: str, call: Awaitable[Any],
+                   timeout: Optional[float]) -> Any:
+    """
+    Executa a chamada dentro do limite adaptativo e do prazo, alimentando o
+    limite com latência, erros e prazos esgotados
+    """
+    try:
+        await limiter.acquire()
+    except asyncio.CancelledError:
+        call.close()
+        raise
+    started = time.monotonic()
+    task = asyncio.ensure_future(call)
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        # A thread segue chamando o upstream: a vaga continua ocupada até ela
+        # terminar, e o prazo esgotado conta como sinal de sobrecarga
+        task.add_done_callback(lambda done: _release_after_timeout(limiter, done))
+        raise
+    except asyncio.CancelledError:
+        task.cancel()
+        limiter.release()
+        raise
+    except Exception as e:
+        limiter.release(dropped=is_transient(e))
+        raise
+    limiter.release(latency=time.monotonic() - started, operation=operation)
+    return result
+
+
+async def call_upstream(config: Config, operation: str, fn: Callable[[], Any],
+                        idempotent: bool = False, hedge: bool = False) -> Any:
+    """
+    Executa uma chamada síncrona do SDK no pool da operação, aplicando circuit breaker,
+    retry com backoff exponencial e jitter (apenas operações idempotentes),
+    hedging (apenas leituras, quando habilitado), o limite adaptativo de
+    concorrência e o prazo da requisição
+    """
+    breaker = get_breaker(config)
+    tracker = get_latency_tracker(config, operation)
+    limiter = get_limiter(config, operation) if config.adaptive_limit_enabled else None
+    attempts = max(1, config.retry_max_attempts) if idempotent else 1
+
+    for attempt in range(1, attempts + 1):
+        try:
+            timeout = remaining()
+        except DeadlineExceeded:
+            raise DeadlineExceeded(operation)
+        if not breaker.allow():
+            metrics.inc_counter(
+                "supabase_circuit_rejections_total", labels={"tenant": breaker.tenant},
+                help="Chamadas rejeitadas com o circuito aberto",
+            )
+            raise CircuitOpenError(breaker.tenant, breaker.retry_after())
+
+        started = time.monotonic()
+        try:
+            if hedge and config.hedge_enabled:
+                call = _hedged(config, tracker, operation, fn)
+            else:
+                call = run_blocking(config, operation, fn)
+            # Esgotado o prazo, o chamador é liberado; a thread termina a requisição em curso
+            if limiter is not None:
+                result = await _limited(limiter, operation, call, timeout)
+            else:
+                result = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            # Prazo da requisição, não falha do upstream: não conta para o circuit breaker
+            breaker.release()
+            if timeout is None or time.monotonic() - started < timeout:
+                raise
+            metrics.inc_counter(
+                "supabase_deadline_exceeded_total", labels={"tenant": breaker.tenant, "operation": operation},
+                help="Chamadas interrompidas pelo prazo da requisição",
+            )
+            raise DeadlineExceeded(operation)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                # Erro do cliente (4xx): o upstream está respondendo
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = random.uniform(0, min(config.retry_max_delay, config.retry_base_delay * 2 ** (attempt - 1)))
+            left = remaining() if attempt < attempts else None
+            if attempt >= attempts or (left is not None and left <= delay):
+                raise
+            metrics.inc_counter(
+                "supabase_retries_total", labels={"tenant": breaker.tenant, "operation": operation},
+                help="Novas tentativas após erros transitórios",
+            )
+            logger.info(f"Erro transitório em {operation} (tentativa {attempt}/{attempts}): {str(e)}; nova tentativa em {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        tracker.observe(time.monotonic() - started)
+        return result
@@ -0,0 +1,155 @@
+"""
+Escalonamento de chamadas de ferramenta por classe de prioridade
+
+Cada chamada pertence a uma classe (interactive, default ou bulk), definida
+pela ferramenta (TOOL_CLASSES) ou pelo header x-priority. Até
+SCHEDULER_CONCURRENCY chamadas executam ao mesmo tempo; as demais aguardam em
+filas por classe, atendidas por stride scheduling com os pesos de
+SCHEDULER_WEIGHTS, e dentro de cada classe os projetos se alternam (round-robin),
+de modo que um projeto com muitas chamadas não atrasa os outros. A classe bulk
+ocupa no máximo SCHEDULER_BULK_MAX_SHARE da capacidade: o restante fica livre
+para chamadas interativas, que mantêm a latência baixa mesmo com uploads e
+exportações longos em andamento.
+"""
+
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+from config import Config
+from metrics import metrics
+
+PRIORITY_CLASSES = ("interactive", "default", "bulk")
+
+
+def tool_class(config: Config, tool: str, requested: Optional[str] = None) -> str:
+    """Classe da chamada: a pedida no header (se válida), a configurada para a ferramenta ou a do prefixo"""
+    if requested in PRIORITY_CLASSES:
+        return requested
+    if config.tool_classes.get(tool) in PRIORITY_CLASSES:
+        return config.tool_classes[tool]
+    if tool.startswith(("auth_", "job_")):
+        return "interactive"
+    return "default"
+
+
+class ToolScheduler:
+    """Filas ponderadas por classe, com revezamento entre projetos dentro de cada classe"""
+
+    def __init__(self, capacity: int, weights: Dict[str, float], bulk_max_share: float = 0.75):
+        self.capacity = max(1, capacity)
+        self.weights = {cls: max(weights.get(cls, 1.0), 0.001) for cls in PRIORITY_CLASSES}
+        self.bulk_limit = max(1, int(self.capacity * bulk_max_share))
+        self.in_flight = 0
+        self.running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            cls: OrderedDict() for cls in PRIORITY_CLASSES
+        }
+        self._waiting = {cls: 0 for cls in PRIORITY_CLASSES}
+        # Tempo virtual do stride scheduling: cada atendimento avança a classe em 1/peso
+        self._pass = {cls: 0.0 for cls in PRIORITY_CLASSES}
+        self._clock = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, cls: str, tenant: str):
+        """Aguarda a vez da chamada e mantém a vaga durante a execução"""
+        started = time.monotonic()
+        await self._acquire(cls, tenant)
+        metrics.inc_counter(
+            "mcp_scheduler_wait_seconds_total", time.monotonic() - started, labels={"class": cls},
+            help="Tempo total de espera na fila do escalonador, por classe",
+        )
+        metrics.inc_counter("mcp_scheduler_calls_total", labels={"class": cls},
+                            help="Chamadas liberadas pelo escalonador, por classe")
+        try:
+            yield
+        finally:
+            self._release(cls)
+
+    def _can_start(self, cls: str) -> bool:
+        if self.in_flight >= self.capacity:
+            return False
+        return cls != "bulk" or self.running["bulk"] < self.bulk_limit
+
+    def _start(self, cls: str):
+        self.in_flight += 1
+        self.running[cls] += 1
+
+    async def _acquire(self, cls: str, tenant: str):
+        if not any(self._waiting.values()) and self._can_start(cls):
+            self._start(cls)
+            return
+        if not self._waiting[cls]:
+            # Classe ociosa não acumula crédito para furar a fila depois
+            self._pass[cls] = max(self._pass[cls], self._clock)
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[cls].setdefault(tenant, deque()).append(waiter)
+        self._waiting[cls] += 1
+        self._publish(cls)
+        # Há vaga para esta classe mesmo com outras bloqueadas (ex.: bulk no limite)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga já era nossa: devolve
+                self._release(cls)
+            else:
+                self._discard(cls, tenant, waiter)
+            raise
+
+    def _discard(self, cls: str, tenant: str, waiter: asyncio.Future):
+        queue = self._queues[cls].get(tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._waiting[cls] -= 1
+            if not queue:
+                del self._queues[cls][tenant]
+            self._publish(cls)
+
+    def _release(self, cls: str):
+        self.in_flight -= 1
+        self.running[cls] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while True:
+            ready = [cls for cls in PRIORITY_CLASSES if self._waiting[cls] and self._can_start(cls)]
+            if not ready:
+                return
+            cls = min(ready, key=lambda c: self._pass[c])
+            self._clock = self._pass[cls]
+            self._pass[cls] += 1 / self.weights[cls]
+
+            # Próximo projeto da classe; ele vai para o fim da fila de projetos
+            tenants = self._queues[cls]
+            tenant, queue = next(iter(tenants.items()))
+            waiter = queue.popleft()
+            self._waiting[cls] -= 1
+            if queue:
+                tenants.move_to_end(tenant)
+            else:
+                del tenants[tenant]
+            self._publish(cls)
+            if waiter.done():
+                continue
+            self._start(cls)
+            waiter.set_result(None)
+
+    def _publish(self, cls: str):
+        metrics.set_gauge("mcp_scheduler_queued", self._waiting[cls], {"class": cls},
+                          help="Chamadas aguardando na fila do escalonador, por classe")
+
+
+_scheduler: Optional[ToolScheduler] = None
+
+
+def get_scheduler(config: Config) -> ToolScheduler:
+    """Retorna o escalonador do processo (criado com a configuração na primeira chamada)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ToolScheduler(config.scheduler_concurrency, config.scheduler_weights,
+                                   config.scheduler_bulk_max_share)
+    return _scheduler
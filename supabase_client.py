@@ -3,9 +3,28 @@ Cliente Supabase centralizado com suporte dinâmico
 """
 
 import asyncio
-from typing import Any, Dict, List, Optional
-from supabase import create_client, Client
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote, urljoin
+from supabase import create_client, Client, ClientOptions
 from config import Config
+from transport import get_http_client
+from resilience import call_upstream
+from deadlines import http_timeout
+from executors import run_blocking
+from postgres_backend import PostgresBackend, get_postgres_backend
+from filter_compiler import apply_filters, filter_compiler, filter_shape, validate_columns
+from query_log import slow_query_log
+
+logger = logging.getLogger(__name__)
+
+# Schemas das tabelas por projeto: tenant -> (obtido_em, {tabela: {coluna: tipo}}, {tabela: [chave primária]})
+_schema_cache: Dict[str, tuple] = {}
 
 class SupabaseClient:
     """Cliente Supabase com métodos assíncronos e configuração dinâmica"""
@@ -13,6 +32,7 @@ class SupabaseClient:
     def __init__(self, config: Config):
         self.config = config
         self.client: Optional[Client] = None
+        self._admin_client: Optional[Client] = None
         self._initialize_client()
     
     def _initialize_client(self):
@@ -24,56 +44,214 @@ class SupabaseClient:
             if not supabase_url or not supabase_key:
                 raise Exception("URL ou chave do Supabase não configuradas")
             
-            self.client = create_client(supabase_url, supabase_key)
+            self.client = create_client(supabase_url, supabase_key, options=self._client_options())
+            self._admin_client = None
             
         except Exception as e:
             raise Exception(f"Erro ao inicializar cliente Supabase: {str(e)}")
     
+    def _client_options(self) -> ClientOptions:
+        """Opções do cliente usando o pool HTTP compartilhado do host"""
+        return ClientOptions(httpx_client=get_http_client(self.config))
+    
+    async def _call(self, operation: str, fn, idempotent: bool = False, hedge: bool = False) -> Any:
+        """Executa uma chamada do SDK pela camada de resiliência"""
+        return await call_upstream(self.config, operation, fn, idempotent=idempotent, hedge=hedge)
+    
+    @property
+    def postgres(self) -> Optional[PostgresBackend]:
+        """Backend Postgres direto do projeto atual (None se não configurado)"""
+        return get_postgres_backend(self.config)
+    
+    def pinned(self) -> "SupabaseClient":
+        """Cliente fixo do projeto e das credenciais atuais (ver get_pinned_client)"""
+        return get_pinned_client(self.config)
+    
     def update_config(self, project_code: str, access_token: str):
         """Atualiza configuração dinamicamente"""
         self.config.project_code = project_code
         self.config.access_token = access_token
         self._initialize_client()
     
+    async def get_table_schema(self, table: str) -> Optional[Dict[str, str]]:
+        """Retorna {coluna: tipo} da tabela a partir do OpenAPI do PostgREST (com cache)"""
+        config = self.config
+        tenant = config.get_tenant_id()
+        cached = _schema_cache.get(tenant)
+        if cached is None or time.monotonic() - cached[0] > config.schema_cache_ttl:
+            key = config.get_supabase_key()
+            url = config.get_supabase_url()
+            
+            def fetch():
+                response = get_http_client(config).get(
+                    f"{url}/rest/v1/",
+                    headers={"apikey": key, "Authorization": f"Bearer {key}", "Accept": "application/openapi+json"},
+                )
+                response.raise_for_status()
+                return response.json()
+            
+            try:
+                spec = await self._call("schema", fetch, idempotent=True)
+            except Exception as e:
+                # Sem schema (ex.: OpenAPI desabilitado), os filtros seguem sem validação
+                logger.warning(f"Não foi possível obter o schema do projeto {tenant}: {str(e)}")
+                return None
+            definitions = {
+                name: {
+                    column: prop.get("format") or prop.get("type")
+                    for column, prop in definition.get("properties", {}).items()
+                }
+                for name, definition in spec.get("definitions", {}).items()
+            }
+            # O PostgREST marca as colunas da chave primária com <pk/> na descrição
+            primary_keys = {
+                name: [
+                    column for column, prop in definition.get("properties", {}).items()
+                    if "<pk/>" in (prop.get("description") or "")
+                ]
+                for name, definition in spec.get("definitions", {}).items()
+            }
+            cached = _schema_cache[tenant] = (time.monotonic(), definitions, primary_keys)
+            filter_compiler.invalidate(tenant)
+        return cached[1].get(table)
+    
+    async def get_primary_key(self, table: str) -> List[str]:
+        """Colunas da chave primária da tabela ([] sem schema ou sem chave)"""
+        tenant = self.config.get_tenant_id()
+        if await self.get_table_schema(table) is None:
+            return []
+        return _schema_cache[tenant][2].get(table, [])
+    
+    async def _apply_filters(self, query, table: str, filters: List[Dict[str, Any]]):
+        """Compila (com cache de templates) e aplica os filtros à consulta"""
+        if not filters:
+            return query
+        tenant = self.config.get_tenant_id()
+        schema = await self.get_table_schema(table) if self.config.validate_filters else None
+        compiled = filter_compiler.compile(tenant, table, filters, schema)
+        return apply_filters(query, compiled.bind(filters))
+    
+    async def _build_select(self, table: str, query_params: Dict[str, Any]):
+        """Monta a consulta de seleção (colunas, filtros, ordenação e paginação)"""
+        columns = query_params.get("columns") or ["*"]
+        order_by = query_params.get("order_by")
+        # Uma coluna ({"column", "desc"}) ou uma lista delas, em ordem de prioridade
+        orders = order_by if isinstance(order_by, list) else ([order_by] if order_by else [])
+        # Cliente capturado antes de aguardar o schema: a consulta vai ao projeto validado
+        client = self.client
+        if self.config.validate_filters and (columns != ["*"] or orders):
+            schema = await self.get_table_schema(table)
+            validate_columns(columns + [order["column"] for order in orders], schema, table)
+        
+        query = client.table(table).select(",".join(columns))
+        
+        # Aplicar filtros
+        if "filters" in query_params:
+            query = await self._apply_filters(query, table, query_params["filters"])
+        
+        # Aplicar ordenação
+        for order in orders:
+            query = query.order(order["column"], desc=order.get("desc", False))
+        
+        # Aplicar paginação
+        if "limit" in query_params:
+            query = query.limit(query_params["limit"])
+        if "offset" in query_params:
+            query = query.range(query_params["offset"], query_params["offset"] + query_params.get("limit", 100) - 1)
+        return query
+    
+    @staticmethod
+    def _select_shape(table: str, query_params: Dict[str, Any]) -> str:
+        """Forma normalizada da seleção (sem valores) para o log de consultas lentas"""
+        columns = ",".join(query_params.get("columns") or ["*"])
+        order_by = query_params.get("order_by") or []
+        orders = order_by if isinstance(order_by, list) else [order_by]
+        return (f"select {columns} from {table} where {filter_shape(query_params.get('filters') or [])}"
+                f" order by {','.join(str(order.get('column')) for order in orders) or None}")
+    
     async def query_table(self, table: str, query_params: Dict[str, Any] = None) -> List[Dict]:
         """Executa query em uma tabela"""
         try:
-            query = self.client.table(table).select("*")
+            query_params = query_params or {}
+            query = await self._build_select(table, query_params)
             
-            if query_params:
-                # Aplicar filtros
-                if "filters" in query_params:
-                    for filter_item in query_params["filters"]:
-                        query = query.filter(filter_item["column"], filter_item["operator"], filter_item["value"])
-                
-                # Aplicar ordenação
-                if "order_by" in query_params:
-                    query = query.order(query_params["order_by"]["column"], desc=query_params["order_by"].get("desc", False))
-                
-                # Aplicar paginação
-                if "limit" in query_params:
-                    query = query.limit(query_params["limit"])
-                if "offset" in query_params:
-                    query = query.range(query_params["offset"], query_params["offset"] + query_params.get("limit", 100) - 1)
-            
-            result = query.execute()
+            started = time.perf_counter()
+            result = await self._call("select", query.execute, idempotent=True, hedge=True)
+            slow_query_log.record(
+                self.config, "select", self._select_shape(table, query_params),
+                (time.perf_counter() - started) * 1000,
+                plan_fetcher=lambda: self.explain_select(table, query_params, analyze=False),
+            )
             return result.data
             
         except Exception as e:
             raise Exception(f"Erro ao consultar tabela {table}: {str(e)}")
     
+    async def explain_select(self, table: str, query_params: Dict[str, Any] = None, analyze: bool = True) -> Any:
+        """Retorna o plano de execução da seleção (requer db-plan-enabled no PostgREST)"""
+        try:
+            query = await self._build_select(table, query_params or {})
+            explain = query.explain(analyze=analyze, buffers=analyze, format="json")
+            result = await self._call("explain", explain.execute, idempotent=True)
+            return result.data
+        except Exception as e:
+            raise Exception(f"Erro ao obter plano da consulta na tabela {table}: {str(e)}")
+    
+    async def count_rows(self, table: str, filters: List[Dict[str, Any]] = None, mode: str = "exact") -> int:
+        """Conta registros sem transferir linhas (count=exact|planned|estimated)"""
+        try:
+            query = self.client.table(table).select("*", count=mode, head=True)
+            query = await self._apply_filters(query, table, filters)
+            result = await self._call("count", query.execute, idempotent=True, hedge=True)
+            return result.count
+        except Exception as e:
+            raise Exception(f"Erro ao contar registros da tabela {table}: {str(e)}")
+    
+    async def aggregate_table(self, table: str, select: str, filters: List[Dict[str, Any]] = None) -> List[Dict]:
+        """Executa uma seleção com funções de agregação do PostgREST (ex.: "status,amount.sum()")"""
+        try:
+            query = self.client.table(table).select(select)
+            query = await self._apply_filters(query, table, filters)
+            result = await self._call("aggregate", query.execute, idempotent=True, hedge=True)
+            return result.data
+        except Exception as e:
+            raise Exception(f"Erro ao agregar tabela {table}: {str(e)}")
+    
+    async def exec_sql(self, sql: str) -> Any:
+        """Executa SQL pelo RPC exec_sql do PostgREST (sem backend Postgres direto)"""
+        result = await self._call("exec_sql", self.client.rpc("exec_sql", {"sql_query": sql}).execute)
+        return result.data
+    
     async def insert_record(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Insere um registro em uma tabela"""
         try:
-            result = self.client.table(table).insert(data).execute()
+            result = await self._call("insert", self.client.table(table).insert(data).execute)
             return result.data[0] if result.data else {}
         except Exception as e:
             raise Exception(f"Erro ao inserir registro na tabela {table}: {str(e)}")
     
+    async def insert_records(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """Insere vários registros em uma única requisição (sem retornar as linhas)"""
+        try:
+            await self._call("insert", self.client.table(table).insert(rows, returning="minimal").execute)
+            return len(rows)
+        except Exception as e:
+            raise Exception(f"Erro ao inserir registros na tabela {table}: {str(e)}")
+    
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insere vários registros em uma única requisição e retorna as linhas inseridas"""
+        try:
+            result = await self._call("insert", self.client.table(table).insert(rows).execute)
+            return result.data or []
+        except Exception as e:
+            raise Exception(f"Erro ao inserir registros na tabela {table}: {str(e)}")
+    
     async def update_record(self, table: str, record_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Atualiza um registro"""
         try:
-            result = self.client.table(table).update(data).eq("id", record_id).execute()
+            result = await self._call(
+                "update", self.client.table(table).update(data).eq("id", record_id).execute, idempotent=True
+            )
             return result.data[0] if result.data else {}
         except Exception as e:
             raise Exception(f"Erro ao atualizar registro na tabela {table}: {str(e)}")
@@ -81,7 +259,9 @@ class SupabaseClient:
     async def delete_record(self, table: str, record_id: str) -> bool:
         """Deleta um registro"""
         try:
-            result = self.client.table(table).delete().eq("id", record_id).execute()
+            result = await self._call(
+                "delete", self.client.table(table).delete().eq("id", record_id).execute, idempotent=True
+            )
             return len(result.data) > 0
         except Exception as e:
             raise Exception(f"Erro ao deletar registro na tabela {table}: {str(e)}")
@@ -89,13 +269,13 @@ class SupabaseClient:
     async def sign_up(self, email: str, password: str, user_data: Dict[str, Any] = None) -> Dict[str, Any]:
         """Registra um novo usuário"""
         try:
-            result = self.client.auth.sign_up({
+            result = await self._call("sign_up", lambda: self.client.auth.sign_up({
                 "email": email,
                 "password": password,
                 "options": {
                     "data": user_data or {}
                 }
-            })
+            }))
             return result.user.__dict__ if result.user else {}
         except Exception as e:
             raise Exception(f"Erro ao registrar usuário: {str(e)}")
@@ -103,10 +283,10 @@ class SupabaseClient:
     async def sign_in(self, email: str, password: str) -> Dict[str, Any]:
         """Faz login do usuário"""
         try:
-            result = self.client.auth.sign_in_with_password({
+            result = await self._call("sign_in", lambda: self.client.auth.sign_in_with_password({
                 "email": email,
                 "password": password
-            })
+            }))
             return result.user.__dict__ if result.user else {}
         except Exception as e:
             raise Exception(f"Erro ao fazer login: {str(e)}")
@@ -114,19 +294,31 @@ class SupabaseClient:
     async def sign_out(self) -> bool:
         """Faz logout do usuário"""
         try:
-            self.client.auth.sign_out()
+            await self._call("sign_out", self.client.auth.sign_out)
             return True
         except Exception as e:
             raise Exception(f"Erro ao fazer logout: {str(e)}")
     
+    async def get_user(self) -> Any:
+        """Retorna o usuário da sessão atual"""
+        return await self._call("get_user", self.client.auth.get_user, idempotent=True)
+    
+    async def reset_password_email(self, email: str) -> Any:
+        """Envia o email de redefinição de senha"""
+        return await self._call("reset_password", lambda: self.client.auth.reset_password_email(email))
+    
+    async def update_user(self, user_data: Dict[str, Any]) -> Any:
+        """Atualiza os dados do usuário da sessão atual"""
+        return await self._call("update_user", lambda: self.client.auth.update_user(user_data))
+    
     async def upload_file(self, bucket: str, path: str, file_data: bytes, content_type: str = None) -> Dict[str, Any]:
         """Faz upload de um arquivo"""
         try:
-            result = self.client.storage.from_(bucket).upload(
+            result = await self._call("upload", lambda: self.client.storage.from_(bucket).upload(
                 path=path,
                 file=file_data,
                 file_options={"content-type": content_type} if content_type else {}
-            )
+            ))
             return result
         except Exception as e:
             raise Exception(f"Erro ao fazer upload do arquivo: {str(e)}")
@@ -134,7 +326,224 @@ class SupabaseClient:
     async def download_file(self, bucket: str, path: str) -> bytes:
         """Faz download de um arquivo"""
         try:
-            result = self.client.storage.from_(bucket).download(path)
+            result = await self._call(
+                "download", lambda: self.client.storage.from_(bucket).download(path), idempotent=True, hedge=True
+            )
             return result
         except Exception as e:
-            raise Exception(f"Erro ao fazer download do arquivo: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Erro ao fazer download do arquivo: {str(e)}")
+    
+    async def list_files(self, bucket: str, path: str = "") -> List[Dict[str, Any]]:
+        """Lista os arquivos de um caminho do bucket"""
+        return await self._call(
+            "list_files", lambda: self.client.storage.from_(bucket).list(path), idempotent=True, hedge=True
+        )
+    
+    async def remove_file(self, bucket: str, path: str) -> Any:
+        """Remove um arquivo do bucket"""
+        return await self._call("remove_files", lambda: self.client.storage.from_(bucket).remove([path]), idempotent=True)
+    
+    async def list_buckets(self) -> List[Any]:
+        """Lista os buckets do projeto"""
+        return await self._call("list_buckets", self.client.storage.list_buckets, idempotent=True, hedge=True)
+    
+    def _storage_headers(self) -> Dict[str, str]:
+        key = self.config.get_supabase_key()
+        return {"apikey": key, "Authorization": f"Bearer {key}"}
+    
+    def _storage_url(self, path: str) -> str:
+        return f"{self.config.get_supabase_url().rstrip('/')}/storage/v1/{path}"
+    
+    async def iter_file_bytes(self, bucket: str, path: str, start: int = 0,
+                              chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Lê um objeto do Storage em blocos, a partir do byte start (sem carregá-lo inteiro)"""
+        http = get_http_client(self.config)
+        headers = self._storage_headers()
+        if start:
+            headers["Range"] = f"bytes={start}-"
+        request = http.build_request("GET", self._storage_url(f"object/{bucket}/{quote(path)}"), headers=headers,
+                                     timeout=http_timeout())
+        
+        def open_stream():
+            response = http.send(request, stream=True)
+            if response.status_code >= 400:
+                response.read()
+                response.close()
+                response.raise_for_status()
+            return response
+        
+        try:
+            response = await self._call("download", open_stream, idempotent=True)
+        except Exception as e:
+            raise Exception(f"Erro ao ler o arquivo {bucket}/{path}: {str(e)}")
+        try:
+            # Sem suporte a Range (200), descarta os bytes iniciais
+            skip = start if response.status_code == 200 else 0
+            chunks = response.iter_bytes(chunk_size)
+            while True:
+                chunk = await run_blocking(self.config, "download", lambda: next(chunks, None))
+                if chunk is None:
+                    break
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk, skip = chunk[dropped:], skip - dropped
+                if chunk:
+                    yield chunk
+        finally:
+            await run_blocking(self.config, "download", response.close)
+    
+    async def create_resumable_upload(self, bucket: str, path: str, content_type: str) -> str:
+        """Cria um upload resumível (TUS) de tamanho ainda desconhecido e retorna sua URL"""
+        metadata = ",".join(
+            f"{key} {base64.b64encode(value.encode('utf-8')).decode('ascii')}"
+            for key, value in (("bucketName", bucket), ("objectName", path), ("contentType", content_type))
+        )
+        headers = {
+            **self._storage_headers(),
+            "Tus-Resumable": "1.0.0",
+            "Upload-Defer-Length": "1",
+            "Upload-Metadata": metadata,
+            "x-upsert": "true",
+        }
+        http = get_http_client(self.config)
+        endpoint = self._storage_url("upload/resumable")
+        
+        def create():
+            response = http.post(endpoint, headers=headers, timeout=http_timeout())
+            response.raise_for_status()
+            return urljoin(endpoint, response.headers["Location"])
+        
+        try:
+            return await self._call("upload", create)
+        except Exception as e:
+            raise Exception(f"Erro ao criar upload de {bucket}/{path}: {str(e)}")
+    
+    async def upload_resumable_part(self, upload_url: str, offset: int, data: bytes,
+                                    total_length: Optional[int] = None) -> int:
+        """Envia uma parte do upload resumível; total_length finaliza o objeto"""
+        headers = {
+            **self._storage_headers(),
+            "Tus-Resumable": "1.0.0",
+            "Upload-Offset": str(offset),
+            "Content-Type": "application/offset+octet-stream",
+        }
+        if total_length is not None:
+            headers["Upload-Length"] = str(total_length)
+        http = get_http_client(self.config)
+        
+        def patch():
+            response = http.patch(upload_url, headers=headers, content=data, timeout=http_timeout())
+            response.raise_for_status()
+            return int(response.headers.get("Upload-Offset", offset + len(data)))
+        
+        try:
+            return await self._call("upload", patch)
+        except Exception as e:
+            raise Exception(f"Erro ao enviar parte do upload (offset {offset}): {str(e)}")
+    
+    async def get_resumable_offset(self, upload_url: str) -> Optional[int]:
+        """Bytes já recebidos de um upload resumível (None se expirou ou não existe)"""
+        headers = {**self._storage_headers(), "Tus-Resumable": "1.0.0"}
+        http = get_http_client(self.config)
+        
+        def head():
+            response = http.head(upload_url, headers=headers, timeout=http_timeout())
+            if response.status_code in (404, 410):
+                return None
+            response.raise_for_status()
+            return int(response.headers["Upload-Offset"])
+        
+        return await self._call("upload_status", head, idempotent=True)
+    
+    def get_admin_client(self) -> Client:
+        """Retorna um cliente autenticado com a chave de serviço (criado sob demanda)"""
+        if self._admin_client is None:
+            supabase_url = self.config.get_supabase_url()
+            service_key = self.config.get_supabase_service_key()
+            
+            if not supabase_url or not service_key:
+                raise Exception("Chave de serviço do Supabase não configurada")
+            
+            self._admin_client = create_client(supabase_url, service_key, options=self._client_options())
+        return self._admin_client
+    
+    async def list_users(self, page: int = 1, per_page: int = 100) -> List[Dict[str, Any]]:
+        """Lista uma página de usuários (admin)"""
+        try:
+            admin = self.get_admin_client().auth.admin
+            users = await self._call(
+                "list_users", lambda: admin.list_users(page=page, per_page=per_page), idempotent=True, hedge=True
+            )
+            return [user.model_dump(mode="json") for user in users]
+        except Exception as e:
+            raise Exception(f"Erro ao listar usuários: {str(e)}")
+    
+    async def iter_user_pages(self, per_page: int = 100, start_page: int = 1,
+                              max_pages: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Itera sobre as páginas de usuários até a última (ou até max_pages)"""
+        page = start_page
+        fetched = 0
+        while max_pages is None or fetched < max_pages:
+            users = await self.list_users(page, per_page)
+            if not users:
+                break
+            yield users
+            fetched += 1
+            if len(users) < per_page:
+                break
+            page += 1
+    
+    async def create_user(self, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        """Cria um usuário (admin)"""
+        try:
+            admin = self.get_admin_client().auth.admin
+            result = await self._call("create_user", lambda: admin.create_user(attributes))
+            return result.user.model_dump(mode="json") if result.user else {}
+        except Exception as e:
+            raise Exception(f"Erro ao criar usuário: {str(e)}")
+    
+    async def delete_user(self, user_id: str, soft_delete: bool = False) -> bool:
+        """Deleta um usuário (admin)"""
+        try:
+            admin = self.get_admin_client().auth.admin
+            await self._call("delete_user", lambda: admin.delete_user(user_id, soft_delete), idempotent=True)
+            return True
+        except Exception as e:
+            raise Exception(f"Erro ao deletar usuário {user_id}: {str(e)}")
+
+
+# Clientes por projeto reutilizados entre chamadas (LRU)
+_tenant_clients: "OrderedDict[tuple, SupabaseClient]" = OrderedDict()
+_tenant_clients_lock = threading.Lock()
+
+
+def get_tenant_client(project_code: str, access_token: str, max_size: int = 64) -> SupabaseClient:
+    """Retorna um cliente dedicado ao projeto, criando-o apenas na primeira vez"""
+    key = (project_code, hashlib.sha256(access_token.encode("utf-8")).hexdigest())
+    with _tenant_clients_lock:
+        client = _tenant_clients.get(key)
+        if client is not None:
+            _tenant_clients.move_to_end(key)
+            return client
+    client = SupabaseClient(Config(project_code, access_token))
+    with _tenant_clients_lock:
+        _tenant_clients[key] = client
+        while len(_tenant_clients) > max_size:
+            _tenant_clients.popitem(last=False)
+    return client
+
+
+_default_client: Optional[SupabaseClient] = None
+
+
+def get_pinned_client(config: Config) -> SupabaseClient:
+    """
+    Cliente que nunca muda de projeto nem de credenciais (o de get_tenant_client,
+    ou o da configuração padrão), para trabalho que sobrevive à requisição
+    """
+    global _default_client
+    if config.is_dynamic_config():
+        return get_tenant_client(config.project_code, config.access_token, config.tenant_client_cache_size)
+    if _default_client is None:
+        _default_client = SupabaseClient(Config())
+    return _default_client
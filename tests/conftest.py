@@ -0,0 +1,8 @@
+import pytest
+
+@pytest.fixture
+def mcp_server(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from main import SupabaseMCPServer
+    return SupabaseMCPServer()
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+import pytest
+from adaptive_limit import AdaptiveLimiter, get_limiter, service_for
+from metrics import metrics
+from resilience import call_upstream
+import executors
+
+class MockConfig:
+    retry_max_attempts = 1
+    retry_base_delay = 0
+    retry_max_delay = 0
+    hedge_enabled = False
+    breaker_failure_threshold = 10 ** 6
+    breaker_reset_timeout = 60
+    executor_workers = 64
+    storage_executor_workers = 2
+    adaptive_limit_enabled = True
+    adaptive_limit_initial = 20
+    adaptive_limit_min = 1
+    adaptive_limit_max = 200
+    adaptive_limit_backoff = 0.9
+    adaptive_limit_latency_tolerance = 2.0
+
+    def __init__(self, tenant, enabled=True):
+        self.tenant = tenant
+        self.adaptive_limit_enabled = enabled
+
+    def get_tenant_id(self):
+        return self.tenant
+
+class Overloaded(Exception):
+    status = 503
+
+class SlowStub:
+    """Upstream simulado: latência cresce acima da capacidade e responde 503 bem acima dela"""
+
+    def __init__(self, capacity=4, base_latency=0.005):
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.in_flight = 0
+        self.peak = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            load = self.in_flight / self.capacity
+        try:
+            if load > 3:
+                with self._lock:
+                    self.errors += 1
+                raise Overloaded("503 Service Unavailable")
+            time.sleep(self.base_latency * max(1.0, load))
+            return "ok"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+async def drive(config, stub, workers=32, calls=20):
+    async def worker():
+        for _ in range(calls):
+            try:
+                await call_upstream(config, "select", stub)
+            except Overloaded:
+                pass
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+
+def test_aimd_grows_when_used_and_backs_off_on_overload():
+    limiter = AdaptiveLimiter("t", "rest", initial=4, backoff=0.5)
+    limiter.in_flight = 4
+    limiter.release(latency=0.01)
+    assert limiter.limit == 4.25
+    limiter.in_flight = 1
+    limiter.release(latency=0.05)
+    assert limiter.limit == 2.125
+    limiter.in_flight = 1
+    limiter.release(dropped=True)
+    assert limiter.limit == 1.0625
+    assert service_for("upload") == "storage" and service_for("sign_in") == "auth" and service_for("select") == "rest"
+
+@pytest.mark.asyncio
+async def test_waiters_get_freed_slots_in_order():
+    limiter = AdaptiveLimiter("t", "rest", initial=1)
+    await limiter.acquire()
+    order = []
+
+    async def wait(n):
+        await limiter.acquire()
+        order.append(n)
+
+    waiters = [asyncio.ensure_future(wait(n)) for n in range(3)]
+    await asyncio.sleep(0)
+    waiters[1].cancel()
+    limiter.release()
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(waiters[0], waiters[2], return_exceptions=True)
+    assert order == [0, 2]
+    assert limiter.in_flight == 1
+
+@pytest.fixture
+def own_executors(monkeypatch):
+    # Pools com os tamanhos deste MockConfig, não os criados por outros testes
+    monkeypatch.setattr(executors, "_executors", {})
+    yield
+    executors.shutdown_executors()
+
+@pytest.mark.asyncio
+async def test_simulation_converges_near_upstream_capacity(own_executors):
+    static_stub = SlowStub()
+    await drive(MockConfig("static", enabled=False), static_stub)
+
+    config = MockConfig("adaptive")
+    stub = SlowStub()
+    await drive(config, stub)
+    limit = get_limiter(config, "select").limit
+
+    # Sem o limite, as 32 chamadas simultâneas chegam ao upstream e ele responde 503
+    assert static_stub.peak > 3 * static_stub.capacity
+    assert static_stub.errors > 0
+    # Com o limite, a concorrência fica perto da capacidade e os 503 somem após o ajuste inicial
+    assert stub.capacity <= limit <= 4 * stub.capacity
+    assert stub.errors < static_stub.errors / 4
+    assert metrics.snapshot()["supabase_concurrency_limit"]['{service="rest",tenant="adaptive"}'] == int(limit)
+
+def test_baseline_is_kept_per_operation():
+    # Upstream saudável: lookups de 10 ms e selects de 60 ms não são sobrecarga
+    limiter = AdaptiveLimiter("t", "rest", initial=20)
+    for n in range(200):
+        limiter.in_flight = 20
+        operation, latency = ("select", 0.06) if n % 10 < 3 else ("get_by_id", 0.01)
+        limiter.release(latency=latency, operation=operation)
+    grown = limiter.limit
+    assert grown > 20
+    # Acima da base da própria operação continua sendo sobrecarga
+    limiter.in_flight = 20
+    limiter.release(latency=0.2, operation="select")
+    assert limiter.limit == pytest.approx(grown * 0.9)
+
+@pytest.mark.asyncio
+async def test_deadline_timeout_holds_the_slot_and_backs_off(own_executors):
+    from deadlines import DeadlineExceeded, deadline_scope
+    config = MockConfig("timeout")
+    limiter = get_limiter(config, "select")
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "ok"
+
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await call_upstream(config, "select", slow)
+    # A thread ainda está no upstream: a vaga continua contada até ela terminar
+    assert limiter.in_flight == 1 and limiter.limit == 20
+    release.set()
+    for _ in range(100):
+        if limiter.in_flight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert limiter.in_flight == 0
+    assert limiter.limit == 18
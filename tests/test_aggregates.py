@@ -0,0 +1,40 @@
+import pytest
+from tools.database.aggregates import (
+    build_aggregate_sql, build_postgrest_select, execute_aggregate, normalize_aggregates
+)
+
+def test_build_sql_and_postgrest_select():
+    aggregates = normalize_aggregates([{"function": "count"}, {"function": "sum", "column": "amount"}])
+    sql, params = build_aggregate_sql("orders", aggregates, ["status"], [{"column": "amount", "operator": "gt", "value": 10}])
+    assert sql == ('SELECT "status", count(*) AS "count", sum("amount") AS "sum_amount" FROM "orders" '
+                   'WHERE "amount" > $1 GROUP BY "status"')
+    assert params == [10]
+    assert build_postgrest_select(aggregates, ["status"]) == "status,count:count(),sum_amount:amount.sum()"
+
+def test_sql_filters_follow_the_filter_compiler():
+    aggregates = normalize_aggregates([{"function": "count"}])
+    filters = [
+        {"column": "status", "operator": "eq", "value": "paid", "negate": True},
+        {"column": "amount", "operator": "between", "value": [10, 20]},
+        {"or": [{"column": "customer", "operator": "in", "value": ["a", "b"]},
+                {"and": [{"column": "note", "operator": "is", "value": None, "negate": True},
+                         {"column": "body", "operator": "wfts", "value": "gato", "config": "portuguese"}]}]},
+    ]
+    sql, params = build_aggregate_sql("orders", aggregates, [], filters)
+    assert sql == ('SELECT count(*) AS "count" FROM "orders" WHERE NOT ("status" = $1) '
+                   'AND "amount" BETWEEN $2 AND $3 AND ("customer" = ANY($4) OR '
+                   '(NOT ("note" IS NULL) AND "body" @@ websearch_to_tsquery($5::regconfig, $6)))')
+    assert params == ["paid", 10, 20, ["a", "b"], "portuguese", "gato"]
+    with pytest.raises(ValueError):
+        build_aggregate_sql("orders", aggregates, [], [{"column": "amount", "operator": "between", "value": 1}])
+
+class MockClient:
+    postgres = None
+
+    async def count_rows(self, table, filters, mode):
+        return 42
+
+@pytest.mark.asyncio
+async def test_plain_count_uses_count_header():
+    result = await execute_aggregate(MockClient(), {"table": "orders", "count_mode": "planned"})
+    assert '[{"count": 42}]' in result[0].text
@@ -0,0 +1,58 @@
+import pytest
+from tools.auth import AuthTools
+
+class MockConfig:
+    admin_concurrency = 2
+    admin_page_size = 2
+
+class MockClient:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_user(self, user_id, soft_delete=False):
+        if user_id == "bad":
+            raise Exception("not found")
+        self.deleted.append(user_id)
+        return True
+
+    async def iter_user_pages(self, per_page, start_page, max_pages):
+        yield [{"id": "1", "email": "a@test.com"}, {"id": "2", "email": "b@test.com"}]
+        yield [{"id": "3", "email": "c@test.com"}]
+
+@pytest.mark.asyncio
+async def test_delete_users_reports_per_item_results():
+    client = MockClient()
+    result = await AuthTools(MockConfig(), client).execute_tool(
+        "auth_delete_users", {"user_ids": ["a", "bad", "c"]}
+    )
+    assert "2/3" in result[0].text
+    assert sorted(client.deleted) == ["a", "c"]
+
+@pytest.mark.asyncio
+async def test_list_users_walks_pages():
+    result = await AuthTools(MockConfig(), MockClient()).execute_tool(
+        "auth_list_users", {"max_pages": 5}
+    )
+    assert "3 usuários em 2 página(s)" in result[0].text
+
+@pytest.mark.asyncio
+async def test_requested_concurrency_is_capped_by_config():
+    import asyncio
+
+    class SlowClient(MockClient):
+        active = peak = 0
+
+        async def delete_user(self, user_id, soft_delete=False):
+            SlowClient.active += 1
+            SlowClient.peak = max(SlowClient.peak, SlowClient.active)
+            await asyncio.sleep(0.001)
+            SlowClient.active -= 1
+            return await super().delete_user(user_id, soft_delete)
+
+    client = SlowClient()
+    tools = AuthTools(MockConfig(), client)
+    result = await tools.execute_tool("auth_delete_users", {"user_ids": [str(n) for n in range(20)], "concurrency": 10000})
+    assert "20/20" in result[0].text
+    assert SlowClient.peak == MockConfig.admin_concurrency
+    schema = next(tool for tool in tools.get_tools() if tool.name == "auth_create_users").inputSchema
+    assert schema["properties"]["concurrency"]["maximum"] == MockConfig.admin_concurrency
@@ -0,0 +1,82 @@
+import io
+import json
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from tools.database.columnar import ColumnarEncoder, ColumnarSchema, encode_columnar
+from tools.database.queries import execute_select
+
+ROWS = [
+    {"id": i, "name": f"item {i}", "created_at": "2024-05-01T10:00:00+00:00", "meta": {"tag": i % 3}}
+    for i in range(25)
+]
+TABLE_SCHEMA = {"id": "bigint", "name": "text", "created_at": "timestamp with time zone", "meta": "jsonb"}
+
+class MockConfig:
+    stream_chunk_size = 10
+    stream_max_rows = 1000
+    storage_upload_part_size = 1024
+    slow_query_threshold_ms = 0
+
+class MockClient:
+    config = MockConfig()
+
+    def __init__(self):
+        self.uploads = {}
+
+    async def get_table_schema(self, table):
+        return TABLE_SCHEMA
+
+    async def get_primary_key(self, table):
+        return []
+
+    async def query_table(self, table, query_params):
+        start = query_params["offset"]
+        return ROWS[start:start + query_params["limit"]]
+
+    async def create_resumable_upload(self, bucket, path, content_type):
+        url = f"{bucket}/{path}"
+        self.uploads[url] = (bytearray(), content_type, [])
+        return url
+
+    async def upload_resumable_part(self, upload_url, offset, data, total_length=None):
+        received, _, parts = self.uploads[upload_url]
+        assert offset == len(received)
+        received += data
+        parts.append(len(data))
+        if total_length is not None:
+            assert total_length == len(received)
+        return len(received)
+
+def test_parquet_row_groups_use_table_types():
+    encoder = ColumnarEncoder("parquet", ColumnarSchema.from_table_schema(TABLE_SCHEMA, ["*"]))
+    data = encoder.write(ROWS[:10]) + encoder.write(ROWS[10:]) + encoder.close()
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.schema.field("id").type == pa.int64()
+    assert pa.types.is_timestamp(table.schema.field("created_at").type)
+    assert json.loads(table.column("meta")[0].as_py()) == {"tag": 0}
+
+@pytest.mark.asyncio
+async def test_arrow_stream_respects_max_rows():
+    async def pages():
+        for start in range(0, len(ROWS), 10):
+            yield ROWS[start:start + 10]
+
+    data = b"".join([chunk async for chunk in encode_columnar(pages(), "arrow", max_rows=15)])
+    assert pa.ipc.open_stream(data).read_all().num_rows == 15
+
+@pytest.mark.asyncio
+async def test_select_writes_parquet_to_storage():
+    client = MockClient()
+    result = await execute_select(client, {"table": "items", "format": "parquet", "bucket": "exports", "path": "items.parquet"})
+    assert "gravado em exports/items.parquet" in result[0].text
+    data, content_type, parts = client.uploads["exports/items.parquet"]
+    assert content_type == "application/vnd.apache.parquet"
+    assert pq.read_table(io.BytesIO(bytes(data))).num_rows == 25
+    # Enviado em partes durante a codificação, não como um único arquivo em memória
+    assert len(parts) > 1
+    assert set(parts[:-1]) == {MockConfig.storage_upload_part_size}
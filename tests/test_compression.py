@@ -0,0 +1,207 @@
+import asyncio
+import gzip
+import json
+import zlib
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from compression import DECODERS, CompressionMiddleware, available_encodings, negotiate
+
+ENCODINGS = available_encodings(["zstd", "br", "gzip"])
+
+class MockConfig:
+    compression_enabled = True
+    compression_min_size = 1024
+    compression_encodings = ["zstd", "br", "gzip"]
+    compression_levels = {}
+    executor_workers = 4
+    storage_executor_workers = 2
+
+ROWS = [{"id": n, "name": f"cliente {n}", "status": "ativo", "score": n % 7} for n in range(500)]
+
+async def select(request):
+    return JSONResponse(ROWS)
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+async def stream(request):
+    async def lines():
+        for start in range(0, len(ROWS), 100):
+            yield "".join(json.dumps(row) + "\n" for row in ROWS[start:start + 100]).encode()
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def echo(request):
+    body = await request.body()
+    return JSONResponse({"bytes": len(body), "rows": len(json.loads(body)) if body else 0})
+
+def create_app():
+    return Starlette(
+        routes=[
+            Route("/mcp/select", select),
+            Route("/mcp/small", small),
+            Route("/mcp/stream", stream),
+            Route("/mcp/echo", echo, methods=["POST"]),
+            Route("/health", select),
+        ],
+    )
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.add_middleware(CompressionMiddleware, config=MockConfig())
+    return TestClient(app)
+
+class ResponseDecoder:
+    """Decodifica respostas como o cliente (zstd não é aceito em requisições)"""
+
+    def __init__(self, encoding):
+        if encoding == "zstd":
+            import zstandard
+            self._obj = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self._obj = DECODERS[encoding]()
+
+    def decompress(self, data):
+        if hasattr(self._obj, "has_pending"):
+            return self._obj.decompress(data, 0)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+def decode(encoding, data):
+    decoder = ResponseDecoder(encoding)
+    return decoder.decompress(data) + decoder.flush()
+
+def test_negotiate_uses_q_values_and_server_order():
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br, zstd", supported) == "zstd"
+    assert negotiate("gzip;q=1, br;q=0.5", supported) == "gzip"
+    assert negotiate("zstd;q=0, *;q=0.1", supported) == "br"
+    assert negotiate("identity", supported) is None
+    assert negotiate(None, supported) is None
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_large_json_is_compressed(client, encoding):
+    with client.stream("GET", "/mcp/select", headers={"Accept-Encoding": encoding}) as response:
+        body = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(body)
+    raw = decode(encoding, body)
+    assert len(body) * 5 < len(raw)
+    assert json.loads(raw) == ROWS
+
+def test_small_responses_and_other_paths_are_not_compressed(client):
+    assert "content-encoding" not in client.get("/mcp/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/mcp/select", headers={"Accept-Encoding": "identity"}).headers
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_streamed_chunks_are_flushed(encoding):
+    # Cada bloco comprimido deve ser decodificável sem esperar o fim do stream
+    app = CompressionMiddleware(create_app(), config=MockConfig())
+    scope = {
+        "type": "http", "method": "GET", "path": "/mcp/stream", "raw_path": b"/mcp/stream",
+        "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80),
+        "headers": [(b"accept-encoding", encoding.encode())], "http_version": "1.1",
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # Cliente conectado até o fim do stream
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, *bodies = messages
+    assert (b"content-encoding", encoding.encode()) in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+
+    decoder = ResponseDecoder(encoding)
+    first = decoder.decompress(bodies[0]["body"])
+    assert first.count(b"\n") == 100
+    rest = b"".join(decoder.decompress(body["body"]) for body in bodies[1:]) + decoder.flush()
+    assert [json.loads(line) for line in (first + rest).splitlines()] == ROWS
+
+@pytest.mark.parametrize("encoding", [encoding for encoding in ENCODINGS if encoding in DECODERS])
+def test_compressed_request_body_is_decoded(client, encoding):
+    raw = json.dumps(ROWS).encode()
+    body = {"gzip": gzip.compress}.get(encoding)
+    if body is None:
+        from compression import create_encoder
+        body = create_encoder(encoding).finish
+    response = client.post("/mcp/echo", content=body(raw), headers={"Content-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.json() == {"bytes": len(raw), "rows": len(ROWS)}
+
+@pytest.mark.parametrize("encoding", [encoding for encoding in ("gzip", "br") if encoding in DECODERS])
+def test_large_body_is_decoded_in_bounded_chunks(encoding):
+    # Corpo altamente compressível (poucos KB -> 64 MiB): nenhuma mensagem pode passar do bloco
+    from compression import DecompressingReceive, create_encoder
+    raw = b"x" * (64 * 1024 * 1024)
+    compressed = create_encoder(encoding, {encoding: 9}).finish(raw)
+    assert len(compressed) < 256 * 1024
+    # Em dois pedaços, para cobrir a retomada da saída retida entre mensagens
+    half = len(compressed) // 2
+    payload = [{"type": "http.request", "body": compressed[:half], "more_body": True},
+               {"type": "http.request", "body": compressed[half:], "more_body": False}]
+
+    async def receive():
+        return payload.pop(0)
+
+    async def read_all():
+        reader = DecompressingReceive(receive, encoding, chunk_size=1024 * 1024)
+        sizes, total = [], 0
+        while True:
+            message = await reader()
+            sizes.append(len(message["body"]))
+            total += message["body"].count(b"x")
+            if not message["more_body"]:
+                return sizes, total
+
+    sizes, total = asyncio.run(read_all())
+    assert max(sizes) <= 1024 * 1024
+    assert sum(sizes) == total == len(raw)
+
+def test_invalid_or_unsupported_request_encoding(client):
+    truncated = gzip.compress(json.dumps(ROWS).encode())[:-20]
+    with pytest.raises(ValueError):
+        client.post("/mcp/echo", content=truncated, headers={"Content-Encoding": "gzip"})
+    response = client.post("/mcp/echo", content=b"{}", headers={"Content-Encoding": "lzma"})
+    assert response.status_code == 415
+    assert "gzip" in response.headers["accept-encoding"]
+    # zstd vale só para respostas: a saída de cada bloco não pode ser limitada
+    response = client.post("/mcp/echo", content=b"{}", headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 415
+    assert "zstd" not in response.headers["accept-encoding"]
+
+def test_call_tool_accepts_compressed_body_and_compresses_list_tools(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from main_fastapi import app
+    client = TestClient(app)
+    response = client.get("/mcp/list_tools", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) > 10
+
+    # Corpo inválido depois de descomprimido: o erro vem do parser (400), não da compressão
+    body = zlib.compress(b'{"name": "database_select", "arguments": ')
+    response = client.post("/mcp/call_tool", content=body, headers={"Content-Encoding": "deflate"})
+    assert response.status_code == 400
+    assert "Corpo inválido" in response.json()["detail"]
+
+    # stream_query também limita o corpo (descomprimido) a MAX_BODY_BYTES
+    from main_fastapi import middleware
+    limit = middleware.get_current_config().max_body_bytes
+    body = gzip.compress(json.dumps({"table": "orders", "filters": {"note": "x" * limit}}).encode())
+    response = client.post("/mcp/stream_query", content=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
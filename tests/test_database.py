@@ -3,18 +3,35 @@ import asyncio
 from tools.database.queries import execute_query
 
 class MockClient:
-    class client:
-        @staticmethod
-        def rpc(name, params):
-            class Result:
-                data = [{"id": 1, "name": "Teste"}]
-                def execute(self):
-                    return self
-            return Result()
+    postgres = None
+
+    class config:
+        slow_query_threshold_ms = 0
+
+    async def exec_sql(self, sql):
+        return [{"id": 1, "name": "Teste"}]
 
 @pytest.mark.asyncio
 async def test_execute_query():
     args = {"sql": "SELECT * FROM test_table;"}
     result = await execute_query(MockClient(), args)
     assert result[0].type == "text"
-    assert "sucesso" in result[0].text 
\ No newline at end of file
+    assert "sucesso" in result[0].text 
+@pytest.mark.asyncio
+async def test_select_is_built_on_the_client_that_was_validated(monkeypatch):
+    # Reconfigurar o cliente enquanto o schema é buscado não muda o destino da consulta
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from config import Config
+    from supabase_client import SupabaseClient
+    token = "eyJhbGciOiJIUzI1NiJ9.e30.x"
+    client = SupabaseClient(Config("alpha", token))
+
+    async def get_table_schema(table):
+        client.update_config("beta", token)
+        await asyncio.sleep(0)
+        return {"a": "text"}
+
+    monkeypatch.setattr(client, "get_table_schema", get_table_schema)
+    query = await client._build_select("t", {"columns": ["a"]})
+    assert str(query.request.path).startswith("https://alpha.supabase.co/")
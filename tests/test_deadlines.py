@@ -0,0 +1,116 @@
+import asyncio
+import time
+import httpx
+import pytest
+from deadlines import DeadlineExceeded, deadline_scope, parse_timeout, remaining
+from resilience import call_upstream, get_breaker
+
+class MockConfig:
+    retry_max_attempts = 3
+    retry_base_delay = 0
+    retry_max_delay = 0
+    hedge_enabled = False
+    breaker_failure_threshold = 3
+    breaker_reset_timeout = 60
+    executor_workers = 4
+    storage_executor_workers = 2
+    adaptive_limit_enabled = False
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+    def get_tenant_id(self):
+        return self.tenant
+
+def test_scopes_only_shorten_the_deadline():
+    assert remaining() is None
+    with deadline_scope(0.5):
+        with deadline_scope(10):
+            assert remaining() <= 0.5
+        with deadline_scope(None):
+            assert remaining() <= 0.5
+    assert remaining() is None
+    assert parse_timeout("2.5") == 2.5
+    assert parse_timeout("abc") is None and parse_timeout("0") is None
+
+def test_tool_timeout_defaults_and_header(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("TOOL_TIMEOUTS", "database_select=5,storage_upload=0")
+    from config import Config
+    config = Config()
+    assert config.get_tool_timeout("database_select") == 5
+    assert config.get_tool_timeout("database_select", requested=2) == 2
+    # O header não estende o padrão da ferramenta
+    assert config.get_tool_timeout("database_select", requested=60) == 5
+    assert config.get_tool_timeout("storage_upload") is None
+    assert config.get_tool_timeout("database_import", requested=30) == 30
+    assert config.get_tool_timeout("auth_get_user") == config.request_timeout
+    # Escritas em lote não são interrompidas no meio por padrão
+    assert all(config.get_tool_timeout(tool) is None
+               for tool in ("database_insert", "database_transaction", "auth_create_users", "auth_delete_users"))
+
+@pytest.mark.asyncio
+async def test_upstream_call_stops_at_deadline_without_retrying():
+    config = MockConfig("deadline")
+    calls = []
+
+    def slow_then_flaky():
+        calls.append(1)
+        time.sleep(0.3)
+        raise httpx.ConnectError("refused")
+
+    started = time.monotonic()
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            await call_upstream(config, "select", slow_then_flaky, idempotent=True)
+        assert time.monotonic() - started < 0.25
+        with pytest.raises(DeadlineExceeded):
+            await asyncio.sleep(0.1)
+            await call_upstream(config, "select", slow_then_flaky, idempotent=True)
+    assert len(calls) == 1
+    # O prazo do chamador não conta como falha do upstream
+    assert get_breaker(config).failures == 0
+
+class DisconnectingRequest:
+    def __init__(self, after):
+        self.after = after
+
+    async def receive(self):
+        await asyncio.sleep(self.after)
+        return {"type": "http.disconnect"}
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_tool(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from main_fastapi import ClientDisconnected, run_until_deadline
+    cancelled = asyncio.Event()
+
+    async def tool():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ClientDisconnected):
+        await run_until_deadline(DisconnectingRequest(0.05), "database_select", tool(), timeout=5)
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+def test_deadline_timeout_reaches_the_transport(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    from config import Config
+    from deadlines import http_timeout
+    from transport import ServiceRoutingTransport
+    seen = []
+    transport = ServiceRoutingTransport(Config())
+    recorder = httpx.MockTransport(lambda request: seen.append(request.extensions["timeout"]) or httpx.Response(200))
+    transport._transports = {service: recorder for service in transport._transports}
+    client = httpx.Client(transport=transport, timeout=None)
+
+    client.get("https://default.supabase.co/storage/v1/object/b/p", timeout=http_timeout())
+    with deadline_scope(0.5):
+        client.get("https://default.supabase.co/storage/v1/object/b/p", timeout=http_timeout())
+    default, bounded = seen
+    assert default == transport._timeouts["storage"]
+    assert 0 < bounded["read"] <= 0.5 and 0 < bounded["connect"] <= 0.5
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import pytest
+import mcp.types as types
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import TextContent
+from executors import run_blocking
+from metrics import metrics
+
+@pytest.mark.asyncio
+async def test_quick_call_is_not_blocked_by_slow_call_and_can_be_cancelled(mcp_server):
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def slow_upload(name, arguments):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def quick_select(name, arguments):
+        return [TextContent(type="text", text="ok")]
+
+    mcp_server.storage_tools.execute_tool = slow_upload
+    mcp_server.database_tools.execute_tool = quick_select
+
+    async with create_connected_server_and_client_session(mcp_server.server) as session:
+        upload_id = session._request_id
+        upload = asyncio.ensure_future(session.call_tool(
+            "storage_upload", {"bucket": "b", "path": "p.txt", "file_data": "aGk="},
+        ))
+        await asyncio.wait_for(started.wait(), 5)
+
+        result = await asyncio.wait_for(session.call_tool("database_select", {"table": "t"}), 5)
+        assert result.content[0].text == "ok"
+        assert not upload.done()
+
+        await session.send_notification(types.ClientNotification(types.CancelledNotification(
+            params=types.CancelledNotificationParams(requestId=upload_id, reason="teste"),
+        )))
+        await asyncio.wait_for(cancelled.wait(), 5)
+        upload.cancel()
+
+    assert metrics.snapshot()["mcp_tool_cancelled_total"]['{tool="storage_upload"}'] >= 1
+
+class LaneConfig:
+    executor_workers = 2
+    storage_executor_workers = 1
+
+@pytest.mark.asyncio
+async def test_storage_lane_does_not_starve_default_lane():
+    release = threading.Event()
+    config = LaneConfig()
+    upload = asyncio.ensure_future(run_blocking(config, "upload", lambda: release.wait(5)))
+    try:
+        assert await asyncio.wait_for(run_blocking(config, "select", lambda: "ok"), 2) == "ok"
+    finally:
+        release.set()
+        await upload
@@ -0,0 +1,40 @@
+import pytest
+from filter_compiler import FilterCompiler, FilterValidationError
+
+SCHEMA = {"id": "integer", "name": "text", "active": "boolean", "created_at": "timestamp with time zone"}
+
+def test_compiles_operators_and_nested_groups():
+    filters = [
+        {"column": "id", "operator": "in", "value": ["1", "2"]},
+        {"column": "created_at", "operator": "between", "value": ["2024-01-01", "2024-12-31"]},
+        {"or": [
+            {"column": "name", "operator": "ilike", "value": "a, b*"},
+            {"and": [{"column": "active", "operator": "is", "value": True},
+                     {"column": "id", "operator": "gt", "value": "10"}]},
+        ]},
+    ]
+    entries = FilterCompiler().compile("t", "items", filters, SCHEMA).bind(filters)
+    assert entries == [
+        ("filter", "id", "in", "(1,2)"),
+        ("filter", "created_at", "gte", "2024-01-01"),
+        ("filter", "created_at", "lte", "2024-12-31"),
+        ("or", 'name.ilike."a, b*",and(active.is.true,id.gt.10)'),
+    ]
+
+def test_validates_against_schema():
+    compiler = FilterCompiler()
+    with pytest.raises(FilterValidationError):
+        compiler.compile("t", "items", [{"column": "missing", "operator": "eq", "value": 1}], SCHEMA)
+    with pytest.raises(FilterValidationError):
+        compiler.compile("t", "items", [{"column": "id", "operator": "like", "value": "1%"}], SCHEMA)
+    compiled = compiler.compile("t", "items", [{"column": "id", "operator": "eq", "value": "x"}], SCHEMA)
+    with pytest.raises(FilterValidationError):
+        compiled.bind([{"column": "id", "operator": "eq", "value": "x"}])
+
+def test_repeated_shapes_hit_cache():
+    compiler = FilterCompiler()
+    first = compiler.compile("t", "items", [{"column": "id", "operator": "eq", "value": 1}], SCHEMA)
+    second = compiler.compile("t", "items", [{"column": "id", "operator": "eq", "value": 2}], SCHEMA)
+    assert first is second
+    assert second.bind([{"column": "id", "operator": "eq", "value": 2}]) == [("filter", "id", "eq", "2")]
+    assert (compiler.hits, compiler.misses) == (1, 1)
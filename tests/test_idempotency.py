@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from mcp.types import TextContent
+import idempotency
+from idempotency import IdempotencyKeyReused, IdempotencyStore, argument_fingerprint
+
+class Tool:
+    def __init__(self, text="ok"):
+        self.calls = 0
+        self.text = text
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return [TextContent(type="text", text=f"{self.text} {self.calls}")]
+
+@pytest.mark.asyncio
+async def test_repeat_returns_stored_response_without_executing():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    tool = Tool()
+    key = IdempotencyStore.scoped_key("abc", "anon", "database_insert", "retry-1")
+    first, replayed = await store.run(key, "database_insert", tool)
+    assert not replayed
+    again, replayed = await store.run(key, "database_insert", tool)
+    assert replayed
+    assert again[0].text == first[0].text == "ok 1"
+    assert tool.calls == 1
+    # A mesma chave em outro projeto, ou com outra credencial do mesmo projeto, é independente
+    other = IdempotencyStore.scoped_key("xyz", "anon", "database_insert", "retry-1")
+    assert (await store.run(other, "database_insert", tool))[0][0].text == "ok 2"
+    user = IdempotencyStore.scoped_key("abc", "jwt-user", "database_insert", "retry-1")
+    assert (await store.run(user, "database_insert", tool))[0][0].text == "ok 3"
+
+@pytest.mark.asyncio
+async def test_key_reused_with_other_arguments_is_rejected(tmp_path):
+    store = IdempotencyStore(max_entries=10, ttl=60, path=str(tmp_path / "idempotency.sqlite3"))
+    tool = Tool()
+    first = argument_fingerprint({"table": "orders", "data": {"n": 1}})
+    assert argument_fingerprint({"data": {"n": 1}, "table": "orders"}) == first
+    await store.run("k", "database_insert", tool, first)
+    assert (await store.run("k", "database_insert", tool, first))[1]
+    with pytest.raises(IdempotencyKeyReused):
+        await store.run("k", "database_insert", tool, argument_fingerprint({"table": "orders", "data": {"n": 2}}))
+    # Também depois de reiniciar (hash guardado no SQLite)
+    restarted = IdempotencyStore(max_entries=10, ttl=60, path=str(tmp_path / "idempotency.sqlite3"))
+    with pytest.raises(IdempotencyKeyReused):
+        await restarted.run("k", "database_insert", tool, "outro")
+    assert tool.calls == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_first_execution():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    tool = Tool()
+    tool.release.clear()
+    calls = [asyncio.ensure_future(store.run("k", "storage_upload", tool)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    tool.release.set()
+    results = await asyncio.gather(*calls)
+    assert tool.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+@pytest.mark.asyncio
+async def test_errors_are_not_stored_and_cancelled_leader_hands_over():
+    store = IdempotencyStore(max_entries=10, ttl=60)
+    failing = Tool(text="Erro ao inserir")
+    await store.run("k", "database_insert", failing)
+    await store.run("k", "database_insert", failing)
+    assert failing.calls == 2
+
+    tool = Tool()
+    tool.release.clear()
+    leader = asyncio.ensure_future(store.run("c", "database_insert", tool))
+    follower = asyncio.ensure_future(store.run("c", "database_insert", tool))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    tool.release.set()
+    result, replayed = await follower
+    assert (result[0].text, replayed, tool.calls) == ("ok 2", False, 2)
+
+@pytest.mark.asyncio
+async def test_sqlite_file_survives_restart_and_memory_is_bounded(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite3")
+    store = IdempotencyStore(max_entries=1, ttl=60, path=path)
+    tool = Tool()
+    await store.run("a", "database_insert", tool)
+    await store.run("b", "database_insert", tool)
+    assert len(store._entries) == 1
+
+    restarted = IdempotencyStore(max_entries=1, ttl=60, path=path)
+    result, replayed = await restarted.run("a", "database_insert", tool)
+    assert replayed and result[0].text == "ok 1"
+    assert tool.calls == 2
+
+    expired = IdempotencyStore(max_entries=1, ttl=0, path=str(tmp_path / "expired.sqlite3"))
+    await expired.run("a", "database_insert", tool)
+    assert expired.get("a") is None
+
+def test_header_key_ignores_and_strips_the_argument(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from starlette.testclient import TestClient
+    import main_fastapi
+    monkeypatch.setattr(idempotency, "_stores", {})
+    calls = []
+
+    class Group:
+        async def execute_tool(self, name, arguments):
+            calls.append(dict(arguments))
+            return [TextContent(type="text", text="ok")]
+
+    monkeypatch.setattr(main_fastapi, "tool_group", lambda instances, name: Group())
+    client = TestClient(main_fastapi.app)
+    for argument_key in ("a", "b"):
+        response = client.post(
+            "/mcp/call_tool", headers={"Idempotency-Key": "k1"},
+            json={"name": "database_update", "arguments": {"table": "t", "id": "1", "idempotency_key": argument_key}},
+        )
+        assert response.status_code == 200
+    assert response.headers["idempotent-replayed"] == "true"
+    assert calls == [{"table": "t", "id": "1"}]
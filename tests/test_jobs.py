@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+import pytest
+from mcp.types import TextContent
+from jobs import CANCELLED, FAILED, RUNNING, SUCCEEDED, JobQueue, JobStore, report_progress
+from tools.jobs import JobTools, submit_tool_job
+import jobs
+
+class MockConfig:
+    def __init__(self, db_path, tenant="abc", credential="key-1"):
+        self.job_db_path = str(db_path)
+        self.job_workers = 1
+        self.job_result_ttl = 60
+        self.tenant = tenant
+        self.credential = credential
+
+    def get_tenant_id(self):
+        return self.tenant
+
+    def get_credential_id(self):
+        return self.credential
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "_queues", {})
+    return MockConfig(tmp_path / "jobs.sqlite3")
+
+async def wait_for_status(queue, job_id, status, tenant="abc", credential="key-1"):
+    for _ in range(200):
+        job = queue.get(tenant, credential, job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job não chegou a {status}: {job}")
+
+@pytest.mark.asyncio
+async def test_async_call_returns_job_id_and_result_is_polled(config):
+    release = asyncio.Event()
+    calls = []
+
+    async def run_tool(name, arguments):
+        calls.append((name, arguments))
+        report_progress(1, 2, "metade")
+        await release.wait()
+        return [TextContent(type="text", text="pronto")]
+
+    async def rows():
+        yield {"id": 1}
+        yield {"id": 2}
+
+    response = await submit_tool_job(config, "database_insert", {"table": "t", "data": rows()}, run_tool)
+    submitted = json.loads(response[0].text)
+    assert submitted["status"] == "queued"
+
+    tools = JobTools(config, None)
+    queue = jobs.get_job_queue(config)
+    job = await wait_for_status(queue, submitted["job_id"], RUNNING)
+    assert job["progress"] == {"done": 1, "total": 2, "message": "metade"}
+    # O corpo streamado é materializado antes de a requisição terminar
+    assert calls == [("database_insert", {"table": "t", "data": [{"id": 1}, {"id": 2}]})]
+    pending = await tools.execute_tool("job_result", {"job_id": submitted["job_id"]})
+    assert "ainda não concluído" in pending[0].text
+
+    release.set()
+    await queue.join(submitted["job_id"])
+    result = await tools.execute_tool("job_result", {"job_id": submitted["job_id"]})
+    assert result[0].text == "pronto"
+    status = json.loads((await tools.execute_tool("job_status", {"job_id": submitted["job_id"]}))[0].text)
+    assert status["status"] == SUCCEEDED
+
+    # Jobs de outro projeto não são visíveis
+    other = JobTools(MockConfig(config.job_db_path, tenant="xyz"), None)
+    assert "não encontrado" in (await other.execute_tool("job_status", {"job_id": submitted["job_id"]}))[0].text
+    # Nem de outra credencial do mesmo projeto (outro usuário, chave anon)
+    other = JobTools(MockConfig(config.job_db_path, credential="key-2"), None)
+    for tool in ("job_status", "job_result", "job_cancel"):
+        assert "não encontrado" in (await other.execute_tool(tool, {"job_id": submitted["job_id"]}))[0].text
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued_jobs(config):
+    queue = jobs.get_job_queue(config)
+
+    async def forever():
+        await asyncio.sleep(30)
+
+    running = queue.submit("abc", "key-1", "storage_upload", forever)
+    queued = queue.submit("abc", "key-1", "storage_upload", forever)
+    await wait_for_status(queue, running, RUNNING)
+
+    tools = JobTools(config, None)
+    for job_id in (queued, running):
+        assert "solicitado" in (await tools.execute_tool("job_cancel", {"job_id": job_id}))[0].text
+        await queue.join(job_id)
+        assert queue.get("abc", "key-1", job_id)["status"] == CANCELLED
+
+@pytest.mark.asyncio
+async def test_results_expire_and_restart_fails_unfinished_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, workers=1, result_ttl=0)
+
+    async def done():
+        return [TextContent(type="text", text="ok")]
+
+    job_id = queue.submit("abc", "key-1", "database_select", done)
+    await queue.join(job_id)
+    assert store.purge_expired(time.time() + 1) == 1
+    assert store.get("abc", "key-1", job_id) is None
+
+    stuck = store.create("abc", "key-1", "database_import")
+    JobQueue(store, workers=1, result_ttl=60)
+    job = store.get("abc", "key-1", stuck)
+    assert job["status"] == FAILED
+    assert "reinício" in job["error"]
+
+def test_job_client_is_not_switched_by_later_requests(monkeypatch):
+    # O cliente do middleware é reconfigurado a cada requisição; o do job, não
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from config import Config
+    from middleware import DynamicConfigMiddleware
+    middleware = DynamicConfigMiddleware(Config())
+    token = "eyJhbGciOiJIUzI1NiJ9.e30.x"
+
+    middleware.update_config_from_headers({"x-supabase-project": "alpha", "x-supabase-token": token})
+    alpha = middleware.get_request_client(middleware.get_current_config())
+    middleware.update_config_from_headers({})
+    default = middleware.get_request_client(middleware.get_current_config())
+    middleware.update_config_from_headers({"x-supabase-project": "beta", "x-supabase-token": token})
+
+    assert middleware.get_current_client().config.project_code == "beta"
+    assert alpha.config.get_tenant_id() == "alpha"
+    assert default.config.get_tenant_id() == "default.supabase.co"
+    assert middleware.default_config.project_code is None
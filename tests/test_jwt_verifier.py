@@ -0,0 +1,26 @@
+import time
+import jwt
+import pytest
+from jwt_verifier import JWTVerifier, JWTVerificationError
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+
+def make_token(**claims):
+    payload = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+def test_verify_hs256_token_is_cached():
+    verifier = JWTVerifier("https://test.supabase.co", jwt_secret=SECRET)
+    token = make_token()
+    assert verifier.verify(token)["sub"] == "user-1"
+    assert verifier.verify(token)["sub"] == "user-1"
+    assert verifier.get_stats()["hits"] == 1
+
+def test_verify_rejects_expired_and_wrong_secret():
+    verifier = JWTVerifier("https://test.supabase.co", jwt_secret=SECRET)
+    with pytest.raises(JWTVerificationError):
+        verifier.verify(make_token(exp=int(time.time()) - 10))
+    other = jwt.encode({"sub": "x", "aud": "authenticated", "exp": int(time.time()) + 60}, "other-secret-with-at-least-32-characters!", algorithm="HS256")
+    with pytest.raises(JWTVerificationError):
+        verifier.verify(other)
@@ -0,0 +1,59 @@
+import base64
+import os
+import sys
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from fake_supabase import FakeSettings, FakeSupabaseServer
+from load_test import compare, percentile, summarize
+
+ANON_KEY = "eyJhbGciOiJIUzI1NiJ9.e30.x"
+
+@pytest.fixture(scope="module")
+def fake():
+    with FakeSupabaseServer(FakeSettings(latency_ms=0, jitter_ms=0, rows=5)) as server:
+        yield server
+
+@pytest.mark.asyncio
+async def test_sdk_calls_reach_the_stand_in_per_project(fake, monkeypatch):
+    # O stand-in precisa continuar compatível com as rotas usadas pelo SDK
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", fake.url)
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", ANON_KEY)
+    monkeypatch.setenv("SUPABASE_PROJECT_URL_TEMPLATE", fake.project_url_template)
+    from config import Config
+    from supabase_client import SupabaseClient
+    from tools.database_tools import DatabaseTools
+    from tools.storage import StorageTools
+
+    for config, tenant in ((Config(), "default"), (Config("acme", ANON_KEY), "acme")):
+        assert config.get_supabase_url().startswith(fake.url)
+        client = SupabaseClient(config)
+        database, storage = DatabaseTools(config, client), StorageTools(config, client)
+        selected = await database.execute_tool("database_select", {"table": "orders", "limit": 3})
+        assert "Encontrados 3 registros" in selected[0].text
+        assert f"'tenant': '{tenant}'" in selected[0].text
+        inserted = await database.execute_tool("database_insert", {"table": "orders", "data": [{"n": 1}] * 10})
+        assert not inserted[0].text.startswith("Erro")
+        uploaded = await storage.execute_tool("storage_upload", {
+            "bucket": "bench", "path": "a.bin", "file_data": base64.b64encode(b"abc").decode(),
+        })
+        assert not uploaded[0].text.startswith("Erro")
+
+    stats = httpx.get(f"{fake.url}/_stats").json()
+    assert stats["acme/rows_inserted"] == stats["default/rows_inserted"] == 10
+    assert stats["acme/storage"] == 1
+
+def test_summary_percentiles_and_regression_check(capsys):
+    latencies = [n / 1000 for n in range(1, 101)]
+    assert percentile(latencies, 50) == 0.05 and percentile(latencies, 99) == 0.099
+    result = summarize(latencies, errors=2, misrouted=0, elapsed=2.0)
+    assert result["throughput_rps"] == 50 and result["error_rate"] == 0.02
+    assert result["latency_ms"]["p95"] == 95
+
+    baseline = {"results": {"fastapi": {"select": result}}}
+    slower = summarize([latency * 1.5 for latency in latencies], errors=0, misrouted=0, elapsed=2.0)
+    assert compare({"results": {"fastapi": {"select": result}}}, baseline, tolerance=0.2) == []
+    assert compare({"results": {"fastapi": {"select": slower}}}, baseline, tolerance=0.2) == ["fastapi/select"]
+    assert "REGRESSÃO" in capsys.readouterr().out
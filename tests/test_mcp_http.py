@@ -0,0 +1,59 @@
+import asyncio
+from mcp.server.lowlevel.server import request_ctx
+from mcp.shared.context import RequestContext
+from middleware import tenant_from_headers
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+def request_context(headers):
+    return RequestContext(request_id=1, meta=None, session=None, lifespan_context=None, request=FakeRequest(headers))
+
+def test_tenant_from_headers_accepts_bearer_token():
+    assert tenant_from_headers({"x-supabase-project": "abc", "authorization": "Bearer tok"}) == ("abc", "tok")
+    assert tenant_from_headers({}) == (None, None)
+
+def test_http_session_uses_tenant_client(mcp_server):
+    token = request_ctx.set(request_context({"x-supabase-project": "abc123", "x-supabase-token": "tok"}))
+    try:
+        tools = mcp_server._tools_for_request()
+        again = mcp_server._tools_for_request()
+    finally:
+        request_ctx.reset(token)
+    assert tools["database"].client.config.project_code == "abc123"
+    # Clientes (e seus pools) são compartilhados entre sessões do mesmo projeto
+    assert tools["database"].client is again["database"].client
+
+def test_stdio_uses_default_client(mcp_server):
+    assert mcp_server._tools_for_request()["database"] is mcp_server.database_tools
+
+def test_fastapi_call_tool_keeps_its_tenant_client_while_others_switch(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from mcp.types import TextContent
+    from starlette.testclient import TestClient
+    import main_fastapi
+    token = "eyJhbGciOiJIUzI1NiJ9.e30.x"
+    seen = []
+
+    class Group:
+        def __init__(self, client):
+            self.client = client
+
+        async def execute_tool(self, name, arguments):
+            # Outra requisição reconfigura o cliente do middleware enquanto esta aguarda
+            main_fastapi.middleware.update_config_from_headers({"x-supabase-project": "beta", "x-supabase-token": token})
+            await asyncio.sleep(0)
+            seen.append(self.client.config.get_tenant_id())
+            return [TextContent(type="text", text="ok")]
+
+    monkeypatch.setattr(main_fastapi, "tool_group", lambda instances, name: Group(instances["database"].client))
+    response = TestClient(main_fastapi.app).post(
+        "/mcp/call_tool", json={"name": "database_select", "arguments": {"table": "t"}},
+        headers={"x-supabase-project": "alpha", "x-supabase-token": token},
+    )
+    assert response.status_code == 200
+    assert seen == ["alpha"]
+    assert main_fastapi.middleware.get_current_client().config.get_tenant_id() == "beta"
+    main_fastapi.middleware.update_config_from_headers({})
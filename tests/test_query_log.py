@@ -0,0 +1,28 @@
+from query_log import SlowQueryLog, normalize_sql, summarize_plan
+
+class MockConfig:
+    slow_query_threshold_ms = 100
+    slow_query_capture_plan = False
+
+    def get_tenant_id(self):
+        return "t1"
+
+def test_normalize_sql_strips_literals():
+    sql = "SELECT * FROM users  WHERE name = 'O''Brien' AND id IN (1, 2, 3) AND age > 30;"
+    assert normalize_sql(sql) == "SELECT * FROM users WHERE name = ? AND id IN (?...) AND age > ?"
+
+def test_summarize_plan_finds_seq_scans():
+    plan = [{"Plan": {"Node Type": "Hash Join", "Total Cost": 10.5, "Plan Rows": 3, "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "orders"},
+        {"Node Type": "Index Scan", "Relation Name": "users"},
+    ]}, "Execution Time": 1.2}]
+    summary = summarize_plan(plan)
+    assert summary["node"] == "Hash Join"
+    assert summary["seq_scans"] == ["orders"]
+    assert summary["execution_time_ms"] == 1.2
+
+def test_records_only_above_threshold():
+    log = SlowQueryLog()
+    assert log.record(MockConfig(), "sql", "select ?", 50) is None
+    assert log.record(MockConfig(), "sql", "select ?", 150)["duration_ms"] == 150
+    assert len(log.entries("t1")) == 1
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from rate_limit import InMemoryRateLimitBackend, RateLimitBackend, TenantLimiter, TokenBucket
+
+class MockConfig:
+    rate_limit_rps = 10
+    rate_limit_burst = 2
+    rate_limit_max_in_flight = 5
+    rate_limit_max_tenants = 100
+    rate_limit_backend = ""
+
+def test_token_bucket_returns_retry_after_when_empty():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 0.1
+
+def test_limiter_isolates_tenants_and_caps_in_flight():
+    config = MockConfig()
+    config.rate_limit_burst = 100
+    limiter = TenantLimiter(config)
+    for _ in range(5):
+        assert limiter.acquire("noisy") == 0
+    assert limiter.acquire("noisy") > 0
+    assert limiter.acquire("quiet") == 0
+    limiter.release("noisy")
+    assert limiter.acquire("noisy") == 0
+
+def test_limiter_uses_custom_backend():
+    backend = InMemoryRateLimitBackend(rate=1, burst=1)
+    limiter = TenantLimiter(MockConfig(), backend=backend)
+    assert limiter.acquire("a") == 0
+    limiter.release("a")
+    assert limiter.acquire("a") > 0
+
+def test_backend_interface_is_abstract_and_buckets_are_bounded():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+    backend = InMemoryRateLimitBackend(rate=1, burst=1, max_tenants=2)
+    assert backend.try_acquire("a") == 0
+    assert backend.try_acquire("b") == 0
+    assert backend.try_acquire("a") > 0
+    backend.try_acquire("c")
+    # "b" era o menos usado recentemente
+    assert list(backend._buckets) == ["a", "c"]
+
+def run_app(limiter, app, disconnect_after=None):
+    """Executa a requisição pelo middleware; devolve a vaga ocupada durante o corpo"""
+    from rate_limit import TenantRateLimitMiddleware
+    scope = {"type": "http", "method": "GET", "path": "/mcp/stream_query",
+             "headers": [(b"x-supabase-project", b"export")]}
+    seen = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        seen.append(limiter.in_flight("export"))
+        if disconnect_after is not None and len(seen) > disconnect_after:
+            raise OSError("cliente desconectou")
+
+    async def run():
+        await TenantRateLimitMiddleware(app, limiter)(scope, receive, send)
+
+    try:
+        asyncio.run(run())
+    except OSError:
+        pass
+    return seen
+
+def test_in_flight_is_held_until_the_streamed_body_ends():
+    limiter = TenantLimiter(MockConfig())
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in (b"a", b"b"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    assert run_app(limiter, streaming_app) == [1, 1, 1, 1]
+    assert limiter.in_flight("export") == 0
+    assert "export" not in limiter._in_flight
+
+def test_in_flight_is_released_when_client_leaves_before_the_body():
+    # O corpo nunca chega a ser iterado: a vaga não pode ficar presa
+    limiter = TenantLimiter(MockConfig())
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"a", "more_body": True})
+
+    assert run_app(limiter, streaming_app, disconnect_after=0) == [1]
+    assert limiter.in_flight("export") == 0
@@ -0,0 +1,69 @@
+import json
+import pytest
+from request_body import BodyTooLarge, LimitedBodyReader, parse_call_envelope
+from tools.database.inserts import execute_insert
+
+async def body_stream(payload, chunk_size=7):
+    for start in range(0, len(payload), chunk_size):
+        yield payload[start:start + chunk_size]
+
+def reader_for(body, limit=10_000):
+    return LimitedBodyReader(body_stream(json.dumps(body).encode()), limit)
+
+class MockClient:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_records(self, table, rows):
+        self.batches.append(rows)
+        return len(rows)
+
+@pytest.mark.asyncio
+async def test_parses_name_and_arguments():
+    body = {"name": "database_select", "arguments": {"table": "users", "filters": [{"column": "age", "value": 1.5}]}}
+    name, arguments = await parse_call_envelope(reader_for(body))
+    assert name == "database_select"
+    assert arguments == body["arguments"]
+
+@pytest.mark.asyncio
+async def test_tool_limit_applies_once_name_is_read():
+    body = {"name": "database_select", "arguments": {"table": "x" * 500}}
+    limits = {"database_select": 100}
+    with pytest.raises(BodyTooLarge):
+        await parse_call_envelope(reader_for(body), limit_for=lambda tool: limits.get(tool, 10_000))
+
+@pytest.mark.asyncio
+async def test_streamed_insert_is_chunked():
+    rows = [{"id": i} for i in range(7)]
+    body = {"name": "database_insert", "arguments": {"table": "items", "chunk_size": 3, "data": rows}}
+    name, arguments = await parse_call_envelope(reader_for(body))
+    assert not isinstance(arguments["data"], list)
+    client = MockClient()
+    result = await execute_insert(client, arguments)
+    assert [len(batch) for batch in client.batches] == [3, 3, 1]
+    assert "7 registros" in result[0].text
+
+@pytest.mark.asyncio
+async def test_streamed_argument_does_not_depend_on_key_order():
+    rows = [{"id": i} for i in range(5)]
+    body = {"arguments": {"data": rows, "table": "items", "chunk_size": 2}, "name": "database_insert"}
+    # "name" depois de "arguments": sem ferramenta conhecida, a lista é montada em memória
+    name, arguments = await parse_call_envelope(reader_for(body))
+    assert arguments == body["arguments"]
+
+    body = {"name": "database_insert", "arguments": {"data": rows, "table": "items", "chunk_size": 2}}
+    name, arguments = await parse_call_envelope(reader_for(body))
+    assert not isinstance(arguments["data"], list) and len(arguments["data"]) == 5
+    client = MockClient()
+    result = await execute_insert(client, arguments)
+    assert [len(batch) for batch in client.batches] == [2, 2, 1]
+    assert "5 registros" in result[0].text
+
+@pytest.mark.asyncio
+async def test_missing_arguments_or_bad_body_fail_before_any_insert():
+    body = {"name": "database_insert", "arguments": {"data": [{"id": 1}], "chunk_size": 3}}
+    with pytest.raises(ValueError, match="table"):
+        await parse_call_envelope(reader_for(body))
+    truncated = json.dumps({"name": "database_insert", "arguments": {"table": "items", "data": [{"id": 1}]}})[:-3]
+    with pytest.raises(ValueError):
+        await parse_call_envelope(LimitedBodyReader(body_stream(truncated.encode()), 10_000))
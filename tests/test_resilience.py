@@ -0,0 +1,56 @@
+import httpx
+import pytest
+from resilience import CircuitBreaker, CircuitOpenError, call_upstream
+
+class MockConfig:
+    retry_max_attempts = 3
+    retry_base_delay = 0
+    retry_max_delay = 0
+    hedge_enabled = False
+    hedge_percentile = 95
+    hedge_min_samples = 20
+    breaker_failure_threshold = 3
+    breaker_reset_timeout = 60
+    executor_workers = 4
+    storage_executor_workers = 2
+    adaptive_limit_enabled = False
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+    def get_tenant_id(self):
+        return self.tenant
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_for_idempotent_calls():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    assert await call_upstream(MockConfig("retry"), "select", flaky, idempotent=True) == "ok"
+    assert len(calls) == 3
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast():
+    config = MockConfig("down")
+
+    def failing():
+        raise httpx.ReadTimeout("timeout")
+
+    for _ in range(3):
+        with pytest.raises(httpx.ReadTimeout):
+            await call_upstream(config, "insert", failing)
+    with pytest.raises(CircuitOpenError):
+        await call_upstream(config, "insert", failing)
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
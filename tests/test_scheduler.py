@@ -0,0 +1,125 @@
+import asyncio
+import time
+import pytest
+from scheduler import ToolScheduler, tool_class
+
+WEIGHTS = {"interactive": 8, "default": 4, "bulk": 1}
+
+class MockConfig:
+    tool_classes = {"storage_upload": "bulk", "database_select": "nope"}
+
+async def record_order(scheduler, calls):
+    """Ocupa a única vaga, enfileira as chamadas e devolve a ordem de atendimento"""
+    order = []
+
+    async def call(cls, tenant, label):
+        async with scheduler.slot(cls, tenant):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    blocker = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("default", "holder"):
+            await blocker.wait()
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(call(*spec)) for spec in calls]
+    await asyncio.sleep(0)
+    blocker.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+def test_tool_class_resolution():
+    config = MockConfig()
+    assert tool_class(config, "storage_upload") == "bulk"
+    assert tool_class(config, "storage_upload", "interactive") == "interactive"
+    assert tool_class(config, "auth_get_user") == "interactive"
+    assert tool_class(config, "database_select", "urgent") == "default"
+
+@pytest.mark.asyncio
+async def test_classes_are_served_by_weight():
+    scheduler = ToolScheduler(capacity=1, weights=WEIGHTS)
+    calls = [("bulk", "a", f"bulk{n}") for n in range(8)] + [("default", "a", f"default{n}") for n in range(8)]
+    order = await record_order(scheduler, calls)
+    assert [label[:4] for label in order[:5]].count("bulk") == 1
+
+@pytest.mark.asyncio
+async def test_tenants_take_turns_within_a_class():
+    scheduler = ToolScheduler(capacity=1, weights=WEIGHTS)
+    calls = [("default", "noisy", f"noisy{n}") for n in range(6)] + [("default", "quiet", f"quiet{n}") for n in range(2)]
+    order = await record_order(scheduler, calls)
+    assert order[:4] == ["noisy0", "quiet0", "noisy1", "quiet1"]
+
+async def interactive_waits(scheduler, bulk_calls=12, interactive_calls=10):
+    """Latência (espera + execução) de chamadas interativas curtas durante uploads longos"""
+    async def call(cls, duration):
+        started = time.monotonic()
+        async with scheduler.slot(cls, "abc"):
+            await asyncio.sleep(duration)
+        return time.monotonic() - started
+
+    bulk = [asyncio.ensure_future(call("bulk", 0.05)) for _ in range(bulk_calls)]
+    latencies = []
+    for _ in range(interactive_calls):
+        await asyncio.sleep(0.005)
+        latencies.append(await call("interactive", 0.002))
+    await asyncio.gather(*bulk)
+    return max(latencies)
+
+@pytest.mark.asyncio
+async def test_interactive_calls_keep_low_latency_under_bulk_load():
+    # Sem prioridade (pesos iguais e bulk podendo ocupar tudo): espera atrás dos uploads
+    fifo = await interactive_waits(ToolScheduler(capacity=4, weights={}, bulk_max_share=1.0))
+    prioritized = await interactive_waits(ToolScheduler(capacity=4, weights=WEIGHTS, bulk_max_share=0.75))
+    assert fifo >= 0.04
+    assert prioritized < 0.02
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_frees_its_place():
+    scheduler = ToolScheduler(capacity=1, weights=WEIGHTS)
+    async with scheduler.slot("default", "a"):
+        waiter = asyncio.ensure_future(scheduler._acquire("bulk", "a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+    assert scheduler.in_flight == 0
+    assert not any(scheduler._waiting.values())
+
+def test_queued_call_runs_on_the_requesting_project(monkeypatch):
+    # Enquanto a chamada espera na fila, outras requisições reconfiguram o cliente do middleware
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from contextlib import asynccontextmanager
+    from mcp.types import TextContent
+    from starlette.testclient import TestClient
+    import main_fastapi
+    token = "eyJhbGciOiJIUzI1NiJ9.e30.x"
+    queued, ran = [], []
+
+    class QueueingScheduler:
+        @asynccontextmanager
+        async def slot(self, cls, tenant):
+            queued.append(tenant)
+            main_fastapi.middleware.update_config_from_headers({"x-supabase-project": "beta", "x-supabase-token": token})
+            await asyncio.sleep(0)
+            yield
+
+    class Group:
+        def __init__(self, client):
+            self.client = client
+
+        async def execute_tool(self, name, arguments):
+            ran.append(self.client.config.get_tenant_id())
+            return [TextContent(type="text", text="ok")]
+
+    monkeypatch.setattr(main_fastapi, "get_scheduler", lambda config: QueueingScheduler())
+    monkeypatch.setattr(main_fastapi, "tool_group", lambda instances, name: Group(instances["database"].client))
+    response = TestClient(main_fastapi.app).post(
+        "/mcp/call_tool", json={"name": "database_insert", "arguments": {"table": "t", "data": []}},
+        headers={"x-supabase-project": "alpha", "x-supabase-token": token},
+    )
+    main_fastapi.middleware.update_config_from_headers({})
+    assert response.status_code == 200
+    assert queued == ran == ["alpha"]
@@ -0,0 +1,25 @@
+import asyncio
+import time
+import pytest
+from tools.database.multi import execute_select_multi
+
+class MockConfig:
+    multi_select_concurrency = 4
+    multi_select_timeout = 0.5
+    tenant_client_cache_size = 8
+
+class MockClient:
+    config = MockConfig()
+
+    async def query_table(self, table, query_params):
+        await asyncio.sleep(1 if table == "slow" else 0.1)
+        return [{"id": 1, "table": table}]
+
+@pytest.mark.asyncio
+async def test_select_multi_runs_concurrently_with_timeout():
+    queries = [{"table": "a"}, {"table": "b"}, {"table": "c"}, {"table": "slow"}]
+    started = time.perf_counter()
+    result = await execute_select_multi(MockClient(), {"queries": queries, "merge": True})
+    assert time.perf_counter() - started < 0.9
+    assert result[0].text.startswith("3/4")
+    assert "Tempo limite" in result[0].text
@@ -0,0 +1,84 @@
+import json
+import pytest
+from tools.database.streaming import encode_rows, stream_table_rows
+
+class MockClient:
+    def __init__(self, total):
+        self.total = total
+        self.calls = 0
+
+    async def get_primary_key(self, table):
+        return []
+
+    async def query_table(self, table, query_params):
+        self.calls += 1
+        start = query_params["offset"]
+        end = min(self.total, start + query_params["limit"])
+        return [{"id": i, "name": f"row {i}"} for i in range(start, end)]
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+@pytest.mark.asyncio
+async def test_ndjson_stream_stops_at_max_rows():
+    client = MockClient(total=1000)
+    data = await collect(encode_rows(stream_table_rows(client, "items", chunk_size=100), "ndjson", max_rows=250))
+    lines = data.decode().splitlines()
+    assert len(lines) == 250
+    assert json.loads(lines[-1])["id"] == 249
+    assert client.calls == 3
+
+@pytest.mark.asyncio
+async def test_csv_stream_writes_header_once():
+    client = MockClient(total=5)
+    data = await collect(encode_rows(stream_table_rows(client, "items", chunk_size=2), "csv"))
+    lines = data.decode().splitlines()
+    assert lines[0] == "id,name"
+    assert len(lines) == 6
+
+class KeysetClient:
+    """Tabela com chave primária: responde a filtros id > último e registra as consultas"""
+
+    def __init__(self, total):
+        self.rows = [{"id": i * 10, "name": f"row {i}"} for i in range(total)]
+        self.queries = []
+
+    async def get_primary_key(self, table):
+        return ["id"]
+
+    async def query_table(self, table, query_params):
+        self.queries.append(query_params)
+        rows = self.rows
+        for item in query_params["filters"]:
+            rows = [row for row in rows if row["id"] > item["value"]]
+        start = query_params.get("offset", 0)
+        return rows[start:start + query_params["limit"]]
+
+@pytest.mark.asyncio
+async def test_table_pages_use_primary_key_order():
+    client = KeysetClient(total=7)
+    pages = [rows async for rows in stream_table_rows(client, "items", chunk_size=3, start=1)]
+    assert [row["id"] for rows in pages for row in rows] == [10, 20, 30, 40, 50, 60]
+    # Só a primeira página usa offset; as seguintes continuam depois da última chave
+    assert client.queries[0]["offset"] == 1 and "offset" not in client.queries[1]
+    assert client.queries[1]["filters"] == [{"column": "id", "operator": "gt", "value": 30}]
+    assert all(query["order_by"] == {"column": "id", "desc": False} for query in client.queries)
+
+    # Outra ordem: a chave primária desempata as páginas por offset
+    client = MockClient(total=5)
+    client.get_primary_key = KeysetClient(0).get_primary_key
+    queries = []
+    query_table = client.query_table
+
+    async def record(table, query_params):
+        queries.append(query_params)
+        return await query_table(table, query_params)
+
+    client.query_table = record
+    [rows async for rows in stream_table_rows(client, "items", order_by={"column": "name"}, chunk_size=2)]
+    assert queries[0]["order_by"] == [{"column": "name"}, {"column": "id"}]
+
+@pytest.mark.asyncio
+async def test_resumable_read_requires_deterministic_order():
+    with pytest.raises(ValueError, match="order_by"):
+        [rows async for rows in stream_table_rows(MockClient(total=5), "items", require_order=True)]
@@ -0,0 +1,51 @@
+import pytest
+from tools.database.transactions import build_operation, execute_transaction
+
+def test_build_insert_update_delete():
+    sql, params = build_operation({"type": "insert", "table": "items", "data": [{"a": 1, "b": 2}, {"a": 3, "b": 4}]})
+    assert sql == 'INSERT INTO "items" ("a", "b") VALUES ($1, $2), ($3, $4) RETURNING *'
+    assert params == [1, 2, 3, 4]
+    sql, params = build_operation({"type": "update", "table": "public.items", "id": "7", "data": {"a": 1}})
+    assert sql == 'UPDATE "public"."items" SET "a" = $1 WHERE "id" = $2 RETURNING *'
+    assert params == [1, "7"]
+    sql, params = build_operation({"type": "delete", "table": "items", "id": "7"})
+    assert params == ["7"]
+
+def test_build_insert_uses_union_of_keys_and_defaults_missing_columns():
+    sql, params = build_operation({"type": "insert", "table": "items", "data": [{"a": 1}, {"b": 2, "a": 3}]})
+    assert sql == 'INSERT INTO "items" ("a", "b") VALUES ($1, DEFAULT), ($2, $3) RETURNING *'
+    assert params == [1, 3, 2]
+    with pytest.raises(ValueError):
+        build_operation({"type": "insert", "table": "items", "data": [{}]})
+
+def test_build_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        build_operation({"type": "merge", "table": "items"})
+
+class MockClient:
+    postgres = None
+
+@pytest.mark.asyncio
+async def test_transaction_requires_direct_backend():
+    result = await execute_transaction(MockClient(), {"operations": [{"type": "delete", "table": "t", "id": "1"}]})
+    assert "backend Postgres direto" in result[0].text
+
+@pytest.mark.asyncio
+async def test_concurrent_first_calls_create_a_single_pool(monkeypatch):
+    import asyncio
+    import postgres_backend
+
+    class StubAsyncpg:
+        created = 0
+
+        @classmethod
+        async def create_pool(cls, dsn, **kwargs):
+            await asyncio.sleep(0.01)
+            cls.created += 1
+            return object()
+
+    monkeypatch.setattr(postgres_backend, "asyncpg", StubAsyncpg)
+    backend = postgres_backend.PostgresBackend("postgresql://localhost/db")
+    pools = await asyncio.gather(*(backend.get_pool() for _ in range(5)))
+    assert StubAsyncpg.created == 1
+    assert all(pool is pools[0] for pool in pools)
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from tools.database.inserts import execute_insert
+from write_behind import InsertCoalescer
+import write_behind
+
+class MockConfig:
+    write_behind_enabled = True
+    write_behind_max_batch = 3
+    write_behind_max_delay_ms = 20
+
+    def __init__(self, token="anon"):
+        self.token = token
+
+    def get_tenant_id(self):
+        return "abc"
+
+    def get_credential_id(self):
+        return self.token
+
+class MockClient:
+    def __init__(self, fail=False, token="anon"):
+        self.config = MockConfig(token)
+        self.batches = []
+        self.fail = fail
+
+    def pinned(self):
+        return self
+
+    async def insert_many(self, table, rows):
+        self.batches.append((table, list(rows)))
+        if self.fail:
+            raise Exception("violação de chave única")
+        return [{**row, "id": index} for index, row in enumerate(rows)]
+
+@pytest.mark.asyncio
+async def test_inserts_are_flushed_by_size_and_by_time():
+    client = MockClient()
+    coalescer = InsertCoalescer(max_batch=3, max_delay=0.02)
+    results = await asyncio.gather(*[coalescer.insert(client, "events", {"n": n}) for n in range(4)])
+    assert [len(rows) for _, rows in client.batches] == [3, 1]
+    # Cada chamador recebe a própria linha do lote
+    assert [result["n"] for result in results] == [0, 1, 2, 3]
+
+@pytest.mark.asyncio
+async def test_different_columns_go_to_separate_batches():
+    client = MockClient()
+    coalescer = InsertCoalescer(max_batch=10, max_delay=0.01)
+    await asyncio.gather(
+        coalescer.insert(client, "events", {"n": 1}),
+        coalescer.insert(client, "events", {"n": 2, "tag": "x"}),
+        coalescer.insert(client, "logs", {"n": 3}),
+    )
+    assert sorted((table, len(rows)) for table, rows in client.batches) == [("events", 1), ("events", 1), ("logs", 1)]
+
+@pytest.mark.asyncio
+async def test_failed_flush_reaches_every_caller(monkeypatch):
+    monkeypatch.setattr(write_behind, "_coalescer", None)
+    client = MockClient(fail=True)
+    results = await asyncio.gather(
+        *[execute_insert(client, {"table": "events", "data": {"n": n}}) for n in range(3)]
+    )
+    assert len(client.batches) == 1
+    assert all("violação de chave única" in result[0].text for result in results)
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_pending_records(monkeypatch):
+    coalescer = InsertCoalescer(max_batch=100, max_delay=60)
+    monkeypatch.setattr(write_behind, "_coalescer", coalescer)
+    client = MockClient()
+    pending = asyncio.ensure_future(coalescer.insert(client, "events", {"n": 1}))
+    await asyncio.sleep(0)
+    await write_behind.flush_write_behind()
+    assert (await pending)["n"] == 1
+    assert client.batches == [("events", [{"n": 1}])]
+
+@pytest.mark.asyncio
+async def test_callers_with_different_credentials_do_not_share_a_batch():
+    # Mesmo projeto, chaves diferentes (ex.: JWTs de usuários sob RLS): cada lote usa as credenciais do chamador
+    alice, bob = MockClient(token="jwt-alice"), MockClient(token="jwt-bob")
+    coalescer = InsertCoalescer(max_batch=10, max_delay=0.01)
+    await asyncio.gather(
+        coalescer.insert(alice, "events", {"n": 1}),
+        coalescer.insert(bob, "events", {"n": 2}),
+        coalescer.insert(alice, "events", {"n": 3}),
+    )
+    assert alice.batches == [("events", [{"n": 1}, {"n": 3}])]
+    assert bob.batches == [("events", [{"n": 2}])]
+
+def test_pinned_client_ignores_later_reconfiguration(monkeypatch):
+    monkeypatch.setenv("DEFAULT_SUPABASE_URL", "https://default.supabase.co")
+    monkeypatch.setenv("DEFAULT_SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.x")
+    from config import Config
+    from supabase_client import SupabaseClient
+    shared = SupabaseClient(Config("alpha", "eyJhbGciOiJIUzI1NiJ9.e30.x"))
+    pinned = shared.pinned()
+    shared.update_config("beta", "eyJhbGciOiJIUzI1NiJ9.e30.y")
+    assert pinned.config.get_tenant_id() == "alpha"
+    assert pinned is not shared.pinned()
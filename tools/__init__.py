@@ -5,5 +5,6 @@ Pacote de ferramentas MCP para Supabase
 from .auth import AuthTools
 from .storage import StorageTools
 from .realtime import RealtimeTools
+from .jobs import JobTools
 
-__all__ = ["DatabaseTools", "AuthTools", "StorageTools", "RealtimeTools"] 
+__all__ = ["DatabaseTools", "AuthTools", "StorageTools", "RealtimeTools", "JobTools"] 
@@ -3,11 +3,13 @@ Ferramentas MCP para autenticação do Supabase
 """
 
 import asyncio
+import time
 from typing import Any, Dict, List, Optional
 from mcp.types import Tool, TextContent
 from supabase_client import SupabaseClient
 from config import Config
 from middleware import DynamicConfigMiddleware
+from jwt_verifier import JWTVerificationError, get_verifier
 
 class AuthTools:
     """Ferramentas para operações de autenticação (configuração fixa)"""
@@ -101,6 +103,95 @@ class AuthTools:
                     },
                     "required": ["user_data"]
                 }
+            ),
+            Tool(
+                name="auth_verify_token",
+                description="Verifica um token JWT do Supabase localmente (sem chamada ao GoTrue)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "token": {
+                            "type": "string",
+                            "description": "Token JWT de acesso do usuário"
+                        }
+                    },
+                    "required": ["token"]
+                }
+            ),
+            Tool(
+                name="auth_list_users",
+                description="Lista usuários do projeto com paginação (requer chave de serviço)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "page": {
+                            "type": "integer",
+                            "description": "Página inicial (começa em 1)"
+                        },
+                        "per_page": {
+                            "type": "integer",
+                            "description": "Usuários por página"
+                        },
+                        "max_pages": {
+                            "type": "integer",
+                            "description": "Número máximo de páginas a percorrer (padrão: 1)"
+                        }
+                    }
+                }
+            ),
+            Tool(
+                name="auth_create_users",
+                description="Cria vários usuários em paralelo (requer chave de serviço)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "users": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "email": {"type": "string"},
+                                    "password": {"type": "string"},
+                                    "email_confirm": {"type": "boolean"},
+                                    "user_metadata": {"type": "object"}
+                                }
+                            },
+                            "description": "Atributos dos usuários a serem criados"
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": self.config.admin_concurrency,
+                            "description": "Número máximo de requisições simultâneas (limitado a ADMIN_CONCURRENCY)"
+                        }
+                    },
+                    "required": ["users"]
+                }
+            ),
+            Tool(
+                name="auth_delete_users",
+                description="Deleta vários usuários em paralelo (requer chave de serviço)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "user_ids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "IDs dos usuários a serem deletados"
+                        },
+                        "soft_delete": {
+                            "type": "boolean",
+                            "description": "Apenas marcar os usuários como deletados"
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": self.config.admin_concurrency,
+                            "description": "Número máximo de requisições simultâneas (limitado a ADMIN_CONCURRENCY)"
+                        }
+                    },
+                    "required": ["user_ids"]
+                }
             )
         ]
     
@@ -118,6 +209,14 @@ class AuthTools:
             return await self._execute_reset_password(self.client, arguments)
         elif name == "auth_update_user":
             return await self._execute_update_user(self.client, arguments)
+        elif name == "auth_verify_token":
+            return await self._execute_verify_token(self.client, arguments)
+        elif name == "auth_list_users":
+            return await self._execute_list_users(self.client, arguments)
+        elif name == "auth_create_users":
+            return await self._execute_create_users(self.client, arguments)
+        elif name == "auth_delete_users":
+            return await self._execute_delete_users(self.client, arguments)
         else:
             raise ValueError(f"Ferramenta desconhecida: {name}")
     
@@ -173,7 +272,7 @@ class AuthTools:
     async def _execute_get_user(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
         """Obtém informações do usuário atual"""
         try:
-            user = client.client.auth.get_user()
+            user = await client.get_user()
             return [TextContent(
                 type="text",
                 text=f"Usuário atual:\n{user.user.__dict__ if user.user else 'Nenhum usuário logado'}"
@@ -189,7 +288,7 @@ class AuthTools:
         email = args["email"]
         
         try:
-            client.client.auth.reset_password_email(email)
+            await client.reset_password_email(email)
             return [TextContent(
                 type="text",
                 text=f"Email de reset de senha enviado para {email}"
@@ -205,7 +304,7 @@ class AuthTools:
         user_data = args["user_data"]
         
         try:
-            result = client.client.auth.update_user(user_data)
+            result = await client.update_user(user_data)
             return [TextContent(
                 type="text",
                 text=f"Usuário atualizado com sucesso:\n{result.user.__dict__ if result.user else 'Erro na atualização'}"
@@ -214,4 +313,131 @@ class AuthTools:
             return [TextContent(
                 type="text",
                 text=f"Erro ao atualizar usuário: {str(e)}"
-            )] 
\ No newline at end of file
+            )] 
+    
+    async def _execute_verify_token(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
+        """Verifica um token JWT localmente"""
+        token = args["token"]
+        if token.startswith("Bearer "):
+            token = token[7:]
+        
+        try:
+            claims = get_verifier(self.config).verify(token)
+            return [TextContent(
+                type="text",
+                text=f"Token válido:\n{claims}"
+            )]
+        except JWTVerificationError as e:
+            return [TextContent(
+                type="text",
+                text=f"Token inválido: {str(e)}"
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"Erro ao verificar token: {str(e)}"
+            )]
+    
+    def _bulk_concurrency(self, args: Dict[str, Any]) -> int:
+        """Concorrência pedida pelo chamador, limitada a ADMIN_CONCURRENCY"""
+        return max(1, min(int(args.get("concurrency", self.config.admin_concurrency)), self.config.admin_concurrency))
+    
+    async def _run_bulk(self, items: List[Any], worker, concurrency: int) -> Dict[str, Any]:
+        """Executa worker(item) para cada item com concorrência limitada"""
+        results: List[Dict[str, Any]] = [None] * len(items)
+        pending = iter(enumerate(items))
+        
+        async def run_worker():
+            # No máximo `concurrency` tarefas, cada uma consumindo os itens restantes
+            for index, item in pending:
+                started = time.perf_counter()
+                try:
+                    result = await worker(item)
+                    status = {"index": index, "success": True, "result": result}
+                except Exception as e:
+                    status = {"index": index, "success": False, "error": str(e)}
+                status["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                results[index] = status
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(run_worker() for _ in range(min(max(1, concurrency), len(items)))))
+        elapsed = time.perf_counter() - started
+        succeeded = sum(1 for r in results if r["success"])
+        return {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "items_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+            "results": results,
+        }
+    
+    async def _execute_list_users(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
+        """Lista usuários página a página"""
+        page = args.get("page", 1)
+        per_page = args.get("per_page", self.config.admin_page_size)
+        max_pages = args.get("max_pages", 1)
+        
+        try:
+            started = time.perf_counter()
+            users = []
+            pages = 0
+            async for page_users in client.iter_user_pages(per_page, page, max_pages):
+                users.extend(
+                    {"id": u.get("id"), "email": u.get("email"), "created_at": u.get("created_at")}
+                    for u in page_users
+                )
+                pages += 1
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+            return [TextContent(
+                type="text",
+                text=f"Encontrados {len(users)} usuários em {pages} página(s) ({elapsed_ms} ms):\n{users}"
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"Erro ao listar usuários: {str(e)}"
+            )]
+    
+    async def _execute_create_users(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
+        """Cria usuários em lote"""
+        users = args["users"]
+        concurrency = self._bulk_concurrency(args)
+        
+        async def create(attributes: Dict[str, Any]) -> Dict[str, Any]:
+            user = await client.create_user(attributes)
+            return {"id": user.get("id"), "email": user.get("email")}
+        
+        try:
+            summary = await self._run_bulk(users, create, concurrency)
+            return [TextContent(
+                type="text",
+                text=f"Criação em lote concluída: {summary['succeeded']}/{summary['total']} usuários criados:\n{summary}"
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"Erro ao criar usuários: {str(e)}"
+            )]
+    
+    async def _execute_delete_users(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
+        """Deleta usuários em lote"""
+        user_ids = args["user_ids"]
+        soft_delete = args.get("soft_delete", False)
+        concurrency = self._bulk_concurrency(args)
+        
+        async def delete(user_id: str) -> Dict[str, Any]:
+            await client.delete_user(user_id, soft_delete)
+            return {"id": user_id}
+        
+        try:
+            summary = await self._run_bulk(user_ids, delete, concurrency)
+            return [TextContent(
+                type="text",
+                text=f"Remoção em lote concluída: {summary['succeeded']}/{summary['total']} usuários deletados:\n{summary}"
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"Erro ao deletar usuários: {str(e)}"
+            )]
\ No newline at end of file
@@ -1,5 +1,9 @@
-from .queries import execute_query, execute_select
+from .queries import execute_query, execute_select, execute_slow_queries
 from .inserts import execute_insert
 from .updates import execute_update
 from .deletes import execute_delete
-from .tables import execute_list_tables, execute_get_project_info 
\ No newline at end of file
+from .tables import execute_list_tables, execute_get_project_info
+from .transactions import execute_transaction
+from .multi import execute_select_multi
+from .aggregates import execute_aggregate
+from .bulk import execute_import, execute_export
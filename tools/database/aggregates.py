@@ -0,0 +1,79 @@
+import json
+from mcp.types import TextContent
+from postgres_backend import quote_ident
+from filter_compiler import filter_compiler
+
+AGGREGATE_FUNCTIONS = {"count", "sum", "min", "max", "avg"}
+COUNT_MODES = {"exact", "planned", "estimated"}
+
+def normalize_aggregates(aggregates):
+    """Valida as agregações e define aliases padrão"""
+    normalized = []
+    for item in aggregates:
+        function = item.get("function", "").lower()
+        column = item.get("column")
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Função de agregação não suportada: {function}")
+        if function != "count" and not column:
+            raise ValueError(f"A função {function} exige 'column'")
+        alias = item.get("alias") or (f"{function}_{column}" if column else function)
+        normalized.append({"function": function, "column": column, "alias": alias})
+    return normalized
+
+def build_postgrest_select(aggregates, group_by):
+    """Monta o parâmetro select do PostgREST (colunas agrupadas + agregações)"""
+    parts = list(group_by)
+    for item in aggregates:
+        target = f"{item['column']}.{item['function']}()" if item["column"] else "count()"
+        parts.append(f"{item['alias']}:{target}")
+    return ",".join(parts)
+
+def build_where(table, filters, params, tenant=""):
+    """Converte filtros (o mesmo formato das demais ferramentas) em uma cláusula WHERE parametrizada"""
+    if not filters:
+        return ""
+    compiled = filter_compiler.compile(tenant, table, filters)
+    return f" WHERE {compiled.bind_sql(filters, params)}"
+
+def build_aggregate_sql(table, aggregates, group_by, filters, tenant=""):
+    """Monta a consulta SQL de agregação para o backend Postgres direto"""
+    params = []
+    columns = [quote_ident(column) for column in group_by]
+    for item in aggregates:
+        target = quote_ident(item["column"]) if item["column"] else "*"
+        columns.append(f"{item['function']}({target}) AS {quote_ident(item['alias'])}")
+    sql = f"SELECT {', '.join(columns)} FROM {quote_ident(table)}{build_where(table, filters, params, tenant)}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(quote_ident(column) for column in group_by)}"
+    return sql, params
+
+async def execute_aggregate(client, args):
+    table = args["table"]
+    group_by = args.get("group_by", [])
+    filters = args.get("filters", [])
+    count_mode = args.get("count_mode", "exact")
+    try:
+        aggregates = normalize_aggregates(args.get("aggregates") or [{"function": "count"}])
+        if count_mode not in COUNT_MODES:
+            raise ValueError(f"count_mode inválido: {count_mode}")
+
+        # Contagem simples: cabeçalho Content-Range do PostgREST, sem linhas
+        if not group_by and len(aggregates) == 1 and aggregates[0]["function"] == "count" and not aggregates[0]["column"]:
+            count = await client.count_rows(table, filters, count_mode)
+            result = [{aggregates[0]["alias"]: count}]
+        elif client.postgres is not None:
+            sql, params = build_aggregate_sql(table, aggregates, group_by, filters, client.config.get_tenant_id())
+            result = await client.postgres.fetch(sql, params)
+        else:
+            # Requer db-aggregates-enabled no PostgREST do projeto
+            result = await client.aggregate_table(table, build_postgrest_select(aggregates, group_by), filters)
+
+        return [TextContent(
+            type="text",
+            text=f"Agregação executada com sucesso na tabela {table} ({len(result)} grupos):\n{json.dumps(result, default=str)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro ao agregar tabela {table}: {str(e)}"
+        )]
@@ -0,0 +1,309 @@
+"""
+Importação e exportação em lote (CSV/NDJSON)
+
+A importação lê o arquivo em blocos (objeto do Storage ou corpo da
+requisição), interpreta os registros de forma incremental e insere em
+lotes; a exportação lê a tabela/consulta em blocos e envia o resultado ao
+Storage por upload resumível, em partes. Ambas gravam um checkpoint após
+cada lote confirmado: uma nova chamada com o mesmo job_id continua dali.
+"""
+
+import csv
+import json
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from mcp.types import TextContent
+
+from checkpoints import get_checkpoint_store
+from jobs import report_progress
+from metrics import metrics
+from tools.database.streaming import STREAM_FORMATS, encode_chunk, stream_sql_rows, stream_table_rows
+
+BULK_FORMATS = tuple(STREAM_FORMATS)
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """Formato explícito ou pela extensão do arquivo"""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt} (use {', '.join(BULK_FORMATS)})")
+    return fmt
+
+
+class RecordReader:
+    """
+    Interpreta registros CSV/NDJSON a partir de blocos de bytes
+
+    offset é a posição (em bytes do arquivo) logo após o último registro
+    entregue; columns guarda o cabeçalho do CSV para retomadas no meio do arquivo.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], fmt: str, offset: int = 0,
+                 columns: Optional[List[str]] = None, null_value: Optional[str] = ""):
+        self.chunks = chunks
+        self.fmt = fmt
+        self.offset = offset
+        self.columns = columns
+        self.null_value = null_value
+
+    async def _lines(self) -> AsyncIterator[bytes]:
+        pending = b""
+        async for chunk in self.chunks:
+            pending += chunk
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+        if pending:
+            yield pending
+
+    async def _records(self) -> AsyncIterator[tuple]:
+        """(texto do registro, tamanho em bytes); no CSV, junta linhas de campos entre aspas"""
+        record, size = "", 0
+        async for line in self._lines():
+            text = line.decode("utf-8")
+            if self.offset == 0 and size == 0 and not record:
+                text = text.lstrip("\ufeff")
+            record += text
+            size += len(line)
+            if self.fmt == "csv" and record.count('"') % 2:
+                continue
+            yield record, size
+            record, size = "", 0
+        if record:
+            yield record, size
+
+    def _parse_csv(self, text: str) -> Optional[Dict[str, Any]]:
+        values = next(csv.reader([text]), None)
+        if not values:
+            return None
+        if self.columns is None:
+            self.columns = values
+            return None
+        if len(values) != len(self.columns):
+            raise ValueError(f"Registro CSV com {len(values)} campos (esperados {len(self.columns)}) no byte {self.offset}")
+        return {
+            column: None if self.null_value is not None and value == self.null_value else value
+            for column, value in zip(self.columns, values)
+        }
+
+    async def __aiter__(self):
+        async for text, size in self._records():
+            if text.strip():
+                record = self._parse_csv(text) if self.fmt == "csv" else json.loads(text)
+            else:
+                record = None
+            self.offset += size
+            if record is not None:
+                yield record
+
+
+async def import_records(client, table: str, reader: RecordReader, chunk_size: int,
+                         checkpoint=None, skip_rows: int = 0, rows: int = 0) -> Dict[str, Any]:
+    """
+    Insere os registros do reader em lotes; após cada lote, chama
+    checkpoint(estado) com linhas inseridas, offset e cabeçalho
+    """
+    started = time.monotonic()
+    imported = 0
+    batch: List[Dict[str, Any]] = []
+
+    async def flush():
+        nonlocal rows, imported, batch
+        await client.insert_records(table, batch)
+        rows += len(batch)
+        imported += len(batch)
+        batch = []
+        report_progress(rows, message=f"{rows} linhas importadas")
+        if checkpoint is not None:
+            checkpoint({"rows": rows, "offset": reader.offset, "columns": reader.columns})
+
+    async for record in reader:
+        if skip_rows:
+            # Fonte sem leitura parcial: descarta o que já foi importado
+            skip_rows -= 1
+            continue
+        batch.append(record)
+        if len(batch) >= chunk_size:
+            await flush()
+    if batch:
+        await flush()
+
+    elapsed = time.monotonic() - started
+    metrics.inc_counter(
+        "mcp_bulk_rows_total", imported, labels={"tenant": client.config.get_tenant_id(), "direction": "import"},
+        help="Linhas importadas/exportadas em lote",
+    )
+    return {
+        "rows": rows,
+        "imported": imported,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(imported / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+async def export_rows(client, chunks_from, fmt: str, bucket: str, path: str,
+                      state: Optional[Dict[str, Any]] = None, checkpoint=None,
+                      part_size: int = 6 * 1024 * 1024) -> Dict[str, Any]:
+    """
+    Codifica as linhas e envia ao Storage em partes de part_size bytes
+
+    chunks_from(linha_inicial) devolve os blocos de linhas. O checkpoint guarda a
+    URL do upload e a última fronteira de linha já enviada; na retomada, as
+    linhas são relidas a partir dessa fronteira e os bytes já enviados, descartados.
+    """
+    started = time.monotonic()
+    upload_url = None
+    uploaded = 0
+    if state and state.get("upload_url"):
+        uploaded = await client.get_resumable_offset(state["upload_url"])
+        if uploaded is not None:
+            upload_url = state["upload_url"]
+    if upload_url is None:
+        state = None
+        upload_url = await client.create_resumable_upload(bucket, path, STREAM_FORMATS[fmt])
+        uploaded = 0
+
+    rows = state["rows"] if state else 0
+    position = state["row_bytes"] if state else 0
+    columns = state.get("columns") if state else None
+    skip = uploaded - position
+    start_rows = rows
+    boundaries = deque()
+    buffer = bytearray()
+
+    async for chunk in chunks_from(rows):
+        data, columns = encode_chunk(chunk, fmt, columns)
+        rows += len(chunk)
+        position += len(data)
+        boundaries.append((rows, position))
+        if skip:
+            dropped = min(skip, len(data))
+            data, skip = data[dropped:], skip - dropped
+        buffer += data
+
+        while len(buffer) >= part_size:
+            uploaded = await client.upload_resumable_part(upload_url, uploaded, bytes(buffer[:part_size]))
+            del buffer[:part_size]
+            boundary = None
+            while boundaries and boundaries[0][1] <= uploaded:
+                boundary = boundaries.popleft()
+            if boundary is not None:
+                report_progress(boundary[0], message=f"{boundary[0]} linhas exportadas")
+            if boundary is not None and checkpoint is not None:
+                checkpoint({"upload_url": upload_url, "rows": boundary[0], "row_bytes": boundary[1], "columns": columns})
+
+    total = uploaded + len(buffer)
+    await client.upload_resumable_part(upload_url, uploaded, bytes(buffer), total_length=total)
+
+    elapsed = time.monotonic() - started
+    exported = rows - start_rows
+    metrics.inc_counter(
+        "mcp_bulk_rows_total", exported, labels={"tenant": client.config.get_tenant_id(), "direction": "export"},
+        help="Linhas importadas/exportadas em lote",
+    )
+    return {
+        "rows": rows,
+        "exported": exported,
+        "bytes": total,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(exported / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _job(client, args, default_id: str):
+    """Store, projeto e job_id do checkpoint; resume=false descarta o progresso anterior"""
+    store = get_checkpoint_store(client.config)
+    tenant = client.config.get_tenant_id()
+    job_id = args.get("job_id") or default_id
+    if not args.get("resume", True):
+        store.clear(tenant, job_id)
+    return store, tenant, job_id
+
+
+async def execute_import(client, args):
+    table = args["table"]
+    bucket = args["bucket"]
+    path = args["path"]
+    try:
+        fmt = detect_format(path, args.get("format"))
+        chunk_size = max(1, int(args.get("chunk_size", client.config.bulk_chunk_size)))
+        store, tenant, job_id = _job(client, args, f"import:{table}:{bucket}/{path}")
+        state = store.load(tenant, job_id) or {}
+
+        # O Storage aceita leitura parcial: a importação continua do último byte confirmado
+        offset = state.get("offset", 0)
+        reader = RecordReader(
+            client.iter_file_bytes(bucket, path, start=offset), fmt,
+            offset=offset, columns=state.get("columns"), null_value=args.get("null_value", ""),
+        )
+        stats = await import_records(
+            client, table, reader, chunk_size,
+            checkpoint=lambda s: store.save(tenant, job_id, s), rows=state.get("rows", 0),
+        )
+        store.clear(tenant, job_id)
+        resumed = f" (retomada após {state['rows']} linhas)" if state.get("rows") else ""
+        return [TextContent(
+            type="text",
+            text=f"Importação de {bucket}/{path} para {table} concluída{resumed}:\n{json.dumps(stats, indent=2)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro ao importar {bucket}/{path} para {table} (progresso salvo; repita a chamada para continuar): {str(e)}"
+        )]
+
+
+async def execute_export(client, args):
+    bucket = args["bucket"]
+    path = args["path"]
+    table = args.get("table")
+    sql = args.get("sql")
+    try:
+        if not table and not sql:
+            raise ValueError("Informe 'table' ou 'sql'")
+        fmt = detect_format(path, args.get("format"))
+        chunk_size = max(1, int(args.get("chunk_size", client.config.bulk_chunk_size)))
+
+        if sql:
+            backend = client.postgres
+            if backend is None:
+                raise ValueError("Exportação de SQL requer o backend Postgres direto (DEFAULT_SUPABASE_DB_URL)")
+            if not re.search(r"\border\s+by\b", sql, re.IGNORECASE):
+                # A retomada descarta as linhas já exportadas: a ordem precisa ser a mesma a cada execução
+                raise ValueError("Exportação de SQL exige ORDER BY determinístico (a retomada conta linhas)")
+
+            async def chunks_from(start):
+                # Cursores não pulam linhas no servidor: as já exportadas são descartadas
+                async for chunk in stream_sql_rows(backend, sql, args.get("params", []), chunk_size):
+                    if start >= len(chunk):
+                        start -= len(chunk)
+                        continue
+                    yield chunk[start:]
+                    start = 0
+        else:
+            def chunks_from(start):
+                # Retomada por contagem de linhas: só é correta com uma ordem determinística
+                return stream_table_rows(client, table, args.get("filters"), args.get("order_by"), chunk_size,
+                                         start=start, require_order=True)
+
+        store, tenant, job_id = _job(client, args, f"export:{table or sql}:{bucket}/{path}")
+        state = store.load(tenant, job_id)
+        stats = await export_rows(
+            client, chunks_from, fmt, bucket, path, state=state,
+            checkpoint=lambda s: store.save(tenant, job_id, s),
+            part_size=client.config.storage_upload_part_size,
+        )
+        store.clear(tenant, job_id)
+        return [TextContent(
+            type="text",
+            text=f"Exportação para {bucket}/{path} concluída:\n{json.dumps(stats, indent=2)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro ao exportar para {bucket}/{path} (progresso salvo; repita a chamada para continuar): {str(e)}"
+        )]
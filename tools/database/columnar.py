@@ -0,0 +1,196 @@
+"""
+Codificação colunar (Parquet/Arrow) de resultados paginados
+
+Cada página de linhas vira um record batch Arrow; no Parquet, cada página é
+um row group comprimido. Os bytes são liberados à medida que o writer os
+produz, então o resultado pode ser transmitido ou enviado ao Storage sem
+montar uma lista de linhas em memória. Os tipos vêm do schema da tabela
+(OpenAPI do PostgREST) ou, sem ele, são inferidos da primeira página.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNAR_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise Exception("Formatos colunares requerem o pacote 'pyarrow'")
+
+
+def _to_timestamp(value: Any) -> Any:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _to_date(value: Any) -> Any:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _to_json(value: Any) -> Any:
+    return value if value is None or isinstance(value, str) else json.dumps(value, default=str)
+
+
+def _arrow_type(column_type: Optional[str]):
+    """Tipo Arrow e conversor de valor para um tipo do Postgres (formato do OpenAPI)"""
+    types = {
+        "smallint": (pa.int16(), None),
+        "integer": (pa.int32(), None),
+        "bigint": (pa.int64(), None),
+        "real": (pa.float32(), None),
+        "double precision": (pa.float64(), None),
+        # numeric chega como número JSON, sem precisão/escala conhecidas
+        "numeric": (pa.float64(), None),
+        "boolean": (pa.bool_(), None),
+        "timestamp with time zone": (pa.timestamp("us", tz="UTC"), _to_timestamp),
+        "timestamp without time zone": (pa.timestamp("us"), _to_timestamp),
+        "date": (pa.date32(), _to_date),
+    }
+    return types.get(column_type, (pa.string(), _to_json))
+
+
+class ColumnarSchema:
+    """Schema Arrow com os conversores de cada coluna"""
+
+    def __init__(self, fields: List[tuple]):
+        self.schema = pa.schema([pa.field(name, arrow_type) for name, arrow_type, _ in fields])
+        self.converters = {name: convert for name, _, convert in fields}
+
+    @classmethod
+    def from_table_schema(cls, table_schema: Dict[str, str], columns: List[str]) -> "ColumnarSchema":
+        names = list(table_schema) if columns == ["*"] else columns
+        return cls([(name, *_arrow_type(table_schema.get(name))) for name in names])
+
+    @classmethod
+    def infer(cls, rows: List[Dict[str, Any]]) -> "ColumnarSchema":
+        """Infere os tipos da primeira página; colunas só com nulos viram texto"""
+        inferred = pa.Table.from_pylist(rows).schema
+        fields = []
+        for field in inferred:
+            if pa.types.is_null(field.type) or pa.types.is_nested(field.type):
+                fields.append((field.name, pa.string(), _to_json))
+            else:
+                fields.append((field.name, field.type, None))
+        return cls(fields)
+
+    def batch(self, rows: List[Dict[str, Any]]):
+        """Converte uma página de linhas em um record batch"""
+        arrays = []
+        for field in self.schema:
+            convert = self.converters[field.name]
+            values = [row.get(field.name) for row in rows]
+            if convert is not None:
+                values = [convert(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class _Sink:
+    """Destino de escrita do pyarrow que acumula bytes até serem drenados"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ColumnarEncoder:
+    """Codifica páginas de linhas em Parquet (um row group por página) ou Arrow IPC"""
+
+    def __init__(self, fmt: str, schema: Optional[ColumnarSchema] = None, compression: str = "zstd"):
+        _require_pyarrow()
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Formato colunar não suportado: {fmt}")
+        self.fmt = fmt
+        self.schema = schema
+        self.compression = compression
+        self.rows = 0
+        self._sink = _Sink()
+        self._writer = None
+
+    def _open(self):
+        stream = pa.PythonFile(self._sink, mode="w")
+        if self.fmt == "parquet":
+            self._writer = pq.ParquetWriter(stream, self.schema.schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_stream(stream, self.schema.schema, options=options)
+
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        """Adiciona uma página e retorna os bytes já produzidos"""
+        if not rows:
+            return b""
+        if self.schema is None:
+            self.schema = ColumnarSchema.infer(rows)
+        if self._writer is None:
+            self._open()
+        self._writer.write_batch(self.schema.batch(rows))
+        self.rows += len(rows)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """Finaliza o arquivo (rodapé do Parquet / fim do stream) e retorna os bytes restantes"""
+        if self._writer is None:
+            if self.schema is None:
+                self.schema = ColumnarSchema([])
+            self._open()
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def encode_columnar(chunks: AsyncIterator[List[Dict[str, Any]]], fmt: str,
+                          schema: Optional[ColumnarSchema] = None,
+                          max_rows: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Equivalente colunar de streaming.encode_rows"""
+    encoder = ColumnarEncoder(fmt, schema)
+    try:
+        async for rows in chunks:
+            if max_rows is not None and encoder.rows + len(rows) > max_rows:
+                rows = rows[:max_rows - encoder.rows]
+            data = encoder.write(rows)
+            if data:
+                yield data
+            if max_rows is not None and encoder.rows >= max_rows:
+                break
+    finally:
+        await chunks.aclose()
+    yield encoder.close()
+
+
+async def columnar_schema_for(client, table: str, columns: List[str]) -> Optional[ColumnarSchema]:
+    """Schema Arrow a partir do schema da tabela (None se indisponível ou com colunas embutidas)"""
+    if any("(" in column or ":" in column for column in columns):
+        return None
+    table_schema = await client.get_table_schema(table)
+    if not table_schema:
+        return None
+    return ColumnarSchema.from_table_schema(table_schema, columns)
@@ -1,16 +1,63 @@
 from mcp.types import TextContent
 
+from jobs import report_progress
+from write_behind import get_insert_coalescer
+
+DEFAULT_INSERT_CHUNK_SIZE = 500
+
+
+async def _iter_chunks(data, chunk_size):
+    """Agrupa registros (lista ou iterador assíncrono do corpo em arquivo temporário) em blocos"""
+    chunk = []
+    if hasattr(data, "__aiter__"):
+        async for record in data:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for record in data:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
 async def execute_insert(client, args):
     table = args["table"]
     data = args["data"]
+    if isinstance(data, dict):
+        try:
+            if args.get("write_behind", client.config.write_behind_enabled):
+                # Confirmado quando o lote com os registros de outras chamadas é gravado
+                result = await get_insert_coalescer(client.config).insert(client, table, data)
+            else:
+                result = await client.insert_record(table, data)
+            return [TextContent(
+                type="text",
+                text=f"Registro inserido com sucesso na tabela {table}:\n{result}"
+            )]
+        except Exception as e:
+            return [TextContent(
+                type="text",
+                text=f"Erro ao inserir registro na tabela {table}: {str(e)}"
+            )]
+
+    # Vários registros: inseridos em blocos à medida que chegam
+    chunk_size = max(1, int(args.get("chunk_size", DEFAULT_INSERT_CHUNK_SIZE)))
+    inserted = 0
     try:
-        result = await client.insert_record(table, data)
+        async for chunk in _iter_chunks(data, chunk_size):
+            inserted += await client.insert_records(table, chunk)
+            report_progress(inserted, len(data))
         return [TextContent(
             type="text",
-            text=f"Registro inserido com sucesso na tabela {table}:\n{result}"
+            text=f"{inserted} registros inseridos com sucesso na tabela {table}"
         )]
     except Exception as e:
         return [TextContent(
             type="text",
-            text=f"Erro ao inserir registro na tabela {table}: {str(e)}"
-        )] 
\ No newline at end of file
+            text=f"Erro ao inserir registros na tabela {table} ({inserted} já inseridos): {str(e)}"
+        )]
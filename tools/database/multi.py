@@ -0,0 +1,67 @@
+import asyncio
+import json
+import time
+from mcp.types import TextContent
+from supabase_client import get_tenant_client
+
+async def execute_select_multi(client, args):
+    queries = args["queries"]
+    config = client.config
+    concurrency = max(1, args.get("concurrency", config.multi_select_concurrency))
+    timeout = args.get("timeout", config.multi_select_timeout)
+    merge = args.get("merge", False)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index, spec):
+        target = client
+        if spec.get("project"):
+            if not spec.get("token"):
+                raise ValueError("'token' é obrigatório ao informar 'project'")
+            target = get_tenant_client(spec["project"], spec["token"], config.tenant_client_cache_size)
+        query_params = {
+            "filters": spec.get("filters", []),
+            "limit": spec.get("limit", 100),
+            "offset": spec.get("offset", 0),
+        }
+        if spec.get("order_by"):
+            query_params["order_by"] = spec["order_by"]
+        return await target.query_table(spec["table"], query_params)
+
+    async def guarded(index, spec):
+        async with semaphore:
+            started = time.perf_counter()
+            item = {"index": index, "project": spec.get("project"), "table": spec.get("table")}
+            try:
+                rows = await asyncio.wait_for(run_one(index, spec), timeout)
+                item.update(success=True, count=len(rows), rows=rows)
+            except asyncio.TimeoutError:
+                item.update(success=False, error=f"Tempo limite de {timeout}s excedido")
+            except Exception as e:
+                item.update(success=False, error=str(e))
+            item["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return item
+
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(guarded(i, spec) for i, spec in enumerate(queries)))
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        succeeded = sum(1 for r in results if r["success"])
+
+        if merge:
+            merged = [
+                {"_project": r["project"], "_table": r["table"], **row}
+                for r in results if r["success"] for row in r.pop("rows")
+            ]
+            payload = {"rows": merged, "results": results}
+        else:
+            payload = {"results": results}
+
+        return [TextContent(
+            type="text",
+            text=f"{succeeded}/{len(results)} consultas executadas com sucesso em {elapsed_ms} ms:\n{json.dumps(payload, default=str)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro ao executar consultas: {str(e)}"
+        )]
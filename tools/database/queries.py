@@ -1,12 +1,38 @@
+import json
+import time
 from mcp.types import TextContent
+from query_log import normalize_sql, slow_query_log, summarize_plan
+from tools.database.columnar import COLUMNAR_FORMATS, ColumnarEncoder, columnar_schema_for
+from tools.database.streaming import stream_table_rows
 
 async def execute_query(client, args):
     sql = args["sql"]
+    params = args.get("params", [])
     try:
-        result = client.client.rpc("exec_sql", {"sql_query": sql}).execute()
+        backend = client.postgres
+        if args.get("explain"):
+            if backend is None:
+                raise Exception("EXPLAIN de SQL exige o backend Postgres direto (DEFAULT_SUPABASE_DB_URL)")
+            plan = await backend.explain(sql, params, analyze=args.get("analyze", True))
+            return [TextContent(
+                type="text",
+                text=f"Plano da query:\nResumo: {summarize_plan(plan)}\n{json.dumps(plan)}"
+            )]
+
+        started = time.perf_counter()
+        if backend is not None:
+            data = await backend.fetch(sql, params)
+        elif params:
+            raise Exception("Parâmetros exigem o backend Postgres direto (DEFAULT_SUPABASE_DB_URL)")
+        else:
+            data = await client.exec_sql(sql)
+        slow_query_log.record(
+            client.config, "sql", normalize_sql(sql), (time.perf_counter() - started) * 1000,
+            plan_fetcher=(lambda: backend.explain(sql, params, analyze=False)) if backend is not None else None,
+        )
         return [TextContent(
             type="text",
-            text=f"Query executada com sucesso. Resultado: {result.data}"
+            text=f"Query executada com sucesso. Resultado: {data}"
         )]
     except Exception as e:
         return [TextContent(
@@ -14,6 +40,53 @@ async def execute_query(client, args):
             text=f"Erro ao executar query: {str(e)}"
         )]
 
+async def export_select_columnar(client, args):
+    """
+    Codifica as páginas da seleção em Parquet/Arrow e envia o arquivo ao Storage
+    por upload resumível, em partes de STORAGE_UPLOAD_PART_SIZE (a memória usada
+    não depende do número de linhas)
+    """
+    table = args["table"]
+    fmt = args["format"]
+    columns = args.get("columns", ["*"])
+    if not args.get("bucket") or not args.get("path"):
+        raise ValueError(f"O formato {fmt} exige 'bucket' e 'path' de destino")
+    max_rows = args.get("limit", client.config.stream_max_rows)
+    chunk_size = min(client.config.stream_chunk_size, max_rows)
+    part_size = client.config.storage_upload_part_size
+
+    started = time.perf_counter()
+    encoder = ColumnarEncoder(fmt, await columnar_schema_for(client, table, columns))
+    upload_url = await client.create_resumable_upload(args["bucket"], args["path"], COLUMNAR_FORMATS[fmt])
+    uploaded = 0
+    buffer = bytearray()
+    json_bytes = 0
+    chunks = stream_table_rows(
+        client, table, args.get("filters"), args.get("order_by"), chunk_size,
+        start=args.get("offset", 0), columns=columns,
+    )
+    try:
+        async for rows in chunks:
+            rows = rows[:max_rows - encoder.rows]
+            json_bytes += len(json.dumps(rows, default=str))
+            buffer += encoder.write(rows)
+            while len(buffer) >= part_size:
+                uploaded = await client.upload_resumable_part(upload_url, uploaded, bytes(buffer[:part_size]))
+                del buffer[:part_size]
+            if encoder.rows >= max_rows:
+                break
+    finally:
+        await chunks.aclose()
+    buffer += encoder.close()
+    total = uploaded + len(buffer)
+    await client.upload_resumable_part(upload_url, uploaded, bytes(buffer), total_length=total)
+    return {
+        "rows": encoder.rows,
+        "bytes": total,
+        "json_bytes": json_bytes,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
 async def execute_select(client, args):
     table = args["table"]
     columns = args.get("columns", ["*"])
@@ -21,11 +94,26 @@ async def execute_select(client, args):
     limit = args.get("limit", 100)
     offset = args.get("offset", 0)
     try:
+        if args.get("format") in COLUMNAR_FORMATS:
+            stats = await export_select_columnar(client, args)
+            return [TextContent(
+                type="text",
+                text=f"Resultado de {table} gravado em {args['bucket']}/{args['path']} ({args['format']}):\n{json.dumps(stats)}"
+            )]
         query_params = {
+            "columns": columns,
             "filters": filters,
             "limit": limit,
             "offset": offset
         }
+        if args.get("order_by"):
+            query_params["order_by"] = args["order_by"]
+        if args.get("explain"):
+            plan = await client.explain_select(table, query_params, analyze=args.get("analyze", True))
+            return [TextContent(
+                type="text",
+                text=f"Plano da consulta na tabela {table}:\nResumo: {summarize_plan(plan)}\n{json.dumps(plan)}"
+            )]
         result = await client.query_table(table, query_params)
         return [TextContent(
             type="text",
@@ -35,4 +123,18 @@ async def execute_select(client, args):
         return [TextContent(
             type="text",
             text=f"Erro ao consultar tabela {table}: {str(e)}"
-        )] 
\ No newline at end of file
+        )]
+
+async def execute_slow_queries(client, args):
+    limit = args.get("limit", 50)
+    try:
+        entries = slow_query_log.entries(client.config.get_tenant_id(), limit)
+        return [TextContent(
+            type="text",
+            text=f"Consultas lentas recentes ({len(entries)}):\n{json.dumps(entries, default=str)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro ao listar consultas lentas: {str(e)}"
+        )]
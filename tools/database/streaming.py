@@ -0,0 +1,161 @@
+"""
+Execução em streaming de consultas grandes (NDJSON/CSV em blocos)
+
+Com o backend Postgres direto, as linhas vêm de um cursor do servidor;
+caso contrário, a tabela é lida em páginas pelo PostgREST, sempre em uma
+ordem determinística: sem order_by, pela chave primária com paginação por
+chave (keyset, "id > último"); com order_by, a chave primária desempata as
+páginas por offset. A memória fica limitada ao tamanho do bloco, e os
+limites de linhas/bytes encerram a leitura antecipadamente.
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def stream_sql_rows(backend, sql: str, params: Sequence[Any] = (),
+                          chunk_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Lê uma consulta SQL com cursor do servidor, em blocos de chunk_size linhas"""
+    pool = await backend.get_pool()
+    async with pool.acquire() as connection:
+        # Cursores do servidor só existem dentro de uma transação
+        async with connection.transaction(readonly=True):
+            cursor = await connection.cursor(sql, *params)
+            while True:
+                records = await cursor.fetch(chunk_size)
+                if not records:
+                    break
+                yield [dict(record) for record in records]
+                if len(records) < chunk_size:
+                    break
+
+
+async def stream_table_rows(client, table: str, filters: Optional[List[Dict[str, Any]]] = None,
+                            order_by: Optional[Dict[str, Any]] = None,
+                            chunk_size: int = 1000, start: int = 0,
+                            columns: Optional[List[str]] = None,
+                            require_order: bool = False) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Lê uma tabela pelo PostgREST em páginas de chunk_size linhas (a partir da
+    linha start). Com require_order (exportações retomáveis), falha se não
+    houver ordem determinística (sem order_by nem chave primária)
+    """
+    primary_key = await client.get_primary_key(table)
+    selected = columns if columns and columns != ["*"] else None
+    keyset = (
+        len(primary_key) == 1
+        and (order_by is None or order_by.get("column") == primary_key[0])
+        and (selected is None or primary_key[0] in selected)
+    )
+    if keyset:
+        async for rows in _keyset_pages(client, table, filters, primary_key[0], bool(order_by and order_by.get("desc")),
+                                        chunk_size, start, columns):
+            yield rows
+        return
+
+    # Offset: a chave primária desempata a ordem pedida (ou é a própria ordem)
+    orders = [order_by] if order_by else []
+    orders += [{"column": column} for column in primary_key if not order_by or column != order_by.get("column")]
+    if not orders:
+        if require_order:
+            raise ValueError(f"A tabela {table} não tem chave primária: informe 'order_by' com uma coluna única")
+        logger.warning(f"Tabela {table} lida por offset sem ordem definida: páginas podem repetir ou pular linhas")
+    offset = start
+    while True:
+        query_params = {"filters": filters or [], "limit": chunk_size, "offset": offset}
+        if columns:
+            query_params["columns"] = columns
+        if orders:
+            query_params["order_by"] = orders
+        rows = await client.query_table(table, query_params)
+        if not rows:
+            break
+        yield rows
+        if len(rows) < chunk_size:
+            break
+        offset += chunk_size
+
+
+async def _keyset_pages(client, table: str, filters: Optional[List[Dict[str, Any]]], key: str, desc: bool,
+                        chunk_size: int, start: int,
+                        columns: Optional[List[str]]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Páginas pela chave primária: cada página começa depois da última chave lida"""
+    last = None
+    while True:
+        page_filters = list(filters or [])
+        query_params = {"limit": chunk_size, "order_by": {"column": key, "desc": desc}}
+        if last is not None:
+            page_filters.append({"column": key, "operator": "lt" if desc else "gt", "value": last})
+        elif start:
+            # Primeira página de uma leitura a partir de uma linha: offset uma única vez
+            query_params["offset"] = start
+        query_params["filters"] = page_filters
+        if columns:
+            query_params["columns"] = columns
+        rows = await client.query_table(table, query_params)
+        if not rows:
+            break
+        yield rows
+        if len(rows) < chunk_size:
+            break
+        last = rows[-1][key]
+
+
+def encode_chunk(rows: List[Dict[str, Any]], fmt: str,
+                 columns: Optional[List[str]] = None) -> Tuple[bytes, Optional[List[str]]]:
+    """Codifica um bloco de linhas; no CSV, o cabeçalho é escrito enquanto columns for None"""
+    if fmt == "ndjson":
+        return "".join(json.dumps(row, default=str) + "\n" for row in rows).encode("utf-8"), columns
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if columns is None and rows:
+        columns = list(rows[0].keys())
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row.get(column) for column in columns])
+    return buffer.getvalue().encode("utf-8"), columns
+
+
+async def encode_rows(chunks: AsyncIterator[List[Dict[str, Any]]], fmt: str = "ndjson",
+                      max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Codifica blocos de linhas em NDJSON/CSV, respeitando os limites de linhas e bytes"""
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Formato de streaming não suportado: {fmt}")
+
+    rows_sent = 0
+    bytes_sent = 0
+    columns: Optional[List[str]] = None
+    truncated = False
+
+    try:
+        async for rows in chunks:
+            if max_rows is not None and rows_sent + len(rows) > max_rows:
+                rows = rows[:max_rows - rows_sent]
+                truncated = True
+
+            data, columns = encode_chunk(rows, fmt, columns)
+            if max_bytes is not None and bytes_sent + len(data) > max_bytes:
+                truncated = True
+                break
+
+            rows_sent += len(rows)
+            bytes_sent += len(data)
+            yield data
+
+            if truncated:
+                break
+    finally:
+        # Fecha o cursor/paginação imediatamente ao atingir um limite
+        await chunks.aclose()
+        if truncated:
+            logger.info(f"Streaming interrompido no limite: {rows_sent} linhas, {bytes_sent} bytes")
@@ -8,8 +8,12 @@ async def execute_list_tables(client, args):
         WHERE table_schema = 'public'
         ORDER BY table_name;
         """
-        result = client.client.rpc("exec_sql", {"sql_query": sql}).execute()
-        tables = [row["table_name"] for row in result.data] if result.data else []
+        backend = client.postgres
+        if backend is not None:
+            rows = await backend.fetch(sql)
+        else:
+            rows = await client.exec_sql(sql)
+        tables = [row["table_name"] for row in rows] if rows else []
         return [TextContent(
             type="text",
             text=f"Tabelas disponíveis no banco de dados:\n{', '.join(tables)}"
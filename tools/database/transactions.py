@@ -0,0 +1,83 @@
+import json
+import time
+from mcp.types import TextContent
+from deadlines import remaining
+from postgres_backend import fetch_prepared, quote_ident
+
+def build_operation(operation):
+    """Converte uma operação (insert/update/delete/sql) em SQL parametrizado"""
+    op_type = operation.get("type")
+    table = operation.get("table")
+
+    if op_type == "insert":
+        rows = operation["data"] if isinstance(operation["data"], list) else [operation["data"]]
+        if not rows:
+            raise ValueError("Insert sem dados")
+        # União das chaves, na ordem em que aparecem; coluna ausente na linha usa o
+        # DEFAULT da tabela (como o PostgREST faz com missing=default), não NULL
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        if not columns:
+            raise ValueError("Insert sem colunas")
+        params, values = [], []
+        for row in rows:
+            placeholders = []
+            for column in columns:
+                if column not in row:
+                    placeholders.append("DEFAULT")
+                    continue
+                params.append(row[column])
+                placeholders.append(f"${len(params)}")
+            values.append(f"({', '.join(placeholders)})")
+        sql = (f"INSERT INTO {quote_ident(table)} ({', '.join(quote_ident(c) for c in columns)}) "
+               f"VALUES {', '.join(values)} RETURNING *")
+        return sql, params
+
+    if op_type == "update":
+        data = operation["data"]
+        if not data:
+            raise ValueError("Update sem dados")
+        params = list(data.values()) + [operation["id"]]
+        assignments = ", ".join(f"{quote_ident(column)} = ${i}" for i, column in enumerate(data, start=1))
+        sql = f"UPDATE {quote_ident(table)} SET {assignments} WHERE \"id\" = ${len(params)} RETURNING *"
+        return sql, params
+
+    if op_type == "delete":
+        return f"DELETE FROM {quote_ident(table)} WHERE \"id\" = $1 RETURNING *", [operation["id"]]
+
+    if op_type == "sql":
+        return operation["sql"], operation.get("params", [])
+
+    raise ValueError(f"Tipo de operação desconhecido: {op_type}")
+
+async def execute_transaction(client, args):
+    operations = args["operations"]
+    try:
+        backend = client.postgres
+        if backend is None:
+            raise Exception("Transações exigem o backend Postgres direto (DEFAULT_SUPABASE_DB_URL)")
+
+        # Valida todas as operações antes de abrir a transação
+        statements = [build_operation(operation) for operation in operations]
+
+        started = time.perf_counter()
+        results = []
+        pool = await backend.get_pool()
+        async with pool.acquire(timeout=remaining()) as connection:
+            async with connection.transaction():
+                for index, (sql, params) in enumerate(statements):
+                    try:
+                        rows = await fetch_prepared(connection, sql, params)
+                    except Exception as e:
+                        raise Exception(f"Operação {index} ({operations[index].get('type')}) falhou: {str(e)}")
+                    results.append({"index": index, "type": operations[index].get("type"), "rows": rows})
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        return [TextContent(
+            type="text",
+            text=f"Transação confirmada: {len(results)} operações em {elapsed_ms} ms:\n{json.dumps(results, default=str)}"
+        )]
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Erro na transação (nenhuma alteração aplicada): {str(e)}"
+        )]
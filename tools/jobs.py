@@ -0,0 +1,96 @@
+"""
+Ferramentas MCP para acompanhar jobs em segundo plano
+"""
+
+import json
+from typing import Any, Awaitable, Callable, Dict, List
+from mcp.types import Tool, TextContent
+from supabase_client import SupabaseClient
+from config import Config
+from jobs import FINISHED_STATES, SUCCEEDED, get_job_queue
+
+JOB_ID_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "job_id": {
+            "type": "string",
+            "description": "Id retornado pela chamada com \"async\": true"
+        }
+    },
+    "required": ["job_id"]
+}
+
+async def submit_tool_job(config: Config, name: str, arguments: Dict[str, Any],
+                          run_tool: Callable[[str, Dict[str, Any]], Awaitable[List[TextContent]]]) -> List[TextContent]:
+    """
+    Enfileira a ferramenta como job e responde com o job_id. Argumentos lidos
+    em streaming do corpo são materializados antes, pois a requisição termina aqui
+    """
+    arguments = dict(arguments)
+    for key, value in arguments.items():
+        if hasattr(value, "__aiter__"):
+            arguments[key] = [item async for item in value]
+    job_id = get_job_queue(config).submit(config.get_tenant_id(), config.get_credential_id(), name,
+                                          lambda: run_tool(name, arguments))
+    return [TextContent(
+        type="text",
+        text=json.dumps({"job_id": job_id, "status": "queued", "tool": name})
+    )]
+
+class JobTools:
+    """Ferramentas de consulta e cancelamento de jobs (configuração fixa)"""
+    def __init__(self, config: Config, supabase_client: SupabaseClient):
+        self.config = config
+        self.client = supabase_client
+
+    def get_tools(self) -> List[Tool]:
+        """Retorna lista de ferramentas disponíveis"""
+        return [
+            Tool(
+                name="job_status",
+                description="Consulta o estado e o progresso de um job em segundo plano",
+                inputSchema=JOB_ID_SCHEMA
+            ),
+            Tool(
+                name="job_result",
+                description="Retorna o resultado de um job concluído",
+                inputSchema=JOB_ID_SCHEMA
+            ),
+            Tool(
+                name="job_cancel",
+                description="Cancela um job na fila ou em execução",
+                inputSchema=JOB_ID_SCHEMA
+            ),
+        ]
+
+    async def execute_tool(self, name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+        """Executa uma ferramenta específica"""
+        queue = get_job_queue(self.config)
+        # Só a credencial que criou o job pode consultá-lo ou cancelá-lo
+        owner = (self.config.get_tenant_id(), self.config.get_credential_id())
+        job_id = arguments["job_id"]
+        if name == "job_cancel":
+            job = queue.cancel(*owner, job_id)
+        elif name in ("job_status", "job_result"):
+            job = queue.get(*owner, job_id)
+        else:
+            raise ValueError(f"Ferramenta desconhecida: {name}")
+
+        if job is None:
+            return [TextContent(type="text", text=f"Erro: job {job_id} não encontrado (ou resultado expirado)")]
+
+        if name == "job_result":
+            if job["status"] == SUCCEEDED:
+                return [TextContent(type="text", text=content.get("text", "")) for content in job["result"]]
+            if job["status"] in FINISHED_STATES:
+                return [TextContent(type="text", text=f"Erro: job {job_id} terminou como {job['status']}: {job['error'] or ''}")]
+            return [TextContent(type="text", text=f"Job {job_id} ainda não concluído ({job['status']})")]
+
+        if name == "job_cancel":
+            if job["status"] in FINISHED_STATES:
+                return [TextContent(type="text", text=f"Job {job_id} já concluído ({job['status']})")]
+            return [TextContent(type="text", text=f"Cancelamento do job {job_id} solicitado")]
+
+        status = {key: job[key] for key in ("id", "tool", "status", "progress", "error",
+                                             "created_at", "started_at", "finished_at", "expires_at")}
+        return [TextContent(type="text", text=json.dumps(status))]
@@ -191,7 +191,7 @@ class StorageTools:
         path = args.get("path", "")
         
         try:
-            result = client.client.storage.from_(bucket).list(path)
+            result = await client.list_files(bucket, path)
             files = [item["name"] for item in result] if result else []
             
             return [TextContent(
@@ -210,7 +210,7 @@ class StorageTools:
         path = args["path"]
         
         try:
-            client.client.storage.from_(bucket).remove([path])
+            await client.remove_file(bucket, path)
             return [TextContent(
                 type="text",
                 text=f"Arquivo {bucket}/{path} deletado com sucesso"
@@ -241,7 +241,7 @@ class StorageTools:
     async def _execute_list_buckets(self, client: SupabaseClient, args: Dict[str, Any]) -> List[TextContent]:
         """Lista todos os buckets"""
         try:
-            result = client.client.storage.list_buckets()
+            result = await client.list_buckets()
             buckets = [bucket["name"] for bucket in result] if result else []
             
             return [TextContent(
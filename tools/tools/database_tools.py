@@ -10,11 +10,15 @@ from mcp.types import Tool, TextContent
 from middleware import DynamicConfigMiddleware
 from supabase_client import SupabaseClient
 from config import Config
-from tools.database.queries import execute_query
+from tools.database.queries import execute_query, execute_slow_queries
 from tools.database.inserts import execute_insert
 from tools.database.updates import execute_update
 from tools.database.deletes import execute_delete
 from tools.database.tables import execute_list_tables, execute_get_project_info
+from tools.database.transactions import execute_transaction
+from tools.database.multi import execute_select_multi
+from tools.database.aggregates import execute_aggregate
+from tools.database.bulk import execute_import, execute_export
 
 class DatabaseTools:
     """Ferramentas para operações de banco de dados (configuração fixa)"""
@@ -34,6 +38,18 @@ class DatabaseTools:
                         "sql": {
                             "type": "string",
                             "description": "Query SQL a ser executada"
+                        },
+                        "params": {
+                            "type": "array",
+                            "description": "Parâmetros posicionais ($1, $2, ...) - apenas com backend Postgres direto"
+                        },
+                        "explain": {
+                            "type": "boolean",
+                            "description": "Retorna o plano de execução em vez dos dados"
+                        },
+                        "analyze": {
+                            "type": "boolean",
+                            "description": "Com explain, executa a consulta para medir tempos reais (padrão: true)"
                         }
                     },
                     "required": ["sql"]
@@ -60,12 +76,41 @@ class DatabaseTools:
                                 "type": "object",
                                 "properties": {
                                     "column": {"type": "string"},
-                                    "operator": {"type": "string"},
-                                    "value": {"type": "string"}
+                                    "operator": {
+                                        "type": "string",
+                                        "enum": [
+                                            "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike",
+                                            "is", "in", "between", "fts", "plfts", "phfts", "wfts"
+                                        ]
+                                    },
+                                    "value": {
+                                        "description": "Valor (lista para 'in' e [mínimo, máximo] para 'between')"
+                                    },
+                                    "negate": {"type": "boolean"},
+                                    "config": {
+                                        "type": "string",
+                                        "description": "Configuração de idioma da busca textual"
+                                    },
+                                    "or": {
+                                        "type": "array",
+                                        "description": "Grupo de filtros combinados com OR (aceita grupos aninhados)"
+                                    },
+                                    "and": {
+                                        "type": "array",
+                                        "description": "Grupo de filtros combinados com AND (aceita grupos aninhados)"
+                                    }
                                 }
                             },
                             "description": "Filtros a serem aplicados"
                         },
+                        "order_by": {
+                            "type": "object",
+                            "properties": {
+                                "column": {"type": "string"},
+                                "desc": {"type": "boolean"}
+                            },
+                            "description": "Ordenação do resultado"
+                        },
                         "limit": {
                             "type": "integer",
                             "description": "Limite de registros"
@@ -73,6 +118,125 @@ class DatabaseTools:
                         "offset": {
                             "type": "integer",
                             "description": "Offset para paginação"
+                        },
+                        "explain": {
+                            "type": "boolean",
+                            "description": "Retorna o plano de execução em vez dos dados"
+                        },
+                        "analyze": {
+                            "type": "boolean",
+                            "description": "Com explain, executa a consulta para medir tempos reais (padrão: true)"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["text", "parquet", "arrow"],
+                            "description": "parquet/arrow gravam o resultado (todas as páginas até limit) no Storage",
+                            "default": "text"
+                        },
+                        "bucket": {
+                            "type": "string",
+                            "description": "Bucket de destino (formatos parquet/arrow)"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "Caminho do arquivo no bucket (formatos parquet/arrow)"
+                        }
+                    },
+                    "required": ["table"]
+                }
+            ),
+            Tool(
+                name="database_select_multi",
+                description="Executa várias consultas (tabelas e/ou projetos diferentes) em paralelo",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "queries": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "project": {
+                                        "type": "string",
+                                        "description": "Código do projeto (padrão: projeto atual)"
+                                    },
+                                    "token": {
+                                        "type": "string",
+                                        "description": "Chave do projeto informado"
+                                    },
+                                    "table": {"type": "string"},
+                                    "filters": {"type": "array"},
+                                    "order_by": {"type": "object"},
+                                    "limit": {"type": "integer"},
+                                    "offset": {"type": "integer"}
+                                },
+                                "required": ["table"]
+                            },
+                            "description": "Consultas a executar"
+                        },
+                        "concurrency": {
+                            "type": "integer",
+                            "description": "Número máximo de consultas simultâneas"
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "description": "Tempo limite por consulta, em segundos"
+                        },
+                        "merge": {
+                            "type": "boolean",
+                            "description": "Combinar todas as linhas em uma única lista"
+                        }
+                    },
+                    "required": ["queries"]
+                }
+            ),
+            Tool(
+                name="database_aggregate",
+                description="Calcula count/sum/min/max/avg (com group by opcional) sem transferir as linhas",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "table": {
+                            "type": "string",
+                            "description": "Nome da tabela"
+                        },
+                        "aggregates": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "function": {
+                                        "type": "string",
+                                        "enum": ["count", "sum", "min", "max", "avg"]
+                                    },
+                                    "column": {"type": "string"},
+                                    "alias": {"type": "string"}
+                                },
+                                "required": ["function"]
+                            },
+                            "description": "Agregações a calcular (padrão: count)"
+                        },
+                        "group_by": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Colunas de agrupamento"
+                        },
+                        "filters": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "column": {"type": "string"},
+                                    "operator": {"type": "string"},
+                                    "value": {}
+                                }
+                            },
+                            "description": "Filtros a serem aplicados"
+                        },
+                        "count_mode": {
+                            "type": "string",
+                            "enum": ["exact", "planned", "estimated"],
+                            "description": "Modo de contagem para count simples"
                         }
                     },
                     "required": ["table"]
@@ -80,7 +244,7 @@ class DatabaseTools:
             ),
             Tool(
                 name="database_insert",
-                description="Insere um novo registro em uma tabela",
+                description="Insere um registro (ou uma lista de registros, em blocos) em uma tabela",
                 inputSchema={
                     "type": "object",
                     "properties": {
@@ -89,8 +253,18 @@ class DatabaseTools:
                             "description": "Nome da tabela"
                         },
                         "data": {
-                            "type": "object",
-                            "description": "Dados a serem inseridos"
+                            "type": ["object", "array"],
+                            "items": {"type": "object"},
+                            "description": "Registro ou lista de registros a serem inseridos"
+                        },
+                        "chunk_size": {
+                            "type": "integer",
+                            "description": "Registros por requisição ao inserir uma lista",
+                            "default": 500
+                        },
+                        "write_behind": {
+                            "type": "boolean",
+                            "description": "Agrupa o registro com inserções simultâneas na mesma tabela (padrão: WRITE_BEHIND_ENABLED)"
                         }
                     },
                     "required": ["table", "data"]
@@ -136,6 +310,151 @@ class DatabaseTools:
                     "required": ["table", "id"]
                 }
             ),
+            Tool(
+                name="database_transaction",
+                description="Executa várias operações (insert/update/delete/sql) em uma única transação",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "operations": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "type": {
+                                        "type": "string",
+                                        "enum": ["insert", "update", "delete", "sql"]
+                                    },
+                                    "table": {"type": "string"},
+                                    "id": {"type": "string"},
+                                    "data": {
+                                        "type": ["object", "array"],
+                                        "description": "Registro (ou lista de registros para insert)"
+                                    },
+                                    "sql": {"type": "string"},
+                                    "params": {"type": "array"}
+                                },
+                                "required": ["type"]
+                            },
+                            "description": "Operações na ordem de execução"
+                        }
+                    },
+                    "required": ["operations"]
+                }
+            ),
+            Tool(
+                name="database_import",
+                description="Importa um arquivo CSV/NDJSON do Storage para uma tabela, em lotes e com retomada",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "table": {
+                            "type": "string",
+                            "description": "Tabela de destino"
+                        },
+                        "bucket": {
+                            "type": "string",
+                            "description": "Bucket do arquivo"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "Caminho do arquivo no bucket"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["csv", "ndjson"],
+                            "description": "Formato (padrão: pela extensão do arquivo)"
+                        },
+                        "chunk_size": {
+                            "type": "integer",
+                            "description": "Registros por lote inserido"
+                        },
+                        "null_value": {
+                            "type": "string",
+                            "description": "Valor CSV interpretado como NULL (padrão: vazio)"
+                        },
+                        "job_id": {
+                            "type": "string",
+                            "description": "Identificador do checkpoint (padrão: tabela + arquivo)"
+                        },
+                        "resume": {
+                            "type": "boolean",
+                            "description": "Continuar do último checkpoint (false reinicia)",
+                            "default": True
+                        }
+                    },
+                    "required": ["table", "bucket", "path"]
+                }
+            ),
+            Tool(
+                name="database_export",
+                description="Exporta uma tabela ou consulta SQL para um arquivo CSV/NDJSON no Storage, em partes e com retomada",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "table": {
+                            "type": "string",
+                            "description": "Tabela de origem"
+                        },
+                        "filters": {
+                            "type": "array",
+                            "description": "Filtros (mesmo formato do database_select)"
+                        },
+                        "order_by": {
+                            "type": "object",
+                            "description": "Ordenação (recomendada para retomadas estáveis)"
+                        },
+                        "sql": {
+                            "type": "string",
+                            "description": "Consulta SQL de origem (requer backend Postgres direto)"
+                        },
+                        "params": {
+                            "type": "array",
+                            "description": "Parâmetros da consulta ($1, $2, ...)"
+                        },
+                        "bucket": {
+                            "type": "string",
+                            "description": "Bucket de destino"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "Caminho do arquivo no bucket"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["csv", "ndjson"],
+                            "description": "Formato (padrão: pela extensão do arquivo)"
+                        },
+                        "chunk_size": {
+                            "type": "integer",
+                            "description": "Linhas lidas por bloco"
+                        },
+                        "job_id": {
+                            "type": "string",
+                            "description": "Identificador do checkpoint (padrão: origem + arquivo)"
+                        },
+                        "resume": {
+                            "type": "boolean",
+                            "description": "Continuar do último checkpoint (false reinicia)",
+                            "default": True
+                        }
+                    },
+                    "required": ["bucket", "path"]
+                }
+            ),
+            Tool(
+                name="database_slow_queries",
+                description="Lista as consultas lentas recentes do projeto (forma, duração e resumo do plano)",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "limit": {
+                            "type": "integer",
+                            "description": "Número máximo de entradas"
+                        }
+                    }
+                }
+            ),
             Tool(
                 name="database_list_tables",
                 description="Lista todas as tabelas disponíveis no banco de dados",
@@ -152,9 +471,15 @@ class DatabaseTools:
         dispatch = {
             "database_query": execute_query,
             "database_select": execute_select,
+            "database_select_multi": execute_select_multi,
+            "database_aggregate": execute_aggregate,
             "database_insert": execute_insert,
             "database_update": execute_update,
             "database_delete": execute_delete,
+            "database_transaction": execute_transaction,
+            "database_import": execute_import,
+            "database_export": execute_export,
+            "database_slow_queries": execute_slow_queries,
             "database_list_tables": execute_list_tables,
             "database_get_project_info": execute_get_project_info,
         }
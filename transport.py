@@ -0,0 +1,112 @@
+"""
+Camada de transporte HTTP compartilhada para os clientes Supabase
+
+Mantém um httpx.Client por host upstream (reutilizado entre requisições e
+trocas de configuração), com um pool de conexões keep-alive por serviço
+(PostgREST, Auth, Storage, Functions), HTTP/2 quando disponível e
+timeouts de conexão/leitura configuráveis via Config.
+"""
+
+import logging
+import threading
+from typing import Dict
+from urllib.parse import urlparse
+
+import httpx
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Prefixo de caminho de cada serviço do Supabase
+SERVICE_PREFIXES = {
+    "rest": "/rest/v1",
+    "auth": "/auth/v1",
+    "storage": "/storage/v1",
+    "functions": "/functions/v1",
+}
+
+
+def service_for_path(path: str) -> str:
+    """Identifica o serviço upstream a partir do caminho da URL"""
+    for service, prefix in SERVICE_PREFIXES.items():
+        if path.startswith(prefix):
+            return service
+    return "rest"
+
+
+class ServiceRoutingTransport(httpx.BaseTransport):
+    """Transporte que encaminha cada requisição ao pool do serviço correspondente"""
+
+    def __init__(self, config: Config):
+        http2 = config.http2_enabled and HTTP2_AVAILABLE
+        if config.http2_enabled and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 habilitado, mas o pacote 'h2' não está instalado; usando HTTP/1.1")
+
+        self._transports: Dict[str, httpx.HTTPTransport] = {}
+        self._timeouts: Dict[str, dict] = {}
+        for service in SERVICE_PREFIXES:
+            settings = config.get_http_settings(service)
+            self._transports[service] = httpx.HTTPTransport(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings["max_connections"],
+                    max_keepalive_connections=settings["max_keepalive_connections"],
+                    keepalive_expiry=config.http_keepalive_expiry,
+                ),
+            )
+            self._timeouts[service] = httpx.Timeout(
+                settings["read_timeout"],
+                connect=settings["connect_timeout"],
+                pool=settings["connect_timeout"],
+            ).as_dict()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        service = service_for_path(request.url.path)
+        # O timeout da requisição (ex.: prazo restante, http_timeout) só encurta o do serviço
+        requested = request.extensions.get("timeout") or {}
+        request.extensions["timeout"] = {
+            field: min((value for value in (default, requested.get(field)) if value is not None), default=None)
+            for field, default in self._timeouts[service].items()
+        }
+        return self._transports[service].handle_request(request)
+
+    def close(self):
+        for transport in self._transports.values():
+            transport.close()
+
+
+# Clientes HTTP compartilhados por host upstream
+_http_clients: Dict[str, httpx.Client] = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_http_client(config: Config) -> httpx.Client:
+    """Retorna o cliente HTTP compartilhado do host do projeto atual"""
+    host = urlparse(config.get_supabase_url() or "").netloc
+    with _http_clients_lock:
+        client = _http_clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                transport=ServiceRoutingTransport(config),
+                follow_redirects=True,
+                # Sem timeout próprio: vale o do serviço, encurtado pelo da requisição
+                timeout=None,
+            )
+            _http_clients[host] = client
+        return client
+
+
+def close_http_clients():
+    """Fecha todos os pools de conexão (chamar no desligamento)"""
+    with _http_clients_lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+
@@ -0,0 +1,126 @@
+"""
+Buffer write-behind para inserções de um registro
+
+Com o modo ativo, inserções de um único registro são acumuladas por
+(projeto, credencial, tabela, colunas) e enviadas como uma só inserção de várias linhas
+quando o lote atinge WRITE_BEHIND_MAX_BATCH registros ou WRITE_BEHIND_MAX_DELAY_MS
+após o primeiro registro. Cada chamador só recebe a confirmação depois que o
+lote é gravado (ack no flush); se o lote falha, todos recebem o erro. Os
+buffers pendentes são gravados no desligamento.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import Config
+from deadlines import clear_deadline
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BufferKey = Tuple[str, str, str, Tuple[str, ...]]
+
+
+class _Buffer:
+    def __init__(self, client):
+        self.client = client
+        self.rows: List[Dict[str, Any]] = []
+        self.waiters: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.Task] = None
+
+
+class InsertCoalescer:
+    """Agrupa inserções de um registro em inserções de várias linhas"""
+
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self._buffers: Dict[BufferKey, _Buffer] = {}
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def insert(self, client, table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Enfileira o registro e retorna a linha inserida quando o lote for gravado"""
+        # Registros com colunas diferentes não podem dividir a mesma inserção, nem
+        # chamadores com credenciais diferentes (RLS): o lote é gravado com uma só
+        config = client.config
+        key = (config.get_tenant_id(), config.get_credential_id(), table, tuple(sorted(record)))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            # O cliente recebido pode ser reconfigurado por outra requisição antes do flush
+            buffer = self._buffers[key] = _Buffer(client.pinned())
+        waiter = asyncio.get_running_loop().create_future()
+        buffer.rows.append(record)
+        buffer.waiters.append(waiter)
+
+        if len(buffer.rows) >= self.max_batch:
+            self._start_flush(key)
+        elif buffer.timer is None:
+            buffer.timer = asyncio.ensure_future(self._flush_later(key, buffer))
+        # shield: cancelar um chamador não descarta o registro dos demais
+        return await asyncio.shield(waiter)
+
+    async def _flush_later(self, key: BufferKey, buffer: _Buffer):
+        await asyncio.sleep(self.max_delay)
+        if self._buffers.get(key) is buffer:
+            buffer.timer = None
+            self._start_flush(key)
+
+    def _start_flush(self, key: BufferKey):
+        buffer = self._buffers.pop(key)
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        task = asyncio.ensure_future(self._flush(key[2], buffer))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, table: str, buffer: _Buffer):
+        # O lote atende vários chamadores: não herda o prazo de quem disparou o flush
+        clear_deadline()
+        try:
+            inserted = await buffer.client.insert_many(table, buffer.rows)
+        except Exception as e:
+            for waiter in buffer.waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        metrics.inc_counter(
+            "mcp_write_behind_rows_total", len(buffer.rows),
+            labels={"tenant": buffer.client.config.get_tenant_id(), "table": table},
+            help="Registros gravados pelo buffer write-behind",
+        )
+        metrics.inc_counter(
+            "mcp_write_behind_flushes_total",
+            labels={"tenant": buffer.client.config.get_tenant_id(), "table": table},
+            help="Inserções em lote feitas pelo buffer write-behind",
+        )
+        for index, waiter in enumerate(buffer.waiters):
+            if not waiter.done():
+                waiter.set_result(inserted[index] if index < len(inserted) else {})
+
+    async def flush_all(self):
+        """Grava todos os buffers pendentes e aguarda os lotes em andamento"""
+        for key in list(self._buffers):
+            self._start_flush(key)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+_coalescer: Optional[InsertCoalescer] = None
+
+
+def get_insert_coalescer(config: Config) -> InsertCoalescer:
+    """Retorna o buffer do processo (criado com os limites configurados)"""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = InsertCoalescer(config.write_behind_max_batch, config.write_behind_max_delay_ms / 1000)
+    return _coalescer
+
+
+async def flush_write_behind():
+    """Grava os registros pendentes (chamar no desligamento)"""
+    if _coalescer is not None:
+        pending = sum(len(buffer.rows) for buffer in _coalescer._buffers.values())
+        if pending:
+            logger.info(f"Gravando {pending} registro(s) pendente(s) do buffer write-behind")
+        await _coalescer.flush_all()